@@ -92,6 +92,7 @@ export default function ScanScreen() {
         totalAmount: 0,
         items: [],
         status: 'pending_ocr',
+        priority: 1, // Escaneo individual: se procesa antes que las cargas masivas
         imageUrl: uploadResult.downloadURL,
         ocrRawText: '',
         createdBy: user.uid,
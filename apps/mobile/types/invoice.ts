@@ -76,6 +76,9 @@ export interface Invoice {
   imageUrl: string;          // URL en Firebase Storage
   ocrRawText: string;        // Texto completo extraído por OCR
   errorMessage?: string;     // Mensaje de error si status === 'error'
+  priority?: number;         // Prioridad de procesamiento OCR (mayor = antes, por defecto 0)
+  perceptualHash?: string;   // Hash perceptual de la imagen (hex, lo escribe el procesador OCR)
+  duplicateOf?: string;      // Id de la factura de la que esta foto parece ser un duplicado
   
   // Auditoría
   createdAt: Timestamp;
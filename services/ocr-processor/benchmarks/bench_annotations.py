@@ -0,0 +1,127 @@
+"""
+Micro-benchmark del recorrido de full_text_annotation
+Compara el recorrido original (dos pasadas, concatenación de strings) con
+`_result_from_annotations`, con y sin bloques, sobre respuestas de Vision
+grabadas (JSON de AnnotateImageResponse) o sobre una respuesta sintética
+
+Uso:
+    python benchmarks/bench_annotations.py respuestas/
+    python benchmarks/bench_annotations.py --synthetic-words 3000
+"""
+
+import argparse
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from google.cloud import vision  # noqa: E402
+
+from ocr import _result_from_annotations  # noqa: E402
+
+def legacy_result(annotations):
+    """Recorrido anterior: una pasada para la confianza y otra para los bloques"""
+    annotations = [a for a in annotations if a]
+    full_text = '\n'.join(annotation.text for annotation in annotations)
+
+    total_confidence = 0.0
+    block_count = 0
+    for annotation in annotations:
+        for page in annotation.pages:
+            for block in page.blocks:
+                total_confidence += block.confidence
+                block_count += 1
+    confidence = total_confidence / block_count if block_count else 0.0
+
+    blocks = []
+    for annotation in annotations:
+        for page in annotation.pages:
+            for block in page.blocks:
+                block_text = ''
+                for paragraph in block.paragraphs:
+                    para_text = ''
+                    for word in paragraph.words:
+                        word_text = ''.join([symbol.text for symbol in word.symbols])
+                        para_text += word_text + ' '
+                    block_text += para_text.strip() + '\n'
+                blocks.append({'text': block_text.strip(), 'confidence': block.confidence})
+
+    return {'text': full_text, 'confidence': confidence, 'blocks': blocks, 'error': None}
+
+def load_annotations(directory: Path):
+    annotations = []
+    for path in sorted(directory.glob('*.json')):
+        response = vision.AnnotateImageResponse.from_json(path.read_text(encoding='utf-8'))
+        annotations.append(response.full_text_annotation)
+    return annotations
+
+def synthetic_annotation(word_count: int, words_per_paragraph: int = 8, paragraphs_per_block: int = 3):
+    """Anotación con la forma de una factura densa: `word_count` palabras de ~6 símbolos"""
+    words = [
+        vision.Word(symbols=[vision.Symbol(text=c) for c in f'{i % 97:02d}ABCD'])
+        for i in range(word_count)
+    ]
+    paragraphs = [
+        vision.Paragraph(words=words[i:i + words_per_paragraph])
+        for i in range(0, word_count, words_per_paragraph)
+    ]
+    blocks = [
+        vision.Block(paragraphs=paragraphs[i:i + paragraphs_per_block], confidence=0.9)
+        for i in range(0, len(paragraphs), paragraphs_per_block)
+    ]
+    text = ' '.join(f'{i % 97:02d}ABCD' for i in range(word_count))
+    return vision.TextAnnotation(text=text, pages=[vision.Page(blocks=blocks)])
+
+def measure(fn, annotations, repeat: int) -> float:
+    """Mediana en ms de procesar todas las anotaciones"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for annotation in annotations:
+            fn(annotation)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de _result_from_annotations')
+    parser.add_argument('directory', nargs='?', help='Directorio con respuestas de Vision grabadas (.json)')
+    parser.add_argument('--synthetic-words', type=int, default=3000, help='Palabras de la respuesta sintética')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    # _result_from_annotations registra cada resultado
+    logging.getLogger('ocr').setLevel(logging.WARNING)
+
+    if args.directory:
+        annotations = load_annotations(Path(args.directory))
+        if not annotations:
+            print(f'No se encontraron respuestas .json en {args.directory}')
+            sys.exit(1)
+    else:
+        annotations = [synthetic_annotation(args.synthetic_words)]
+
+    # Mismo resultado que el recorrido anterior
+    for annotation in annotations:
+        expected = legacy_result([annotation])
+        actual = _result_from_annotations([annotation])
+        assert actual['text'] == expected['text'] and actual['blocks'] == expected['blocks']
+        assert abs(actual['confidence'] - expected['confidence']) < 1e-9
+
+    variants = [
+        ('anterior', lambda a: legacy_result([a])),
+        ('una pasada', lambda a: _result_from_annotations([a])),
+        ('sin bloques', lambda a: _result_from_annotations([a], include_blocks=False)),
+    ]
+
+    baseline = None
+    print(f'{len(annotations)} respuestas, mediana de {args.repeat} repeticiones')
+    for name, fn in variants:
+        elapsed_ms = measure(fn, annotations, args.repeat)
+        baseline = baseline or elapsed_ms
+        print(f'{name:15} {elapsed_ms:10.2f} ms   x{baseline / elapsed_ms:.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark del registro local de contribuyentes (contributors.py)
+Genera una nómina sintética en CSV, la importa a un SQLite temporal y mide
+la búsqueda por RUT (mitad presentes, mitad ausentes), que es lo que main.py
+hace antes de ir a Firestore o al SII
+
+Uso:
+    python benchmarks/bench_contributors.py
+    python benchmarks/bench_contributors.py --rows 2000000 --lookups 100000
+"""
+
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_TMP_DIR = tempfile.TemporaryDirectory()
+# Antes de importar config: el registro apunta al SQLite temporal
+os.environ['CONTRIBUTORS_DB_PATH'] = str(Path(_TMP_DIR.name) / 'contribuyentes.sqlite')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from contributors import import_contributors, lookup_contributor  # noqa: E402
+from rut import compute_dv  # noqa: E402
+
+COMUNAS = ('Santiago', 'Providencia', 'Las Condes', 'Ñuñoa', 'Valparaíso', 'Concepción', 'Temuco')
+
+def write_csv(path: Path, numbers: list, rng: random.Random):
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        writer = csv.writer(output, delimiter=';')
+        writer.writerow(['RUT', 'DV', 'Razón Social', 'Giro', 'Actividad Económica', 'Dirección', 'Comuna'])
+        for number in numbers:
+            writer.writerow([
+                number, compute_dv(number), f'Empresa {number} SpA', 'Comercio al por menor',
+                f'{rng.randint(100000, 999999)}', f'Av. Principal {rng.randint(1, 9999)}', rng.choice(COMUNAS)
+            ])
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del registro local de contribuyentes')
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--lookups', type=int, default=50000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    numbers = rng.sample(range(1_000_000, 99_999_999), args.rows)
+    csv_path = Path(_TMP_DIR.name) / 'nomina.csv'
+    write_csv(csv_path, numbers, rng)
+
+    started = time.perf_counter()
+    stats = import_contributors(str(csv_path), os.environ['CONTRIBUTORS_DB_PATH'])
+    import_seconds = time.perf_counter() - started
+    size_mb = Path(os.environ['CONTRIBUTORS_DB_PATH']).stat().st_size / 1e6
+
+    present = [f'{n}-{compute_dv(n)}' for n in rng.sample(numbers, args.lookups // 2)]
+    known = set(numbers)
+    absent = []
+    while len(absent) < args.lookups - len(present):
+        number = rng.randint(1_000_000, 99_999_999)
+        if number not in known:
+            absent.append(f'{number}-{compute_dv(number)}')
+    queries = present + absent
+    rng.shuffle(queries)
+
+    lookup_contributor(queries[0])  # abrir la conexión fuera de la medición
+    started = time.perf_counter()
+    found = sum(1 for rut in queries if lookup_contributor(rut))
+    lookup_us = (time.perf_counter() - started) * 1e6 / len(queries)
+
+    assert found == len(present), f'se encontraron {found} de {len(present)} RUTs presentes'
+    print(f'importación: {stats["imported"]} filas en {import_seconds:.1f}s ({stats["imported"] / import_seconds:.0f} filas/s, {size_mb:.1f} MB)')
+    print(f'búsqueda:    {lookup_us:.1f} µs por RUT ({len(queries)} consultas, {found} encontradas)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark de la extracción de items por geometría (layout.py)
+Genera respuestas de Vision sintéticas con una tabla de items de N filas
+(palabras con cajas en píxeles, en orden aleatorio como las entrega Vision
+en facturas desordenadas) y mide el armado de las cajas y la extracción de
+items. El tiempo por palabra debe mantenerse casi constante al crecer N
+
+Uso:
+    python benchmarks/bench_layout.py
+    python benchmarks/bench_layout.py --items 100 1000 10000 --pages 4
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from google.cloud import vision  # noqa: E402
+
+from layout import extract_layout_items, word_boxes_from_annotations  # noqa: E402
+
+CHAR_WIDTH = 11
+WORD_HEIGHT = 20
+ROW_HEIGHT = 28
+
+def _word(text: str, x: int, y: int) -> vision.Word:
+    x1 = x + len(text) * CHAR_WIDTH
+    y1 = y + WORD_HEIGHT
+    return vision.Word(
+        symbols=[vision.Symbol(text=c) for c in text],
+        bounding_box=vision.BoundingPoly(vertices=[
+            vision.Vertex(x=x, y=y), vision.Vertex(x=x1, y=y),
+            vision.Vertex(x=x1, y=y1), vision.Vertex(x=x, y=y1)
+        ])
+    )
+
+def _line(cells, y: int, rng: random.Random) -> list:
+    """Palabras de una fila: (texto de la celda, x de inicio), con algo de ruido en la posición"""
+    words = []
+    for text, x in cells:
+        for part in text.split(' '):
+            words.append(_word(part, x + rng.randint(-2, 2), y + rng.randint(-3, 3)))
+            x += len(part) * CHAR_WIDTH + 8
+    return words
+
+def _money(value: int) -> str:
+    return f'{value:,}'.replace(',', '.')
+
+def synthetic_page(items: int, rng: random.Random) -> vision.Page:
+    """Página con encabezado, `items` filas de detalle y totales"""
+    words = _line([('FACTURA ELECTRÓNICA N° 123', 40)], 50, rng)
+    words += _line([('Descripción', 40), ('Cantidad', 520), ('Precio Unit.', 680), ('Total', 900)], 90, rng)
+
+    y = 120
+    for i in range(items):
+        quantity = i % 5 + 1
+        unit_price = 1000 + 10 * i
+        words += _line([
+            (f'Producto {i} color azul', 40),
+            (str(quantity), 540),
+            (f'$ {_money(unit_price)}', 690),
+            (_money(quantity * unit_price), 900)
+        ], y, rng)
+        y += ROW_HEIGHT
+
+    words += _line([('MONTO NETO', 600), ('$ 1.000', 900)], y, rng)
+    rng.shuffle(words)
+    return vision.Page(
+        width=1200,
+        height=y + 100,
+        blocks=[vision.Block(paragraphs=[vision.Paragraph(words=words)])]
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de extracción de items por geometría')
+    parser.add_argument('--items', type=int, nargs='+', default=[30, 300, 3000, 30000], help='Filas de detalle por página')
+    parser.add_argument('--pages', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    # Calentar (compilación de regex, primeras llamadas a NumPy)
+    warmup = vision.TextAnnotation(pages=[synthetic_page(10, rng)])
+    extract_layout_items(word_boxes_from_annotations([type(warmup).pb(warmup)]))
+
+    print(f'{"items":>8} {"palabras":>9} {"cajas":>10} {"items":>10} {"µs/palabra":>11}')
+    for items in args.items:
+        annotation = vision.TextAnnotation(pages=[synthetic_page(items, rng) for _ in range(args.pages)])
+        raw = type(annotation).pb(annotation)
+
+        started = time.perf_counter()
+        words = word_boxes_from_annotations([raw])
+        boxes_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        extracted = extract_layout_items(words)
+        items_ms = (time.perf_counter() - started) * 1000
+
+        assert len(extracted) == items * args.pages, f'{len(extracted)} items extraídos, se esperaban {items * args.pages}'
+        print(
+            f'{items * args.pages:8d} {len(words):9d} {boxes_ms:8.1f}ms {items_ms:8.1f}ms '
+            f'{(boxes_ms + items_ms) * 1000 / len(words):11.2f}'
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""
+Benchmark y verificación del parser de texto OCR
+Compara `parse_invoice_text` (patrones compilados, una pasada para tipo,
+número y montos) con el parser anterior (un re.search con patrón sin compilar
+por campo y por etiqueta) sobre textos OCR sintéticos grandes. Antes de medir
+verifica que el resultado sea idéntico al registrado en el archivo golden
+
+Uso:
+    python benchmarks/bench_parser.py
+    python benchmarks/bench_parser.py --lines 5000 --repeat 10
+    python benchmarks/bench_parser.py --check-only
+    python benchmarks/bench_parser.py --update-golden   # sólo si el cambio de resultado es intencional
+"""
+
+import argparse
+import json
+import logging
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR / 'src'))
+
+import parser as invoice_parser  # noqa: E402
+from parser import (  # noqa: E402
+    ETIQUETAS,
+    FECHA_PATTERN_1,
+    FECHA_PATTERN_2,
+    MESES,
+    MONTO_PATTERN,
+    NUMERO_FACTURA_PATTERN,
+    NUMERO_SIMPLE_PATTERN,
+    RUT_PATTERN,
+    TIPO_DOC_PATTERNS,
+    parse_invoice_text
+)
+
+GOLDEN_PATH = SERVICE_DIR / 'tests' / 'fixtures' / 'parser_golden.jsonl'
+
+# ============================================
+# PARSER ANTERIOR (REFERENCIA)
+# ============================================
+
+def legacy_parse(text: str) -> dict:
+    """Parser anterior: cada campo vuelve a recorrer el texto con patrones sin compilar"""
+    doc_type = 'factura'
+    text_upper = text.upper()
+    for candidate, pattern in TIPO_DOC_PATTERNS.items():
+        if re.search(pattern, text_upper):
+            doc_type = candidate
+            break
+
+    number = None
+    match = re.search(NUMERO_FACTURA_PATTERN, text, re.IGNORECASE) or re.search(NUMERO_SIMPLE_PATTERN, text)
+    if match:
+        number = int(match.group(1))
+
+    date = None
+    match = re.search(FECHA_PATTERN_1, text)
+    if match:
+        day, month, year = match.groups()
+        year = '20' + year if len(year) == 2 else year
+        date = f'{year}-{month.zfill(2)}-{day.zfill(2)}'
+    else:
+        match = re.search(FECHA_PATTERN_2, text, re.IGNORECASE)
+        if match:
+            day, month_name, year = match.groups()
+            for mes_str, mes_num in MESES.items():
+                if mes_str.startswith(month_name.lower()[:3]):
+                    date = f'{year}-{str(mes_num).zfill(2)}-{day.zfill(2)}'
+                    break
+
+    amounts = {}
+    for amount_type in ('neto', 'iva', 'total'):
+        amounts[amount_type] = None
+        for etiqueta in ETIQUETAS[amount_type]:
+            match = re.search(rf'{etiqueta}\s*:?\s*\$?\s*([\d\.]+(?:,\d{{1,2}})?)', text, re.IGNORECASE)
+            if match:
+                try:
+                    amounts[amount_type] = float(match.group(1).replace('.', '').replace(',', '.'))
+                    break
+                except ValueError:
+                    continue
+        if amounts[amount_type] is None and amount_type == 'total':
+            montos = re.findall(MONTO_PATTERN, text)
+            try:
+                amounts['total'] = max(float(m.replace('.', '').replace(',', '.')) for m in montos) if montos else None
+            except ValueError:
+                pass
+
+    ruts = []
+    for rut in re.findall(RUT_PATTERN, text):
+        cleaned = rut.replace('.', '').replace('-', '')
+        ruts.append(f'{int(cleaned[:-1]):,}'.replace(',', '.') + f'-{cleaned[-1].upper()}')
+
+    return {
+        'type': doc_type,
+        'number': number,
+        'date': date,
+        'emisorRut': ruts[0] if ruts else None,
+        'emisorRazonSocial': None,
+        'receptorRut': ruts[1] if len(ruts) >= 2 else None,
+        'receptorRazonSocial': None,
+        'netoAmount': amounts['neto'],
+        'ivaAmount': amounts['iva'],
+        'totalAmount': amounts['total'],
+        'items': [],
+        'raw_matches': {}
+    }
+
+# ============================================
+# GOLDEN
+# ============================================
+
+def load_golden() -> list:
+    with open(GOLDEN_PATH, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def check_golden() -> int:
+    """Comparar parse_invoice_text (y la referencia) con el golden; retorna la cantidad de diferencias"""
+    failures = 0
+    for case in load_golden():
+        for name, fn in (('parse_invoice_text', parse_invoice_text), ('referencia', legacy_parse)):
+            actual = fn(case['text'])
+            if actual != case['expected']:
+                failures += 1
+                print(f'✗ {case["name"]} ({name})')
+                for key in case['expected']:
+                    if actual.get(key) != case['expected'][key]:
+                        print(f'    {key}: esperado {case["expected"][key]!r}, obtenido {actual.get(key)!r}')
+    return failures
+
+def update_golden():
+    cases = load_golden()
+    with open(GOLDEN_PATH, 'w', encoding='utf-8') as f:
+        for case in cases:
+            case['expected'] = parse_invoice_text(case['text'])
+            f.write(json.dumps(case, ensure_ascii=False) + '\n')
+    print(f'✓ {len(cases)} casos actualizados en {GOLDEN_PATH}')
+
+# ============================================
+# BENCHMARK
+# ============================================
+
+def synthetic_ocr_text(lines: int, with_date: bool = True, with_labels: bool = True) -> str:
+    """Factura OCR con `lines` líneas de detalle (montos, cantidades y códigos en cada línea)"""
+    header = (
+        'COMERCIAL EJEMPLO SPA\nR.U.T.: 76.543.210-K\nGiro: Venta de insumos\n'
+        'FACTURA ELECTRÓNICA\nN° 001234\nS.I.I. - SANTIAGO CENTRO\n'
+        + ('Fecha Emisión: 15 de marzo de 2024\n' if with_date else '')
+        + 'Señor(es): CLIENTE LTDA\nRUT: 12.345.678-9\nDirección: Av. Siempre Viva 742\n'
+    )
+    detail = ''.join(
+        f'{i:04d} Producto código {1000 + i} descripción larga del artículo {i % 7 + 1} x '
+        f'$ {1000 + i * 10:,} = $ {(1000 + i * 10) * (i % 7 + 1):,}\n'.replace(',', '.')
+        for i in range(lines)
+    )
+    footer = 'MONTO NETO $ 1.000.000\nI.V.A. 19% $ 190.000\nTOTAL $ 1.190.000\n' if with_labels else ''
+    return header + detail + footer
+
+def measure(fn, text: str, repeat: int) -> float:
+    """Mediana en ms de parsear el texto"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(text)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark y golden del parser de texto OCR')
+    parser.add_argument('--lines', type=int, default=2000, help='Líneas de detalle del texto grande')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--check-only', action='store_true', help='Sólo verificar el golden')
+    parser.add_argument('--update-golden', action='store_true', help='Regenerar el golden con el parser actual')
+    args = parser.parse_args()
+
+    # El parser registra cada campo no encontrado
+    logging.getLogger(invoice_parser.__name__).setLevel(logging.ERROR)
+
+    if args.update_golden:
+        update_golden()
+        return
+
+    failures = check_golden()
+    if failures:
+        print(f'✗ {failures} diferencias con {GOLDEN_PATH.name}')
+        sys.exit(1)
+    print(f'✓ Golden: {len(load_golden())} casos idénticos')
+    if args.check_only:
+        return
+
+    texts = [
+        ('factura chica', synthetic_ocr_text(15)),
+        (f'{args.lines} líneas', synthetic_ocr_text(args.lines)),
+        (f'{args.lines} líneas, sin fecha ni etiquetas', synthetic_ocr_text(args.lines, with_date=False, with_labels=False)),
+    ]
+
+    print(f'Mediana de {args.repeat} repeticiones')
+    for name, text in texts:
+        assert parse_invoice_text(text) == legacy_parse(text)
+        legacy_ms = measure(legacy_parse, text, args.repeat)
+        current_ms = measure(parse_invoice_text, text, args.repeat)
+        print(
+            f'{name:36} {len(text) // 1024:5d} KB   anterior {legacy_ms:8.2f} ms   '
+            f'actual {current_ms:8.2f} ms   x{legacy_ms / current_ms:.1f}'
+        )
+
+if __name__ == '__main__':
+    main()
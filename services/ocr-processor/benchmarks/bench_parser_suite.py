@@ -0,0 +1,214 @@
+"""
+Suite de rendimiento y precisión del parser sobre el corpus sintético
+Genera el corpus de corpus.py (misma semilla, mismo corpus) y reporta:
+  - throughput de parse_invoice_text (textos/s)
+  - latencia por campo: µs por texto de cada función de extracción campo por
+    campo (extract_document_type, extract_date, ...), la misma lógica que el
+    escáner de una pasada pero aislada por campo
+  - precisión por campo contra la verdad del corpus, total y con ruido de OCR
+Compara con la línea base guardada y termina con código 1 si algún campo
+pierde precisión o si el tiempo empeora más allá de la tolerancia
+
+Uso:
+    python benchmarks/bench_parser_suite.py
+    python benchmarks/bench_parser_suite.py --no-timing          # sólo precisión (otra máquina / CI)
+    python benchmarks/bench_parser_suite.py --show-errors 3      # ejemplos de campos mal extraídos
+    python benchmarks/bench_parser_suite.py --streaming          # además, el parseo por bloques
+    python benchmarks/bench_parser_suite.py --update-baseline    # tras una mejora intencional
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVICE_DIR / 'src'))
+
+import parser as invoice_parser  # noqa: E402
+from corpus import FIELDS, generate_corpus  # noqa: E402
+from parser import (  # noqa: E402
+    extract_all_ruts,
+    extract_amount,
+    extract_date,
+    extract_document_type,
+    extract_invoice_number,
+    parse_invoice_blocks,
+    parse_invoice_text
+)
+
+BASELINE_PATH = SERVICE_DIR / 'benchmarks' / 'parser_baseline.json'
+
+# Función de extracción de cada campo (los dos RUTs salen de la misma)
+FIELD_FUNCTIONS = {
+    'type': extract_document_type,
+    'number': extract_invoice_number,
+    'date': extract_date,
+    'ruts': extract_all_ruts,
+    'netoAmount': lambda text: extract_amount(text, 'neto'),
+    'ivaAmount': lambda text: extract_amount(text, 'iva'),
+    'totalAmount': lambda text: extract_amount(text, 'total'),
+}
+
+# ============================================
+# MEDICIÓN
+# ============================================
+
+def best_seconds(fn, texts, repeat: int) -> float:
+    """Mejor tiempo de `repeat` pasadas sobre todos los textos (el menos afectado por ruido del sistema)"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def measure_timing(texts, repeat: int) -> dict:
+    parse_seconds = best_seconds(parse_invoice_text, texts, repeat)
+    return {
+        'textsPerSecond': round(len(texts) / parse_seconds),
+        'fieldLatencyUs': {
+            field: round(best_seconds(fn, texts, repeat) * 1e6 / len(texts), 2)
+            for field, fn in FIELD_FUNCTIONS.items()
+        }
+    }
+
+def measure_accuracy(corpus, results, show_errors: int = 0) -> dict:
+    """Fracción de documentos con cada campo correcto, en todo el corpus y en los con ruido"""
+    accuracy = {}
+    for subset, documents in (('all', list(zip(corpus, results))), ('noisy', [(d, r) for d, r in zip(corpus, results) if d['noisy']])):
+        accuracy[subset] = {}
+        for field in FIELDS:
+            wrong = [(d, r) for d, r in documents if r[field] != d['truth'][field]]
+            accuracy[subset][field] = round(1 - len(wrong) / len(documents), 4) if documents else 1.0
+
+            if subset == 'all' and show_errors:
+                for document, result in wrong[:show_errors]:
+                    print(f'✗ {field} en {document["id"]}: esperado {document["truth"][field]!r}, obtenido {result[field]!r}')
+    return accuracy
+
+def print_streaming(corpus, report: dict, repeat: int):
+    """Parseo por bloques (una línea del texto por bloque) frente a parse_invoice_text; sólo informativo"""
+    documents = [[{'text': line} for line in document['text'].split('\n')] for document in corpus]
+    accuracy = measure_accuracy(corpus, [parse_invoice_blocks(blocks) for blocks in documents])['all']
+
+    print(f'\n{"campo":14} {"texto":>8} {"bloques":>8}')
+    for field in FIELDS:
+        print(f'{field:14} {report["accuracy"]["all"][field]:8.1%} {accuracy[field]:8.1%}')
+    if 'timing' in report:
+        blocks_per_second = len(documents) / best_seconds(parse_invoice_blocks, documents, repeat)
+        print(f'parse_invoice_blocks: {blocks_per_second:.0f} documentos/s')
+
+# ============================================
+# LÍNEA BASE
+# ============================================
+
+def compare(report: dict, baseline: dict, accuracy_tolerance: float, max_slowdown: float) -> list:
+    """Regresiones respecto de la línea base"""
+    regressions = []
+
+    for subset, fields in baseline['accuracy'].items():
+        for field, expected in fields.items():
+            actual = report['accuracy'][subset][field]
+            if actual < expected - accuracy_tolerance:
+                regressions.append(f'precisión {field} ({subset}): {actual:.1%} < {expected:.1%}')
+
+    if 'timing' in report and 'timing' in baseline:
+        actual = report['timing']['textsPerSecond']
+        expected = baseline['timing']['textsPerSecond']
+        if actual < expected * (1 - max_slowdown):
+            regressions.append(f'throughput: {actual:.0f} < {expected:.0f} textos/s')
+
+        for field, expected in baseline['timing']['fieldLatencyUs'].items():
+            actual = report['timing']['fieldLatencyUs'][field]
+            if actual > expected * (1 + max_slowdown):
+                regressions.append(f'latencia {field}: {actual:.1f} > {expected:.1f} µs')
+
+    return regressions
+
+def print_report(report: dict, baseline: dict):
+    base_accuracy = baseline.get('accuracy', {})
+    print(f'{"campo":14} {"precisión":>10} {"base":>8} {"con ruido":>10} {"base":>8}')
+    for field in FIELDS:
+        row = [f'{field:14}']
+        for subset in ('all', 'noisy'):
+            row.append(f'{report["accuracy"][subset][field]:10.1%}')
+            expected = base_accuracy.get(subset, {}).get(field)
+            row.append(f'{expected:8.1%}' if expected is not None else f'{"-":>8}')
+        print(' '.join(row))
+
+    if 'timing' in report:
+        base_timing = baseline.get('timing', {})
+        print(f'\nparse_invoice_text: {report["timing"]["textsPerSecond"]:.0f} textos/s (base {base_timing.get("textsPerSecond", 0):.0f})')
+        print(f'{"campo":14} {"µs/texto":>9} {"base":>8}')
+        for field, latency in report['timing']['fieldLatencyUs'].items():
+            expected = base_timing.get('fieldLatencyUs', {}).get(field)
+            print(f'{field:14} {latency:9.1f} ' + (f'{expected:8.1f}' if expected is not None else f'{"-":>8}'))
+
+# ============================================
+# CLI
+# ============================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Rendimiento y precisión del parser sobre el corpus sintético')
+    parser.add_argument('--count', type=int, help='Documentos del corpus (por defecto, los de la línea base)')
+    parser.add_argument('--seed', type=int, help='Semilla del corpus (por defecto, la de la línea base)')
+    parser.add_argument('--repeat', type=int, default=5, help='Pasadas por medición (se toma la mejor)')
+    parser.add_argument('--no-timing', action='store_true', help='Sólo medir precisión')
+    parser.add_argument('--accuracy-tolerance', type=float, default=0.005, help='Caída de precisión tolerada por campo')
+    parser.add_argument('--max-slowdown', type=float, default=0.3, help='Empeoramiento de tiempo tolerado (0.3 = 30%%)')
+    parser.add_argument('--show-errors', type=int, default=0, help='Ejemplos de errores a mostrar por campo')
+    parser.add_argument('--streaming', action='store_true', help='Comparar también con el parseo por bloques')
+    parser.add_argument('--update-baseline', action='store_true', help='Guardar este resultado como línea base')
+    args = parser.parse_args()
+
+    # El parser registra cada campo no encontrado
+    logging.getLogger(invoice_parser.__name__).setLevel(logging.ERROR)
+
+    baseline = json.loads(BASELINE_PATH.read_text(encoding='utf-8')) if BASELINE_PATH.exists() else {}
+    corpus_params = baseline.get('corpus', {'count': 1200, 'seed': 0, 'noise': 0.5})
+    count = args.count or corpus_params['count']
+    seed = corpus_params['seed'] if args.seed is None else args.seed
+    if (count, seed) != (corpus_params['count'], corpus_params['seed']) and not args.update_baseline:
+        # Otro corpus: la línea base no es comparable
+        baseline = {}
+
+    corpus = generate_corpus(count, seed, corpus_params['noise'])
+    texts = [document['text'] for document in corpus]
+    print(f'Corpus: {count} documentos (semilla {seed}, {sum(d["noisy"] for d in corpus)} con ruido)')
+
+    report = {
+        'corpus': {'count': count, 'seed': seed, 'noise': corpus_params['noise']},
+        'accuracy': measure_accuracy(corpus, [parse_invoice_text(text) for text in texts], args.show_errors)
+    }
+    if not args.no_timing:
+        report['timing'] = measure_timing(texts, args.repeat)
+
+    print_report(report, baseline)
+    if args.streaming:
+        print_streaming(corpus, report, args.repeat)
+
+    if args.update_baseline:
+        if args.no_timing and 'timing' in baseline:
+            report['timing'] = baseline['timing']
+        BASELINE_PATH.write_text(json.dumps(report, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
+        print(f'\n✓ Línea base guardada en {BASELINE_PATH.name}')
+        return
+
+    if not baseline:
+        print('\nSin línea base comparable (usar --update-baseline para guardarla)')
+        return
+
+    regressions = compare(report, baseline, args.accuracy_tolerance, args.max_slowdown)
+    if regressions:
+        print()
+        for regression in regressions:
+            print(f'✗ {regression}')
+        sys.exit(1)
+    print('\n✓ Sin regresiones respecto de la línea base')
+
+if __name__ == '__main__':
+    main()
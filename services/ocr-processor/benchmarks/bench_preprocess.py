@@ -0,0 +1,70 @@
+"""
+Benchmark del pre-procesamiento de imágenes
+Mide bytes antes/después y tiempo por imagen sobre un directorio de muestras
+
+Uso:
+    python benchmarks/bench_preprocess.py tests/fixtures/
+    python benchmarks/bench_preprocess.py fotos/ --max-long-edge 2000 --max-bytes 1000000
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from preprocess import preprocess_image  # noqa: E402
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de preprocess_image')
+    parser.add_argument('directory', help='Directorio con imágenes de muestra')
+    parser.add_argument('--max-long-edge', type=int, default=2500)
+    parser.add_argument('--target-dpi', type=int, default=300)
+    parser.add_argument('--max-bytes', type=int, default=1_500_000)
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones por imagen')
+    args = parser.parse_args()
+
+    paths = sorted(p for p in Path(args.directory).rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if not paths:
+        print(f'No se encontraron imágenes en {args.directory}')
+        sys.exit(1)
+
+    total_before = total_after = 0
+    timings_ms = []
+
+    print(f'{"imagen":40} {"antes":>12} {"después":>12} {"reducción":>10} {"ms":>8}')
+    for path in paths:
+        original = path.read_bytes()
+        runs = []
+
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            processed = preprocess_image(
+                original,
+                max_long_edge=args.max_long_edge,
+                target_dpi=args.target_dpi,
+                max_bytes=args.max_bytes
+            )
+            runs.append((time.perf_counter() - started) * 1000)
+
+        elapsed_ms = statistics.median(runs)
+        timings_ms.append(elapsed_ms)
+        total_before += len(original)
+        total_after += len(processed)
+
+        print(
+            f'{path.name[:40]:40} {len(original):>12,} {len(processed):>12,} '
+            f'{1 - len(processed) / len(original):>10.1%} {elapsed_ms:>8.1f}'
+        )
+
+    print()
+    print(f'Imágenes: {len(paths)}')
+    print(f'Bytes totales: {total_before:,} -> {total_after:,} ({1 - total_after / total_before:.1%} menos)')
+    print(f'Tiempo por imagen: mediana {statistics.median(timings_ms):.1f} ms, máximo {max(timings_ms):.1f} ms')
+
+if __name__ == '__main__':
+    main()
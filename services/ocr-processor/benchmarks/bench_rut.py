@@ -0,0 +1,62 @@
+"""
+Benchmark de la validación de RUTs (rut.py)
+Compara validar una columna de RUTs uno por uno (validate_rut) con la
+validación en lote (validate_ruts, NumPy), y verifica que den lo mismo.
+La columna mezcla formatos (con y sin puntos, dv en minúscula, sin guión)
+y RUTs inválidos, como en una exportación de contribuyentes
+
+Uso:
+    python benchmarks/bench_rut.py
+    python benchmarks/bench_rut.py --rows 1000000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from rut import compute_dv, parse_rut, validate_rut, validate_ruts  # noqa: E402
+
+def synthetic_column(rows: int, rng: random.Random) -> list:
+    """RUTs en formatos variados; ~1 de cada 4 con dígito verificador incorrecto"""
+    column = []
+    for _ in range(rows):
+        number = rng.randint(1_000_000, 99_999_999)
+        dv = compute_dv(number) if rng.random() < 0.75 else rng.choice('0123456789K')
+        style = rng.randrange(4)
+        if style == 0:
+            column.append(f'{number:,}'.replace(',', '.') + f'-{dv}')
+        elif style == 1:
+            column.append(f'{number}-{dv.lower()}')
+        elif style == 2:
+            column.append(f'{number}{dv}')
+        else:
+            column.append(f' {number:,}'.replace(',', '.') + f' - {dv}')
+    return column
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de validación de RUTs')
+    parser.add_argument('--rows', type=int, default=200000)
+    args = parser.parse_args()
+
+    column = synthetic_column(args.rows, random.Random(0))
+
+    parse_rut.cache_clear()
+    started = time.perf_counter()
+    expected = [validate_rut(rut) for rut in column]
+    scalar_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    batch = validate_ruts(column)
+    batch_ms = (time.perf_counter() - started) * 1000
+
+    assert batch.tolist() == expected, 'validate_ruts difiere de validate_rut'
+    print(f'{args.rows} RUTs, {sum(expected)} válidos')
+    print(f'uno por uno     {scalar_ms:8.1f} ms')
+    print(f'en lote (NumPy) {batch_ms:8.1f} ms   x{scalar_ms / batch_ms:.1f}')
+
+if __name__ == '__main__':
+    main()
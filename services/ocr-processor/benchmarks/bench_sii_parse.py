@@ -0,0 +1,164 @@
+"""
+Benchmark del parseo de respuestas del SII (parse_sii_response)
+Compara el parseo con lxml + XPath de sii.py con el anterior (BeautifulSoup
+con html.parser recorriendo todas las filas): verifica que ambos den el mismo
+dict y reporta CPU (µs por respuesta) y memoria por consulta: el pico de
+tracemalloc cuenta sólo objetos de Python, no el árbol en C de lxml.
+Con HTML mal formado (ej: <td> sin cerrar) lxml cierra las celdas según las
+reglas de HTML y html.parser las anida; esas diferencias se listan aparte
+
+Sin argumentos usa páginas sintéticas con la estructura de la consulta de
+situación tributaria (menús, scripts, tabla "cuadro" con los datos y tabla de
+actividades); también acepta respuestas guardadas del SII (archivos .html o directorios)
+
+Uso:
+    python benchmarks/bench_sii_parse.py
+    python benchmarks/bench_sii_parse.py respuestas_sii/ --repeat 20
+"""
+
+import argparse
+import logging
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+import sii  # noqa: E402
+from rut import compute_dv  # noqa: E402
+from sii import parse_sii_response  # noqa: E402
+
+# ============================================
+# PARSEO ANTERIOR (REFERENCIA)
+# ============================================
+
+def parse_with_soup(html: str, rut: str):
+    """parse_sii_response tal como estaba con BeautifulSoup"""
+    soup = BeautifulSoup(html, 'html.parser')
+    table = soup.find('table', {'class': 'cuadro'}) or soup.find('table')
+    if not table:
+        return None
+
+    data = {'rut': rut, 'razonSocial': None, 'giro': None, 'actividadEconomica': None,
+            'direccion': None, 'comuna': None, 'region': None}
+    for row in table.find_all('tr'):
+        cells = row.find_all(['td', 'th'])
+        if len(cells) >= 2:
+            label = cells[0].get_text(strip=True).lower()
+            value = cells[1].get_text(strip=True)
+            if 'razón social' in label or 'nombre' in label:
+                data['razonSocial'] = value
+            elif 'giro' in label:
+                data['giro'] = value
+            elif 'actividad' in label:
+                data['actividadEconomica'] = value
+            elif 'dirección' in label or 'domicilio' in label:
+                data['direccion'] = value
+            elif 'comuna' in label:
+                data['comuna'] = value
+            elif 'región' in label:
+                data['region'] = value
+    return data if data['razonSocial'] else None
+
+# ============================================
+# PÁGINAS
+# ============================================
+
+def synthetic_page(rng: random.Random, index: int) -> str:
+    """Página con la forma de la consulta del SII; algunas sin clase "cuadro" o sin datos"""
+    number = rng.randint(1_000_000, 99_999_999)
+    menu = ''.join(f'<li><a href="/menu/{i}.html">Opción&nbsp;{i}</a></li>' for i in range(60))
+    activities = ''.join(
+        f'<tr><td>{rng.randint(100000, 999999)}</td><td>Actividad {i}</td><td>Primera</td><td>Sí</td></tr>'
+        for i in range(rng.randint(1, 8))
+    )
+    style = index % 5
+    table_class = '' if style == 1 else ' class="cuadro tabla"'
+    rows = (
+        f'<TR><TH>Nombre o Raz&oacute;n Social</TH><TD> EMPRESA {number} S.A. <!-- fin --></TD></TR>'
+        f'<tr><td>RUT Contribuyente</td><td>{number}-{compute_dv(number)}</td></tr>'
+        f'<tr><td>Giro</td><td><b>Comercio</b> al por mayor</td></tr>'
+        f'<tr><td>Actividad económica principal</td><td>{rng.randint(100000, 999999)}<script>track()</script></td></tr>'
+        f'<tr><td>Dirección</td><td>Av. Principal {rng.randint(1, 9999)}<br>Of. 21</td></tr>'
+        '<tr><td>Comuna</td><td>Santiago</td></tr>'
+        '<tr><td>Región</td><td>Metropolitana</td></tr>'
+    )
+    if style == 4:
+        rows = '<tr><td colspan="2">El RUT ingresado no se encuentra registrado</td></tr>'
+    return (
+        '<!DOCTYPE html><html><head><meta charset="iso-8859-1"><title>SII</title>'
+        '<style>td { font-size: 10px }</style><script>var a = "<table>";</script></head>'
+        f'<body><div id="menu"><ul>{menu}</ul></div>'
+        '<table width="100%"><tr><td><img src="logo.gif"></td><td>Servicio de Impuestos Internos</td></tr></table>'
+        f'<table{table_class}>{rows}</table>'
+        f'<table class="tabla">{activities}</table>'
+        '<p>Fecha de consulta</p></body></html>'
+    )
+
+def load_pages(paths, count: int):
+    if not paths:
+        rng = random.Random(0)
+        return [synthetic_page(rng, index) for index in range(count)]
+
+    pages = []
+    for path in map(Path, paths):
+        files = sorted(path.glob('*.html')) if path.is_dir() else [path]
+        pages.extend(file.read_text(encoding='utf-8', errors='replace') for file in files)
+    return pages
+
+# ============================================
+# MEDICIÓN
+# ============================================
+
+def best_us(fn, pages, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for page in pages:
+            fn(page, '1-9')
+        best = min(best, time.perf_counter() - started)
+    return best * 1e6 / len(pages)
+
+def peak_kb(fn, pages) -> float:
+    """Pico promedio por respuesta de la memoria de Python (tracemalloc)"""
+    total = 0
+    for page in pages:
+        tracemalloc.start()
+        fn(page, '1-9')
+        total += tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return total / len(pages) / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del parseo de respuestas del SII')
+    parser.add_argument('paths', nargs='*', help='Respuestas HTML guardadas (archivos o directorios)')
+    parser.add_argument('--count', type=int, default=200, help='Páginas sintéticas (sin respuestas guardadas)')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # Las páginas sin datos registran una advertencia por respuesta
+    logging.getLogger(sii.__name__).setLevel(logging.ERROR)
+
+    pages = load_pages(args.paths, args.count)
+    found = 0
+    mismatches = 0
+    for index, page in enumerate(pages):
+        result, expected = parse_sii_response(page, '1-9'), parse_with_soup(page, '1-9')
+        found += result is not None
+        if result != expected:
+            mismatches += 1
+            print(f'✗ respuesta #{index}: lxml {result} / BeautifulSoup {expected}')
+    print(f'{len(pages)} respuestas ({found} con datos), {len(pages) - mismatches} con el mismo resultado en ambos parseos')
+
+    soup_us, lxml_us = best_us(parse_with_soup, pages, args.repeat), best_us(parse_sii_response, pages, args.repeat)
+    soup_kb, lxml_kb = peak_kb(parse_with_soup, pages), peak_kb(parse_sii_response, pages)
+    print(f'{"":22} {"µs/resp":>9} {"KB Python":>9}')
+    print(f'{"BeautifulSoup":22} {soup_us:9.0f} {soup_kb:9.0f}')
+    print(f'{"lxml + XPath":22} {lxml_us:9.0f} {lxml_kb:9.0f}   x{soup_us / lxml_us:.1f} CPU, x{soup_kb / lxml_kb:.1f} memoria Python')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""
+Generador de textos OCR sintéticos de documentos tributarios chilenos
+Cada documento trae su verdad (lo que dice el documento, no lo que extrae el
+parser) con las mismas claves que parse_invoice_text, para medir precisión.
+Cubre todos los tipos de TIPO_DOC_PATTERNS, fechas y montos en los formatos
+habituales, y ruido típico del OCR: tildes perdidas, confusiones O/0 y S/$,
+variantes de "N°", espacios y saltos de línea de más, líneas unidas, bordes
+de tabla y bloques leídos en otro orden. Con la misma semilla genera siempre
+el mismo corpus
+
+Uso:
+    python benchmarks/corpus.py --count 1000 --output corpus.jsonl
+    python benchmarks/corpus.py --count 20 --seed 7 --noise 1.0   # imprime en pantalla
+"""
+
+import argparse
+import json
+import random
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from parser import MESES, TIPO_DOC_PATTERNS  # noqa: E402
+from rut import compute_dv  # noqa: E402
+
+# Campos con verdad conocida (claves de parse_invoice_text)
+FIELDS = ('type', 'number', 'date', 'emisorRut', 'receptorRut', 'netoAmount', 'ivaAmount', 'totalAmount')
+
+# ============================================
+# VOCABULARIO
+# ============================================
+
+# Títulos impresos por tipo de documento (nombres del SII)
+DOC_TITLES = {
+    'factura': ['FACTURA ELECTRÓNICA'],
+    'boleta': ['BOLETA ELECTRÓNICA'],
+    'nota_credito': ['NOTA DE CRÉDITO ELECTRÓNICA'],
+    'nota_debito': ['NOTA DE DÉBITO ELECTRÓNICA'],
+    'guia_despacho': ['GUÍA DE DESPACHO ELECTRÓNICA'],
+    'factura_exenta': ['FACTURA EXENTA ELECTRÓNICA', 'FACTURA NO AFECTA O EXENTA ELECTRÓNICA'],
+}
+assert set(DOC_TITLES) == set(TIPO_DOC_PATTERNS), 'Falta el título de algún tipo de documento del parser'
+
+COMPANY_NAMES = [
+    'COMERCIAL LOS ANDES SPA', 'DISTRIBUIDORA DEL PACÍFICO LTDA', 'INVERSIONES SANTA ROSA S.A.',
+    'FERRETERÍA EL MAESTRO LIMITADA', 'SERVICIOS INFORMÁTICOS AUSTRAL SPA', 'TRANSPORTES CORDILLERA LTDA',
+    'ALIMENTOS DEL SUR S.A.', 'CONSTRUCTORA VALLE CENTRAL SPA', 'LIBRERÍA NACIONAL LIMITADA',
+    'IMPORTADORA ORIENTE EIRL'
+]
+GIROS = [
+    'VENTA AL POR MAYOR DE ARTÍCULOS DE FERRETERÍA', 'SERVICIOS DE CONSULTORÍA INFORMÁTICA',
+    'TRANSPORTE DE CARGA POR CARRETERA', 'VENTA AL POR MENOR DE ALIMENTOS', 'CONSTRUCCIÓN DE EDIFICIOS',
+    'COMERCIALIZACIÓN DE INSUMOS DE OFICINA'
+]
+STREETS = ['AV. PROVIDENCIA', 'AV. LIBERTADOR BERNARDO O\'HIGGINS', 'CALLE MONEDA', 'AV. APOQUINDO', 'PASAJE LOS AROMOS']
+COMUNAS = ['SANTIAGO', 'PROVIDENCIA', 'LAS CONDES', 'ÑUÑOA', 'MAIPÚ', 'CONCEPCIÓN', 'VALPARAÍSO', 'TEMUCO']
+SII_OFFICES = ['SANTIAGO CENTRO', 'SANTIAGO ORIENTE', 'PROVIDENCIA', 'CONCEPCIÓN', 'VALPARAÍSO']
+PRODUCTS = [
+    'TORNILLO AUTOPERFORANTE 8X1', 'RESMA PAPEL CARTA 75G', 'CABLE ELÉCTRICO 2,5MM', 'SERVICIO MANTENCIÓN MENSUAL',
+    'CEMENTO SACO 25KG', 'TONER IMPRESORA LÁSER', 'FLETE SANTIAGO - RANCAGUA', 'ACEITE MAVESA 1L',
+    'LICENCIA SOFTWARE ANUAL', 'GUANTES NITRILO CAJA 100'
+]
+MONTH_NAMES = list(MESES)
+
+# ============================================
+# FORMATOS
+# ============================================
+
+def _money(value: int) -> str:
+    return f'{value:,}'.replace(',', '.')
+
+def _random_rut(rng: random.Random, company: bool) -> int:
+    # Empresas sobre 50 millones, personas naturales bajo 30 millones
+    return rng.randint(50_000_000, 99_999_999) if company else rng.randint(3_000_000, 29_999_999)
+
+def _rut_texts(number: int, rng: random.Random):
+    """(texto impreso, forma normalizada)"""
+    dv = compute_dv(number)
+    normalized = f'{_money(number)}-{dv}'
+    style = rng.random()
+    if style < 0.7:
+        return normalized, normalized
+    if style < 0.85:
+        return f'{number}-{dv}', normalized
+    return f'{_money(number)}-{dv.lower()}', normalized
+
+def _date_text(year: int, month: int, day: int, rng: random.Random) -> str:
+    style = rng.randrange(7)
+    if style == 0:
+        return f'{day:02d}/{month:02d}/{year}'
+    if style == 1:
+        return f'{day:02d}-{month:02d}-{year}'
+    if style == 2:
+        return f'{day:02d}.{month:02d}.{year}'
+    if style == 3:
+        return f'{day}/{month}/{year % 100:02d}'
+    if style == 4:
+        return f'{day} de {MONTH_NAMES[month - 1]} de {year}'
+    if style == 5:
+        return f'{day} {MONTH_NAMES[month - 1].upper()} {year}'
+    return f'{day} de {MONTH_NAMES[month - 1][:3].capitalize()} de {year}'
+
+def _amount_text(value: int, rng: random.Random) -> str:
+    style = rng.random()
+    if style < 0.6:
+        return f'$ {_money(value)}'
+    if style < 0.85:
+        return f'${_money(value)}'
+    return _money(value)
+
+# ============================================
+# RUIDO DE OCR
+# ============================================
+
+_ACCENTS = str.maketrans('ÁÉÍÓÚáéíóú', 'AEIOUaeiou')
+_LETTER_CONFUSIONS = {'O': '0', 'I': 'l', 'S': '5', 'B': '8'}
+_NUMBER_SIGNS = ['N°', 'Nº', 'N °', 'No', 'Nro.', "N'"]
+
+def _confuse_letters(line: str, rng: random.Random) -> str:
+    """Confundir algunas letras de palabras (no de números) con dígitos"""
+    chars = list(line)
+    for i, char in enumerate(chars):
+        if char in _LETTER_CONFUSIONS and rng.random() < 0.15:
+            chars[i] = _LETTER_CONFUSIONS[char]
+    return ''.join(chars)
+
+def _noisy_lines(lines: List[str], rng: random.Random) -> List[str]:
+    result = []
+    for line in lines:
+        if rng.random() < 0.3:
+            line = line.translate(_ACCENTS)
+        if rng.random() < 0.1:
+            line = _confuse_letters(line, rng)
+        if rng.random() < 0.1:
+            line = line.replace('$', 'S')
+        if rng.random() < 0.1:
+            line = line.replace(' ', '  ', rng.randint(1, 3))
+        if rng.random() < 0.05:
+            line = f'| {line} |'
+
+        if result and rng.random() < 0.08:
+            # Dos líneas leídas como una
+            result[-1] = f'{result[-1]} {line}'
+        else:
+            result.append(line)
+
+        if rng.random() < 0.05:
+            result.append('')
+    return result
+
+# ============================================
+# DOCUMENTO
+# ============================================
+
+def synthetic_invoice(rng: random.Random, doc_type: Optional[str] = None, noisy: bool = False) -> Dict[str, Any]:
+    """
+    Un documento tributario sintético
+
+    Args:
+        rng: Generador aleatorio (fija el resultado)
+        doc_type: Tipo de TIPO_DOC_PATTERNS; aleatorio si no se indica
+        noisy: Aplicar ruido de OCR
+
+    Returns:
+        Dict con `text` (texto OCR) y `truth` (valores de FIELDS)
+    """
+    doc_type = doc_type or rng.choice(list(DOC_TITLES))
+    folio = rng.randint(1, 999999)
+    year, month, day = rng.randint(2019, 2025), rng.randint(1, 12), rng.randint(1, 28)
+
+    emisor_text, emisor_rut = _rut_texts(_random_rut(rng, company=True), rng)
+    has_receptor = doc_type != 'boleta'
+    receptor_text, receptor_rut = _rut_texts(_random_rut(rng, company=rng.random() < 0.7), rng)
+
+    # Bloque del emisor y recuadro con RUT, tipo y folio
+    emisor_block = [
+        rng.choice(COMPANY_NAMES),
+        f'Giro: {rng.choice(GIROS)}',
+        f'{rng.choice(STREETS)} {rng.randint(100, 9999)}',
+        f'{rng.choice(COMUNAS)} - CHILE'
+    ]
+    folio_text = str(folio).zfill(rng.choice([0, 6, 8]))
+    number_sign = rng.choice(_NUMBER_SIGNS) if noisy and rng.random() < 0.3 else 'N°'
+    box = [
+        f'{rng.choice(["R.U.T.:", "RUT:", "R.U.T"])} {emisor_text}',
+        rng.choice(DOC_TITLES[doc_type]),
+        f'{number_sign} {folio_text}',
+        f'S.I.I. - {rng.choice(SII_OFFICES)}'
+    ]
+    # El OCR a veces lee primero el recuadro de la derecha
+    header = box + emisor_block if rng.random() < 0.3 else emisor_block + box
+
+    lines = header + [f'{rng.choice(["Fecha Emisión:", "Fecha:", "FECHA EMISION"])} {_date_text(year, month, day, rng)}']
+
+    if has_receptor:
+        lines += [
+            f'{rng.choice(["Señor(es):", "SEÑORES:", "Cliente:"])} {rng.choice(COMPANY_NAMES)}',
+            f'{rng.choice(["R.U.T.:", "RUT:"])} {receptor_text}',
+            f'Giro: {rng.choice(GIROS)}',
+            f'Dirección: {rng.choice(STREETS)} {rng.randint(100, 9999)}',
+            f'Comuna: {rng.choice(COMUNAS)}'
+        ]
+
+    if doc_type in ('nota_credito', 'nota_debito') and rng.random() < 0.5:
+        lines.append(f'Referencia: Factura Electrónica N° {rng.randint(1, folio)} del {rng.randint(1, 28):02d}/{month:02d}/{year}')
+
+    # Detalle
+    lines.append(rng.choice(['Código Descripción Cantidad Precio Valor', 'Cant. Detalle P. Unitario Monto', 'ITEM DESCRIPCION CANT PRECIO']))
+    neto = 0
+    for _ in range(rng.randint(1, 12)):
+        quantity = rng.randint(1, 20)
+        price = rng.randint(5, 5000) * 10
+        line_total = quantity * price
+        neto += line_total
+        lines.append(
+            f'{rng.randint(1000, 99999)} {rng.choice(PRODUCTS)} {quantity} '
+            f'{_amount_text(price, rng)} {_amount_text(line_total, rng)}'
+        )
+
+    # Totales según el tipo de documento
+    truth_neto = truth_iva = None
+    if doc_type == 'factura_exenta':
+        total = neto
+        lines += [f'MONTO EXENTO {_amount_text(neto, rng)}', f'TOTAL {_amount_text(total, rng)}']
+    elif doc_type == 'boleta':
+        total = neto
+        lines.append(f'{rng.choice(["TOTAL", "TOTAL A PAGAR"])} {_amount_text(total, rng)}')
+        if rng.random() < 0.5:
+            lines.append(f'El IVA de esta boleta es {_amount_text(round(total * 19 / 119), rng)}')
+    else:
+        iva = round(neto * 0.19)
+        total = neto + iva
+        truth_neto, truth_iva = float(neto), float(iva)
+        lines += [
+            f'{rng.choice(["MONTO NETO", "NETO", "SUBTOTAL"])} {_amount_text(neto, rng)}',
+            f'{rng.choice(["I.V.A. 19%", "IVA", "IVA:"])} {_amount_text(iva, rng)}',
+            f'{rng.choice(["TOTAL", "MONTO TOTAL", "TOTAL A PAGAR"])} {_amount_text(total, rng)}'
+        ]
+
+    lines += ['Timbre Electrónico SII', 'Res. 80 de 2014 Verifique documento: www.sii.cl']
+
+    if noisy:
+        lines = _noisy_lines(lines, rng)
+
+    return {
+        'text': '\n'.join(lines) + '\n',
+        'noisy': noisy,
+        'truth': {
+            'type': doc_type,
+            'number': folio,
+            'date': f'{year}-{month:02d}-{day:02d}',
+            'emisorRut': emisor_rut,
+            'receptorRut': receptor_rut if has_receptor else None,
+            'netoAmount': truth_neto,
+            'ivaAmount': truth_iva,
+            'totalAmount': float(total)
+        }
+    }
+
+def generate_corpus(count: int, seed: int = 0, noise: float = 0.5) -> List[Dict[str, Any]]:
+    """
+    Corpus de `count` documentos, repartidos en partes iguales entre los tipos
+
+    Args:
+        count: Cantidad de documentos
+        seed: Semilla (mismo corpus para la misma semilla)
+        noise: Fracción de documentos con ruido de OCR
+    """
+    rng = random.Random(seed)
+    doc_types = list(DOC_TITLES)
+    return [
+        dict(synthetic_invoice(rng, doc_types[i % len(doc_types)], noisy=rng.random() < noise), id=f'sintetico-{i:06d}')
+        for i in range(count)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description='Generar textos OCR sintéticos con su verdad')
+    parser.add_argument('--count', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--noise', type=float, default=0.5, help='Fracción de documentos con ruido de OCR')
+    parser.add_argument('--output', help='Archivo JSONL (por defecto, a la salida estándar)')
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.count, args.seed, args.noise)
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for document in corpus:
+            # `ocrRawText` para poder pasar el corpus directo a src/reparse.py
+            record = {'id': document['id'], 'ocrRawText': document['text'], 'noisy': document['noisy'], 'truth': document['truth']}
+            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+    finally:
+        if args.output:
+            output.close()
+
+if __name__ == '__main__':
+    main()
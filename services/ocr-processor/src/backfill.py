@@ -0,0 +1,357 @@
+"""
+Carga masiva (backfill) de facturas históricas
+Procesa un directorio de imágenes o un manifiesto JSONL con el mismo
+OCR -> Parser -> SII que el procesador, en paralelo, y escribe los resultados
+a un archivo JSONL o directamente a Firestore en lotes.
+Un archivo de checkpoint registra los items terminados para poder reanudar
+sin repetir llamadas a Vision (los items con error se reintentan al reanudar)
+
+Uso:
+    python src/backfill.py --input facturas/ --output resultados.jsonl
+    python src/backfill.py --input manifiesto.jsonl --firestore --company-id abc123 --workers 8
+
+Formato del manifiesto (una línea por factura; `id` y `companyId` opcionales):
+    {"path": "facturas/0001.jpg", "id": "f-0001", "companyId": "abc123"}
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Set
+
+from config import validate_config
+from main import ocr_step, parse_step, sii_step
+from ocr import preprocess_image_if_needed
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.tif', '.tiff', '.bmp', '.pdf'}
+
+# ============================================
+# ENTRADA
+# ============================================
+
+def _item_id(path: Path) -> str:
+    """Id estable para un archivo sin id explícito"""
+    return hashlib.sha1(str(path).encode('utf-8')).hexdigest()[:20]
+
+def iter_items(input_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Recorrer los items a procesar
+
+    Args:
+        input_path: Directorio con imágenes o archivo de manifiesto .jsonl
+
+    Yields:
+        Dicts con `id`, `path` y los metadatos del manifiesto
+    """
+    source = Path(input_path)
+
+    if source.is_dir():
+        for path in sorted(source.rglob('*')):
+            if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS:
+                yield {'id': _item_id(path.relative_to(source)), 'path': str(path)}
+        return
+
+    with open(source, encoding='utf-8') as manifest:
+        for line_number, line in enumerate(manifest, start=1):
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.error(f'Línea {line_number} inválida en el manifiesto: {e}')
+                continue
+
+            path = Path(item['path'])
+            if not path.is_absolute():
+                # Rutas relativas al manifiesto
+                path = source.parent / path
+            item['path'] = str(path)
+            item.setdefault('id', _item_id(path))
+            yield item
+
+# ============================================
+# CHECKPOINT
+# ============================================
+
+def load_checkpoint(checkpoint_path: Path) -> Set[str]:
+    """Leer los ids ya terminados"""
+    if not checkpoint_path.exists():
+        return set()
+
+    with open(checkpoint_path, encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+class Checkpoint:
+    """Archivo append-only con un id terminado por línea"""
+
+    def __init__(self, path: Path):
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def mark_done(self, item_ids: List[str]):
+        for item_id in item_ids:
+            self._file.write(item_id + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+# ============================================
+# SALIDA
+# ============================================
+
+def _successful_ids(results: List[Dict[str, Any]]) -> List[str]:
+    # Los items con error no se marcan: al reanudar se reintentan
+    return [result['id'] for result in results if result.get('status') == 'ocr_done']
+
+class JsonlSink:
+    """
+    Escribe un resultado por línea; el item queda terminado apenas se escribe
+
+    Los items con error se reintentan al reanudar y vuelven a escribirse: al
+    cerrar, el archivo se reescribe con una sola línea por id (la última)
+    """
+
+    def __init__(self, path: str, checkpoint: Checkpoint):
+        self._path = Path(path)
+        self._checkpoint = checkpoint
+        self._ids = set()
+        self._needs_compaction = False
+
+        # Ids ya escritos por ejecuciones anteriores (incluida una que se cortó antes de compactar)
+        if self._path.exists():
+            for result in self._read_results():
+                self._needs_compaction |= result.get('id') in self._ids
+                self._ids.add(result.get('id'))
+
+        self._file = open(self._path, 'a', encoding='utf-8')
+        if self._path.stat().st_size and not self._ends_with_newline():
+            # No pegar el próximo resultado a una línea cortada
+            self._file.write('\n')
+
+    def write(self, result: Dict[str, Any]):
+        self._file.write(json.dumps(result, ensure_ascii=False, default=str) + '\n')
+        self._file.flush()
+        self._needs_compaction |= result.get('id') in self._ids
+        self._ids.add(result.get('id'))
+        self._checkpoint.mark_done(_successful_ids([result]))
+
+    def close(self):
+        self._file.close()
+        if self._needs_compaction:
+            self._compact()
+
+    def _read_results(self) -> Iterator[Dict[str, Any]]:
+        with open(self._path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Línea cortada por una ejecución interrumpida: se descarta al compactar
+                    logger.warning(f'Línea {line_number} inválida en {self._path}, se descarta')
+                    self._needs_compaction = True
+
+    def _ends_with_newline(self) -> bool:
+        with open(self._path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def _compact(self):
+        """Dejar la última línea de cada id, en el orden en que apareció cada id"""
+        # Reasignar una clave del dict conserva su posición: orden de la primera aparición, contenido de la última
+        latest: Dict[Any, Dict[str, Any]] = {}
+        for result in self._read_results():
+            latest[result.get('id')] = result
+
+        # Escritura atómica: una interrupción deja el archivo anterior completo
+        fd, tmp_path = tempfile.mkstemp(dir=self._path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+            for result in latest.values():
+                tmp.write(json.dumps(result, ensure_ascii=False, default=str) + '\n')
+        os.replace(tmp_path, self._path)
+        logger.info(f'✓ {self._path}: una línea por item ({len(latest)} items)')
+
+class FirestoreSink:
+    """Acumula resultados y los escribe en lotes; el checkpoint avanza al confirmar cada lote"""
+
+    def __init__(self, company_id: Optional[str], checkpoint: Checkpoint, batch_size: int = 400):
+        self._company_id = company_id
+        self._checkpoint = checkpoint
+        self._batch_size = batch_size
+        self._pending: List[Dict[str, Any]] = []
+
+    def write(self, result: Dict[str, Any]):
+        self._pending.append(result)
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+
+        from firebase_client import bulk_write_invoices
+
+        written = bulk_write_invoices(self._pending, default_company_id=self._company_id)
+        if written != len(self._pending):
+            raise RuntimeError(f'Sólo se escribieron {written} de {len(self._pending)} facturas en Firestore')
+
+        self._checkpoint.mark_done(_successful_ids(self._pending))
+        self._pending = []
+
+    def close(self):
+        self.flush()
+
+# ============================================
+# PROCESAMIENTO
+# ============================================
+
+def process_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Procesar un item (OCR -> Parser -> SII) y retornar el resultado a escribir"""
+    result = {k: v for k, v in item.items() if k != 'path'}
+    result['source'] = item['path']
+
+    try:
+        job = {'image_bytes': preprocess_image_if_needed(Path(item['path']).read_bytes())}
+
+        ocr_step(job)
+        parse_step(job)
+        sii_step(job)
+
+        result.update({
+            'status': 'ocr_done',
+            'ocrRawText': job['text'],
+            'ocrConfidence': job['confidence'],
+            **{k: v for k, v in job['parsed_data'].items() if v is not None and k != 'raw_matches'}
+        })
+    except Exception as e:
+        logger.error(f'✗ Error en {item["path"]}: {e}')
+        result.update({'status': 'error', 'errorMessage': str(e)})
+
+    return result
+
+def run_backfill(
+    input_path: str,
+    sink,
+    checkpoint_path: Path,
+    workers: int = 4,
+    limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Procesar todos los items pendientes en paralelo (máximo `workers * 2` en vuelo)
+
+    Returns:
+        Estadísticas de la ejecución
+    """
+    done = load_checkpoint(checkpoint_path)
+    if done:
+        logger.info(f'Reanudando: {len(done)} items ya procesados según el checkpoint')
+
+    stats = {'processed': 0, 'failed': 0, 'skipped': 0}
+    started = time.monotonic()
+    max_in_flight = max(1, workers) * 2
+
+    def handle(result: Dict[str, Any]):
+        sink.write(result)
+        stats['processed' if result['status'] == 'ocr_done' else 'failed'] += 1
+
+        total = stats['processed'] + stats['failed']
+        if total % 50 == 0:
+            elapsed = time.monotonic() - started
+            logger.info(f'Progreso: {total} items ({total / elapsed:.2f} items/s)')
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        in_flight = set()
+
+        for item in iter_items(input_path):
+            if item['id'] in done:
+                stats['skipped'] += 1
+                continue
+
+            if limit is not None and stats['processed'] + stats['failed'] + len(in_flight) >= limit:
+                break
+
+            if len(in_flight) >= max_in_flight:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    handle(future.result())
+
+            in_flight.add(executor.submit(process_item, item))
+
+        for future in in_flight:
+            handle(future.result())
+
+    stats['elapsedSeconds'] = time.monotonic() - started
+    total = stats['processed'] + stats['failed']
+    stats['itemsPerSecond'] = total / stats['elapsedSeconds'] if stats['elapsedSeconds'] > 0 else 0.0
+    return stats
+
+# ============================================
+# CLI
+# ============================================
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Backfill de facturas históricas con OCR')
+    parser.add_argument('--input', required=True, help='Directorio de imágenes o manifiesto .jsonl')
+    parser.add_argument('--output', help='Archivo JSONL de resultados')
+    parser.add_argument('--firestore', action='store_true', help='Escribir resultados en Firestore')
+    parser.add_argument('--company-id', help='Empresa destino para items sin companyId (con --firestore)')
+    parser.add_argument('--workers', type=int, default=4, help='Items procesados en paralelo')
+    parser.add_argument('--checkpoint', help='Archivo de checkpoint (por defecto <input>.checkpoint)')
+    parser.add_argument('--limit', type=int, help='Procesar como máximo N items')
+    args = parser.parse_args(argv)
+
+    if bool(args.output) == bool(args.firestore):
+        parser.error('Indicar exactamente uno de --output o --firestore')
+
+    try:
+        validate_config()
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+    checkpoint_path = Path(args.checkpoint or f'{args.input.rstrip("/")}.checkpoint')
+    checkpoint = Checkpoint(checkpoint_path)
+
+    if args.firestore:
+        from firebase_client import initialize_firebase
+        initialize_firebase()
+        sink = FirestoreSink(args.company_id, checkpoint)
+    else:
+        sink = JsonlSink(args.output, checkpoint)
+
+    try:
+        stats = run_backfill(args.input, sink, checkpoint_path, workers=args.workers, limit=args.limit)
+    except BaseException:
+        # Cerrar sin tapar el error original (ej: el último lote de Firestore también falla)
+        for resource in (sink, checkpoint):
+            try:
+                resource.close()
+            except Exception as e:
+                logger.error(f'Error al cerrar {type(resource).__name__}: {e}')
+        raise
+
+    try:
+        sink.close()
+    finally:
+        checkpoint.close()
+
+    logger.info(
+        f'✓ Backfill terminado: {stats["processed"]} procesados, {stats["failed"]} con error, '
+        f'{stats["skipped"]} omitidos por checkpoint en {stats["elapsedSeconds"]:.1f}s '
+        f'({stats["itemsPerSecond"]:.2f} items/s)'
+    )
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
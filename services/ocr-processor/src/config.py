@@ -1,4 +1,5 @@
 import os
+import socket
 from pathlib import Path
 from dotenv import load_dotenv
 import logging
@@ -45,6 +46,105 @@ logging.basicConfig(
 MAX_RETRIES = int(os.getenv('MAX_RETRIES', '3'))
 SII_CACHE_EXPIRY_DAYS = int(os.getenv('SII_CACHE_EXPIRY_DAYS', '30'))
 
+# Conexiones HTTP al SII: conexiones reutilizables en el pool y timeouts (segundos)
+SII_POOL_SIZE = int(os.getenv('SII_POOL_SIZE', '8'))
+SII_CONNECT_TIMEOUT = float(os.getenv('SII_CONNECT_TIMEOUT', '5'))
+SII_READ_TIMEOUT = float(os.getenv('SII_READ_TIMEOUT', '10'))
+
+# Cache de proveedores en memoria delante de Firestore: máximo de RUTs y vigencia (horas)
+# de los datos y de los "no encontrado en el SII"
+SUPPLIER_CACHE_ENABLED = os.getenv('SUPPLIER_CACHE_ENABLED', 'true').lower() == 'true'
+SUPPLIER_CACHE_MAX_ENTRIES = int(os.getenv('SUPPLIER_CACHE_MAX_ENTRIES', '10000'))
+SUPPLIER_CACHE_TTL_HOURS = float(os.getenv('SUPPLIER_CACHE_TTL_HOURS', '12'))
+SUPPLIER_CACHE_NEGATIVE_TTL_HOURS = float(os.getenv('SUPPLIER_CACHE_NEGATIVE_TTL_HOURS', '1'))
+
+# Registro local de contribuyentes (SQLite importado con contributors.py); si no existe, se omite
+CONTRIBUTORS_DB_PATH = os.getenv('CONTRIBUTORS_DB_PATH', str(BASE_DIR / 'data' / 'contribuyentes.sqlite'))
+
+# Modo de procesamiento: "pool" (process_invoice completo por worker) o "pipeline" (etapas asyncio)
+OCR_MODE = os.getenv('OCR_MODE', 'pool')
+
+# Worker pool: facturas procesadas en paralelo y tamaño máximo de la cola en vuelo
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', '4'))
+OCR_QUEUE_SIZE = int(os.getenv('OCR_QUEUE_SIZE', '10'))
+
+# Pipeline: concurrencia por etapa y tamaño de la cola de entrada de cada etapa
+PIPELINE_STAGE_CONCURRENCY = {
+    'download': int(os.getenv('PIPELINE_DOWNLOAD_CONCURRENCY', '8')),
+    'ocr': int(os.getenv('PIPELINE_OCR_CONCURRENCY', '4')),
+    'parse': int(os.getenv('PIPELINE_PARSE_CONCURRENCY', '1')),
+    'sii': int(os.getenv('PIPELINE_SII_CONCURRENCY', '2')),
+    'update': int(os.getenv('PIPELINE_UPDATE_CONCURRENCY', '4')),
+}
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '10'))
+# Imágenes por solicitud batch a Vision en la etapa OCR (1 = sin lotes, máximo 16)
+PIPELINE_OCR_BATCH_SIZE = min(16, int(os.getenv('PIPELINE_OCR_BATCH_SIZE', '4')))
+
+# Leases: identificador de esta réplica, duración del lease y cada cuánto liberar leases vencidos
+OCR_WORKER_ID = os.getenv('OCR_WORKER_ID', f'{socket.gethostname()}-{os.getpid()}')
+OCR_LEASE_SECONDS = int(os.getenv('OCR_LEASE_SECONDS', '300'))
+OCR_LEASE_REAP_INTERVAL = int(os.getenv('OCR_LEASE_REAP_INTERVAL', '60'))
+# Heartbeat: cada cuánto se extiende el lease de las facturas en vuelo (por defecto, un tercio del lease)
+OCR_LEASE_RENEW_INTERVAL = float(os.getenv('OCR_LEASE_RENEW_INTERVAL', str(OCR_LEASE_SECONDS / 3)))
+
+# Ingesta: "listen" (listener on_snapshot con fallback a polling) o "poll" (sólo polling adaptativo)
+OCR_INGESTION = os.getenv('OCR_INGESTION', 'listen')
+OCR_POLL_MIN_INTERVAL = float(os.getenv('OCR_POLL_MIN_INTERVAL', '1'))
+OCR_POLL_MAX_INTERVAL = float(os.getenv('OCR_POLL_MAX_INTERVAL', '10'))
+OCR_SAFETY_POLL_INTERVAL = float(os.getenv('OCR_SAFETY_POLL_INTERVAL', '60'))
+
+# Scheduler: candidatas en cola bajo las que se vuelve a hacer poll, pesos por empresa
+# ("empresaA:3,empresaB:2"; el resto pesa 1) y candidatas leídas por poll (una sola consulta:
+# más grande que la ventana para que una carga masiva no tape a las demás empresas)
+OCR_SCHEDULER_WINDOW = int(os.getenv('OCR_SCHEDULER_WINDOW', '100'))
+OCR_FETCH_WINDOW = int(os.getenv('OCR_FETCH_WINDOW', str(OCR_SCHEDULER_WINDOW * 5)))
+OCR_COMPANY_WEIGHTS = os.getenv('OCR_COMPANY_WEIGHTS', '')
+
+# Pre-procesamiento de imágenes antes del OCR
+OCR_PREPROCESS = os.getenv('OCR_PREPROCESS', 'true').lower() == 'true'
+OCR_MAX_LONG_EDGE = int(os.getenv('OCR_MAX_LONG_EDGE', '2500'))
+OCR_TARGET_DPI = int(os.getenv('OCR_TARGET_DPI', '300'))
+OCR_MAX_IMAGE_BYTES = int(os.getenv('OCR_MAX_IMAGE_BYTES', '1500000'))
+OCR_GRAYSCALE = os.getenv('OCR_GRAYSCALE', 'true').lower() == 'true'
+
+# Extraer los items de la factura a partir de la geometría de las palabras del OCR
+OCR_EXTRACT_ITEMS = os.getenv('OCR_EXTRACT_ITEMS', 'true').lower() == 'true'
+
+# Parsear bloque a bloque (encabezado desde el inicio, montos desde el final) y
+# consultar el SII apenas aparece el RUT del emisor
+PARSER_STREAMING = os.getenv('PARSER_STREAMING', 'false').lower() == 'true'
+
+# Detección de fotos casi duplicadas (hash perceptual de 256 bits por empresa)
+# El hash sólo propone candidatas: OCR_DEDUP marca `duplicateOf` si además coinciden número,
+# RUT del emisor y total parseados; OCR_DEDUP_REUSE copia entonces los datos del SII de la original.
+# Una re-subida idéntica (mismo SHA-256 que la original) se confirma antes del OCR y, con
+# OCR_DEDUP_REUSE, copia el texto y los datos de la original sin llamar a Vision
+OCR_DEDUP = os.getenv('OCR_DEDUP', 'false').lower() == 'true'
+OCR_DEDUP_REUSE = os.getenv('OCR_DEDUP_REUSE', 'false').lower() == 'true'
+OCR_DEDUP_MAX_DISTANCE = int(os.getenv('OCR_DEDUP_MAX_DISTANCE', '24'))
+OCR_DEDUP_WINDOW_HOURS = float(os.getenv('OCR_DEDUP_WINDOW_HOURS', '24'))
+OCR_DEDUP_INDEX_SIZE = int(os.getenv('OCR_DEDUP_INDEX_SIZE', '500'))
+
+# Backend de OCR: "vision" (API real), "record" (API real grabando respuestas) o "replay" (grabaciones, sin red)
+OCR_BACKEND = os.getenv('OCR_BACKEND', 'vision')
+OCR_RECORDINGS_DIR = os.getenv('OCR_RECORDINGS_DIR', str(BASE_DIR / 'recordings'))
+OCR_REPLAY_LATENCY_MS = float(os.getenv('OCR_REPLAY_LATENCY_MS', '0'))
+OCR_REPLAY_JITTER_MS = float(os.getenv('OCR_REPLAY_JITTER_MS', '0'))
+
+# Cache de resultados OCR por hash de imagen: tier en disco (LRU) y tier opcional en Firestore
+OCR_CACHE_ENABLED = os.getenv('OCR_CACHE_ENABLED', 'true').lower() == 'true'
+OCR_CACHE_DIR = os.getenv('OCR_CACHE_DIR', str(BASE_DIR / '.cache' / 'ocr'))
+OCR_CACHE_MAX_MB = int(os.getenv('OCR_CACHE_MAX_MB', '500'))
+OCR_CACHE_MAX_AGE_DAYS = int(os.getenv('OCR_CACHE_MAX_AGE_DAYS', '90'))
+OCR_CACHE_FIRESTORE = os.getenv('OCR_CACHE_FIRESTORE', 'false').lower() == 'true'
+
+# Rate limiting por servicio: (solicitudes por segundo, ráfaga máxima)
+RATE_LIMITS = {
+    'vision': (float(os.getenv('VISION_RATE_LIMIT', '10')), int(os.getenv('VISION_BURST', '10'))),
+    'sii': (float(os.getenv('SII_RATE_LIMIT', '1')), int(os.getenv('SII_BURST', '2'))),
+    'storage': (float(os.getenv('STORAGE_RATE_LIMIT', '50')), int(os.getenv('STORAGE_BURST', '20'))),
+}
+
 # ============================================
 # VALIDATION
 # ============================================
@@ -61,7 +161,11 @@ def validate_config():
     if not Path(FIREBASE_SERVICE_ACCOUNT_PATH).exists():
         errors.append(f'Firebase service account key no encontrado en: {FIREBASE_SERVICE_ACCOUNT_PATH}')
     
-    if not Path(GOOGLE_VISION_SERVICE_ACCOUNT_PATH).exists():
+    if OCR_BACKEND not in ('vision', 'record', 'replay'):
+        errors.append(f'OCR_BACKEND inválido: {OCR_BACKEND} (usar vision, record o replay)')
+    
+    # El backend replay no llama a Vision
+    if OCR_BACKEND != 'replay' and not Path(GOOGLE_VISION_SERVICE_ACCOUNT_PATH).exists():
         errors.append(f'Google Vision service account key no encontrado en: {GOOGLE_VISION_SERVICE_ACCOUNT_PATH}')
     
     if errors:
@@ -74,10 +178,3 @@ def validate_config():
         )
     
     logging.info('✓ Configuración validada correctamente')
-
-# Validar configuración al importar
-try:
-    validate_config()
-except ValueError as e:
-    logging.error(str(e))
-    raise
@@ -0,0 +1,255 @@
+"""
+Registro local de contribuyentes (alternativa al scraping del SII)
+Importa una nómina de contribuyentes en CSV (RUT, razón social, giro,
+actividad, dirección, comuna) a un índice SQLite por número de RUT. La
+búsqueda es un acceso por clave primaria sobre el archivo mapeado en memoria:
+microsegundos, sin red ni rate limiting. main.py lo consulta antes de
+Firestore y del SII; sin archivo importado, la búsqueda devuelve None
+
+Uso:
+    python src/contributors.py --input nomina.csv
+    python src/contributors.py --input nomina.csv --encoding latin-1 --db data/contribuyentes.sqlite
+
+Formato de entrada: CSV con encabezado (separador `;`, `,`, tab o `|`). El RUT
+puede venir en una columna (`12.345.678-5`) o en dos (`RUT` y `DV`); las
+demás columnas se reconocen por nombre, como las etiquetas de la respuesta
+del SII (razón social/nombre, giro, actividad, dirección/domicilio, comuna, región)
+"""
+
+import argparse
+import csv
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from config import CONTRIBUTORS_DB_PATH
+from rut import parse_rut, validate_ruts
+
+logger = logging.getLogger(__name__)
+
+# Columnas guardadas, con la clave que usa el resultado de query_sii_by_rut
+_FIELDS = (
+    ('razon_social', 'razonSocial'),
+    ('giro', 'giro'),
+    ('actividad', 'actividadEconomica'),
+    ('direccion', 'direccion'),
+    ('comuna', 'comuna'),
+    ('region', 'region'),
+)
+
+# Bytes del índice mapeados en memoria por conexión
+_MMAP_BYTES = 1 << 30
+
+# ============================================
+# IMPORTACIÓN
+# ============================================
+
+def _normalize_header(header: str) -> str:
+    folded = unicodedata.normalize('NFKD', header).encode('ascii', 'ignore').decode()
+    return ''.join(char for char in folded.lower() if char.isalnum())
+
+def _column_field(header: str) -> Optional[str]:
+    """Campo que corresponde a una columna del CSV (mismas etiquetas que parse_sii_response)"""
+    label = _normalize_header(header)
+    if label in ('rut', 'rutcontribuyente', 'numerorut'):
+        return 'rut'
+    if label in ('dv', 'digitoverificador'):
+        return 'dv'
+    if 'razonsocial' in label or 'nombre' in label:
+        return 'razon_social'
+    if 'giro' in label:
+        return 'giro'
+    if 'actividad' in label:
+        return 'actividad'
+    if 'direccion' in label or 'domicilio' in label:
+        return 'direccion'
+    if 'comuna' in label:
+        return 'comuna'
+    if 'region' in label:
+        return 'region'
+    return None
+
+def _read_rows(csv_path: str, encoding: str, delimiter: Optional[str]) -> Iterator[Dict[str, str]]:
+    """Filas del CSV como {campo: valor}, con el RUT completo en 'rut'"""
+    with open(csv_path, newline='', encoding=encoding) as source:
+        if delimiter is None:
+            delimiter = csv.Sniffer().sniff(source.read(64 * 1024), delimiters=';,\t|').delimiter
+            source.seek(0)
+
+        reader = csv.reader(source, delimiter=delimiter)
+        columns = [_column_field(header) for header in next(reader, [])]
+        if 'rut' not in columns:
+            raise ValueError(f'El CSV no tiene columna de RUT: {csv_path}')
+
+        for values in reader:
+            row = {field: value.strip() for field, value in zip(columns, values) if field}
+            if 'dv' in row:
+                row['rut'] = f'{row.get("rut", "")}-{row.pop("dv")}'
+            yield row
+
+def import_contributors(
+    csv_path: str,
+    db_path: str = CONTRIBUTORS_DB_PATH,
+    encoding: str = 'utf-8-sig',
+    delimiter: Optional[str] = None,
+    batch_size: int = 50000
+) -> Dict[str, int]:
+    """
+    Cargar una nómina de contribuyentes en el índice local
+
+    El índice se arma en un archivo temporal y reemplaza al anterior al
+    terminar, así que una importación a medias no deja un índice incompleto.
+    Las filas con RUT inválido se descartan; un RUT repetido queda con la última fila.
+
+    Returns:
+        Dict con filas leídas, contribuyentes importados (RUTs distintos),
+        filas con RUT repetido e inválidas
+    """
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = db_path.with_name(db_path.name + '.tmp')
+    tmp_path.unlink(missing_ok=True)
+
+    stats = {'read': 0, 'imported': 0, 'duplicates': 0, 'invalid': 0}
+    valid_rows = 0
+    connection = sqlite3.connect(tmp_path)
+    try:
+        # Archivo nuevo que se descarta si algo falla: sin journal ni fsync
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.execute(
+            'CREATE TABLE contributors (number INTEGER PRIMARY KEY, '
+            + ', '.join(f'{column} TEXT' for column, _ in _FIELDS) + ')'
+        )
+        connection.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+        insert = (
+            f'INSERT OR REPLACE INTO contributors VALUES (?{", ?" * len(_FIELDS)})'
+        )
+
+        batch: List[Dict[str, str]] = []
+
+        def flush():
+            nonlocal valid_rows
+            # Dígito verificador de todo el lote de una vez (NumPy)
+            valid = validate_ruts([row.get('rut') for row in batch])
+            connection.executemany(insert, (
+                (parse_rut(row['rut']).number, *(row.get(column) or None for column, _ in _FIELDS))
+                for row, ok in zip(batch, valid.tolist()) if ok
+            ))
+            valid_count = int(valid.sum())
+            valid_rows += valid_count
+            stats['invalid'] += len(batch) - valid_count
+            batch.clear()
+
+        for row in _read_rows(csv_path, encoding, delimiter):
+            stats['read'] += 1
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+
+        # INSERT OR REPLACE sobrescribe los RUTs repetidos: se cuentan los RUTs distintos
+        stats['imported'] = connection.execute('SELECT COUNT(*) FROM contributors').fetchone()[0]
+        stats['duplicates'] = valid_rows - stats['imported']
+
+        connection.executemany('INSERT INTO meta VALUES (?, ?)', (
+            ('source', str(csv_path)),
+            ('importedAt', datetime.now(timezone.utc).isoformat()),
+            ('rows', str(stats['imported'])),
+        ))
+        connection.commit()
+    except BaseException:
+        connection.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+    connection.close()
+
+    os.replace(tmp_path, db_path)
+    logger.info(
+        f'✓ {stats["imported"]} contribuyentes importados en {db_path} '
+        f'({stats["duplicates"]} filas con RUT repetido, {stats["invalid"]} con RUT inválido)'
+    )
+    return stats
+
+# ============================================
+# BÚSQUEDA
+# ============================================
+
+# Una conexión de sólo lectura por thread (sqlite3 no comparte conexiones entre threads)
+_local = threading.local()
+
+def _connection() -> Optional[sqlite3.Connection]:
+    connection = getattr(_local, 'connection', None)
+    if connection is None:
+        if not os.path.exists(CONTRIBUTORS_DB_PATH):
+            return None
+        connection = sqlite3.connect(f'{Path(CONTRIBUTORS_DB_PATH).as_uri()}?mode=ro', uri=True)
+        connection.execute(f'PRAGMA mmap_size = {_MMAP_BYTES}')
+        _local.connection = connection
+    return connection
+
+def lookup_contributor(rut: str) -> Optional[Dict[str, Any]]:
+    """
+    Datos de un contribuyente desde el registro local
+
+    Args:
+        rut: RUT con o sin formato
+
+    Returns:
+        Dict con las mismas claves que query_sii_by_rut, o None si el RUT no
+        es válido, no está en el registro o no hay registro importado
+    """
+    parsed = parse_rut(rut)
+    if parsed is None or not parsed.is_valid:
+        return None
+
+    connection = _connection()
+    if connection is None:
+        return None
+
+    try:
+        row = connection.execute(
+            f'SELECT {", ".join(column for column, _ in _FIELDS)} FROM contributors WHERE number = ?',
+            (parsed.number,)
+        ).fetchone()
+    except sqlite3.Error as e:
+        logger.error(f'Error al leer el registro local de contribuyentes: {e}')
+        return None
+
+    if row is None or not row[0]:
+        return None
+
+    data = {'rut': str(parsed)}
+    data.update((key, value) for (_, key), value in zip(_FIELDS, row))
+    return data
+
+# ============================================
+# CLI
+# ============================================
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Importar una nómina de contribuyentes al registro local')
+    parser.add_argument('--input', required=True, help='CSV con RUT, razón social, giro, actividad, dirección y comuna')
+    parser.add_argument('--db', default=CONTRIBUTORS_DB_PATH, help='Archivo SQLite de destino')
+    parser.add_argument('--encoding', default='utf-8-sig', help='Encoding del CSV (ej: latin-1)')
+    parser.add_argument('--delimiter', help='Separador del CSV (por defecto se detecta)')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    stats = import_contributors(args.input, args.db, args.encoding, args.delimiter)
+    logger.info(
+        f'Leídas {stats["read"]} filas en {time.perf_counter() - started:.1f}s: '
+        f'{stats["imported"]} contribuyentes, {stats["duplicates"]} con RUT repetido, '
+        f'{stats["invalid"]} con RUT inválido'
+    )
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,145 @@
+"""
+Detección de fotos casi duplicadas con hash perceptual (dHash)
+La misma factura en papel fotografiada dos veces (otro ángulo, otra luz) da
+bytes distintos pero un dHash a pocos bits de distancia. Cada empresa tiene
+un índice de los hashes recientes; una foto a distancia de Hamming menor o
+igual al umbral se marca como duplicada de la factura anterior
+"""
+
+import io
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Formatos sin hash perceptual (multi-página)
+_UNHASHED_SIGNATURES = (b'%PDF', b'II*\x00', b'MM\x00*')
+
+# ============================================
+# HASH PERCEPTUAL
+# ============================================
+
+def perceptual_hash(image_bytes: bytes, hash_size: int = 16) -> Optional[int]:
+    """
+    dHash: gradiente horizontal de la imagen reducida a (hash_size + 1) x hash_size en grises
+
+    Args:
+        image_bytes: Bytes de la imagen
+        hash_size: Lado del hash (16 = 256 bits)
+
+    Returns:
+        Hash como entero de hash_size² bits, o None si no es una imagen simple
+    """
+    if image_bytes[:4] in _UNHASHED_SIGNATURES:
+        return None
+
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        # Decodificar JPEG a escala reducida: no hace falta la foto completa para 17x16 píxeles
+        image.draft('L', (hash_size * 8, hash_size * 8))
+        image = ImageOps.exif_transpose(image).convert('L')
+        image = image.resize((hash_size + 1, hash_size), Image.LANCZOS)
+    except Exception as e:
+        logger.warning(f'No se pudo calcular el hash perceptual: {e}')
+        return None
+
+    pixels = image.tobytes()
+    row_length = hash_size + 1
+    value = 0
+    for row in range(hash_size):
+        offset = row * row_length
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def hamming_distance(a: int, b: int) -> int:
+    """Cantidad de bits distintos entre dos hashes"""
+    return (a ^ b).bit_count()
+
+# ============================================
+# ÍNDICE POR EMPRESA
+# ============================================
+
+class NearDuplicateIndex:
+    """
+    Hashes recientes por empresa (acotados en cantidad y antigüedad)
+
+    Args:
+        max_distance: Distancia de Hamming máxima para considerar duplicado
+        max_per_company: Hashes recordados por empresa
+        max_age_seconds: Antigüedad máxima de un hash
+        loader: Función opcional (company_id) -> [(invoice_id, hash, timestamp)] para
+            precargar el índice de una empresa la primera vez que se consulta
+    """
+
+    def __init__(
+        self,
+        max_distance: int = 24,
+        max_per_company: int = 500,
+        max_age_seconds: float = 86400,
+        loader: Optional[Callable[[str], List[Tuple[str, int, float]]]] = None
+    ):
+        self._max_distance = max_distance
+        self._max_per_company = max_per_company
+        self._max_age = max_age_seconds
+        self._loader = loader
+        self._entries: Dict[str, Deque[Tuple[float, int, str]]] = {}
+        self._lock = threading.Lock()
+
+    def find(self, company_id: str, phash: int) -> Optional[Tuple[str, int]]:
+        """
+        Buscar la factura más parecida dentro del umbral
+
+        Returns:
+            (invoice_id, distancia) o None
+        """
+        entries = self._company_entries(company_id)
+        cutoff = time.time() - self._max_age
+        best = None
+
+        with self._lock:
+            while entries and entries[0][0] < cutoff:
+                entries.popleft()
+
+            for _, other_hash, invoice_id in entries:
+                distance = hamming_distance(phash, other_hash)
+                if distance <= self._max_distance and (best is None or distance < best[1]):
+                    best = (invoice_id, distance)
+
+        return best
+
+    def add(self, company_id: str, invoice_id: str, phash: int, timestamp: Optional[float] = None):
+        """Registrar el hash de una factura procesada"""
+        entries = self._company_entries(company_id)
+        with self._lock:
+            entries.append((timestamp or time.time(), phash, invoice_id))
+
+    def _company_entries(self, company_id: str) -> Deque[Tuple[float, int, str]]:
+        with self._lock:
+            entries = self._entries.get(company_id)
+            if entries is not None:
+                return entries
+            entries = self._entries[company_id] = deque(maxlen=self._max_per_company)
+
+        if self._loader:
+            try:
+                loaded = [
+                    (timestamp, phash, invoice_id)
+                    for invoice_id, phash, timestamp in self._loader(company_id)
+                ]
+            except Exception as e:
+                logger.warning(f'No se pudieron cargar los hashes recientes de {company_id}: {e}')
+                loaded = []
+
+            with self._lock:
+                # Orden cronológico; deque(maxlen) conserva los más recientes
+                merged = sorted(list(entries) + loaded)
+                entries.clear()
+                entries.extend(merged)
+
+        return entries
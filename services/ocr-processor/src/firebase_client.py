@@ -1,14 +1,19 @@
 import firebase_admin
 from firebase_admin import credentials, firestore, storage
-from typing import Optional
+from google.api_core import exceptions as gcp_exceptions
+from google.cloud.storage import Bucket
+from typing import Optional, List, Callable, Tuple
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 from config import (
     FIREBASE_SERVICE_ACCOUNT_PATH,
     FIREBASE_PROJECT_ID,
-    FIREBASE_STORAGE_BUCKET
+    FIREBASE_STORAGE_BUCKET,
+    SII_CACHE_EXPIRY_DAYS
 )
+from rate_limit import get_rate_limiter
+from rut import format_rut
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +22,7 @@ logger = logging.getLogger(__name__)
 # ============================================
 _app: Optional[firebase_admin.App] = None
 _db: Optional[firestore.Client] = None
-_bucket: Optional[storage.Bucket] = None
+_bucket: Optional[Bucket] = None
 
 def initialize_firebase():
     """Inicializar Firebase Admin SDK"""
@@ -48,7 +53,7 @@ def get_firestore() -> firestore.Client:
         initialize_firebase()
     return _db
 
-def get_storage_bucket() -> storage.Bucket:
+def get_storage_bucket() -> Bucket:
     """Obtener bucket de Storage"""
     if _bucket is None:
         initialize_firebase()
@@ -74,6 +79,35 @@ def get_invoice(company_id: str, invoice_id: str) -> Optional[dict]:
         logger.error(f'Error al obtener factura {invoice_id}: {e}')
         return None
 
+def get_recent_image_hashes(company_id: str, limit: int = 500) -> List[Tuple[str, int, float]]:
+    """
+    Hashes perceptuales de las últimas facturas procesadas de una empresa
+    
+    Sólo considera facturas originales (sin `duplicateOf`) ya procesadas o verificadas.
+    
+    Returns:
+        Lista de (invoice_id, hash, timestamp de creación)
+    """
+    db = get_firestore()
+    query = (
+        db.collection('companies').document(company_id).collection('invoices')
+        .order_by('createdAt', direction=firestore.Query.DESCENDING)
+        .limit(limit)
+        .select(['perceptualHash', 'status', 'duplicateOf', 'createdAt'])
+    )
+    
+    results = []
+    for doc in query.stream():
+        data = doc.to_dict()
+        phash = data.get('perceptualHash')
+        if not phash or data.get('duplicateOf') or data.get('status') not in ('ocr_done', 'verified'):
+            continue
+        
+        created_at = data.get('createdAt')
+        results.append((doc.id, int(phash, 16), created_at.timestamp() if created_at else 0.0))
+    
+    return results
+
 def update_invoice(company_id: str, invoice_id: str, data: dict) -> bool:
     """Actualizar una factura en Firestore"""
     try:
@@ -86,8 +120,8 @@ def update_invoice(company_id: str, invoice_id: str, data: dict) -> bool:
         logger.error(f'Error al actualizar factura {invoice_id}: {e}')
         return False
 
-def update_invoice_status(company_id: str, invoice_id: str, status: str, error_message: str = None) -> bool:
-    """Actualizar estado de una factura"""
+def invoice_status_data(status: str, error_message: str = None) -> dict:
+    """Campos para cambiar el estado de una factura (libera el lease si terminó)"""
     data = {
         'status': status,
         'processedAt': firestore.SERVER_TIMESTAMP
@@ -96,11 +130,26 @@ def update_invoice_status(company_id: str, invoice_id: str, status: str, error_m
     if error_message:
         data['errorMessage'] = error_message
     
-    return update_invoice(company_id, invoice_id, data)
+    if status in ('ocr_done', 'error'):
+        data.update(release_lease_data())
+    
+    return data
+
+def update_invoice_status(company_id: str, invoice_id: str, status: str, error_message: str = None) -> bool:
+    """Actualizar estado de una factura"""
+    return update_invoice(company_id, invoice_id, invoice_status_data(status, error_message))
+
+def release_lease_data() -> dict:
+    """Campos para liberar el lease de una factura al terminar su procesamiento"""
+    return {
+        'leaseOwner': firestore.DELETE_FIELD,
+        'leaseExpiresAt': firestore.DELETE_FIELD
+    }
 
 def save_supplier_cache(rut: str, data: dict) -> bool:
-    """Guardar datos de proveedor en cache"""
+    """Guardar datos de proveedor en cache (documento por RUT normalizado)"""
     try:
+        rut = format_rut(rut)
         db = get_firestore()
         doc_ref = db.collection('suppliers').document(rut)
         
@@ -119,9 +168,10 @@ def save_supplier_cache(rut: str, data: dict) -> bool:
         logger.error(f'Error al guardar proveedor en cache: {e}')
         return False
 
-def get_supplier_from_cache(rut: str, max_days: int = 30) -> Optional[dict]:
-    """Obtener datos de proveedor desde cache"""
+def get_supplier_from_cache(rut: str, max_days: int = SII_CACHE_EXPIRY_DAYS) -> Optional[dict]:
+    """Obtener datos de proveedor desde cache (documento por RUT normalizado)"""
     try:
+        rut = format_rut(rut)
         db = get_firestore()
         doc_ref = db.collection('suppliers').document(rut)
         doc = doc_ref.get()
@@ -132,10 +182,10 @@ def get_supplier_from_cache(rut: str, max_days: int = 30) -> Optional[dict]:
         data = doc.to_dict()
         
         # Verificar si el cache está vigente
+        # (lastVerified llega de Firestore con zona horaria: comparar contra UTC)
         if 'lastVerified' in data:
-            from datetime import timedelta
             last_verified = data['lastVerified']
-            if datetime.now() - last_verified > timedelta(days=max_days):
+            if datetime.now(timezone.utc) - last_verified > timedelta(days=max_days):
                 logger.info(f'Cache de proveedor {rut} expirado')
                 return None
         
@@ -145,12 +195,125 @@ def get_supplier_from_cache(rut: str, max_days: int = 30) -> Optional[dict]:
         logger.error(f'Error al obtener proveedor desde cache: {e}')
         return None
 
+def bulk_write_invoices(invoices: List[dict], default_company_id: Optional[str] = None, batch_size: int = 500) -> int:
+    """
+    Escribir facturas procesadas fuera del loop principal (backfill) en lotes
+    
+    Args:
+        invoices: Facturas con `id` y opcionalmente `companyId`
+        default_company_id: Empresa para las facturas sin `companyId`
+        batch_size: Escrituras por lote (máximo 500 en Firestore)
+    
+    Returns:
+        Cantidad de facturas escritas
+    """
+    db = get_firestore()
+    written = 0
+    
+    for start in range(0, len(invoices), batch_size):
+        chunk = invoices[start:start + batch_size]
+        batch = db.batch()
+        
+        try:
+            for invoice in chunk:
+                company_id = invoice.get('companyId') or default_company_id
+                if not company_id:
+                    raise ValueError(f'Factura {invoice.get("id")} sin companyId')
+                
+                data = {k: v for k, v in invoice.items() if k != 'id'}
+                data['companyId'] = company_id
+                data['processedAt'] = firestore.SERVER_TIMESTAMP
+                data.setdefault('createdAt', firestore.SERVER_TIMESTAMP)
+                
+                batch.set(_invoice_ref(db, company_id, invoice['id']), data, merge=True)
+            
+            batch.commit()
+            written += len(chunk)
+        except Exception as e:
+            logger.error(f'Error al escribir lote de {len(chunk)} facturas: {e}')
+            break
+    
+    logger.info(f'✓ {written} facturas escritas en Firestore')
+    return written
+
+@firestore.transactional
+def _update_reparsed_in_transaction(transaction, refs, updates: List[dict]) -> Tuple[int, int, int]:
+    """Actualizar las facturas que existen y no están verificadas; retorna (actualizadas, verificadas, inexistentes)"""
+    snapshots = {snapshot.reference.path: snapshot for snapshot in transaction.get_all(refs)}
+    updated = verified = missing = 0
+    
+    for ref, data in zip(refs, updates):
+        snapshot = snapshots.get(ref.path)
+        if snapshot is None or not snapshot.exists:
+            missing += 1
+        elif snapshot.to_dict().get('status') == 'verified':
+            # El usuario ya revisó y corrigió los datos: no pisarlos
+            verified += 1
+        else:
+            transaction.update(ref, data)
+            updated += 1
+    
+    return updated, verified, missing
+
+def update_reparsed_invoices(
+    invoices: List[dict],
+    fields: Tuple[str, ...],
+    default_company_id: Optional[str] = None,
+    batch_size: int = 400
+) -> dict:
+    """
+    Reemplazar en Firestore sólo los campos re-parseados de facturas existentes
+    
+    A diferencia de bulk_write_invoices no crea facturas ni toca `createdAt`,
+    `processedAt` o el estado: actualiza exactamente `fields` (un None borra el
+    valor anterior) y se salta las facturas ya verificadas por el usuario.
+    
+    Args:
+        invoices: Facturas con `id`, opcionalmente `companyId`, y los campos
+        fields: Campos a escribir
+        default_company_id: Empresa para las facturas sin `companyId`
+        batch_size: Facturas por transacción (máximo 500 escrituras en Firestore)
+    
+    Returns:
+        Dict con facturas actualizadas, verificadas (omitidas), inexistentes y con error
+    """
+    db = get_firestore()
+    stats = {'updated': 0, 'verified': 0, 'missing': 0, 'failed': 0}
+    
+    for start in range(0, len(invoices), batch_size):
+        chunk = invoices[start:start + batch_size]
+        
+        try:
+            refs, updates = [], []
+            for invoice in chunk:
+                company_id = invoice.get('companyId') or default_company_id
+                if not company_id:
+                    raise ValueError(f'Factura {invoice.get("id")} sin companyId')
+                refs.append(_invoice_ref(db, company_id, invoice['id']))
+                updates.append({field: invoice.get(field) for field in fields})
+            
+            updated, verified, missing = _update_reparsed_in_transaction(db.transaction(), refs, updates)
+            stats['updated'] += updated
+            stats['verified'] += verified
+            stats['missing'] += missing
+        except Exception as e:
+            logger.error(f'Error al actualizar lote de {len(chunk)} facturas re-parseadas: {e}')
+            stats['failed'] += len(chunk)
+    
+    logger.info(
+        f'✓ {stats["updated"]} facturas re-parseadas actualizadas '
+        f'({stats["verified"]} verificadas omitidas, {stats["missing"]} inexistentes)'
+    )
+    return stats
+
 # ============================================
 # STORAGE HELPERS
 # ============================================
 
 def download_image_from_storage(image_url: str) -> Optional[bytes]:
     """Descargar imagen desde Firebase Storage"""
+    limiter = get_rate_limiter('storage')
+    
     try:
         bucket = get_storage_bucket()
         
@@ -163,13 +326,20 @@ def download_image_from_storage(image_url: str) -> Optional[bytes]:
         
         blob = bucket.blob(blob_path)
         
-        if not blob.exists():
-            logger.error(f'Imagen no encontrada en Storage: {blob_path}')
-            return None
-        
+        # Descarga directa: NotFound reemplaza el round trip extra de blob.exists()
+        limiter.acquire()
         image_bytes = blob.download_as_bytes()
+        limiter.record_success()
+        
         logger.info(f'✓ Imagen descargada: {blob_path} ({len(image_bytes)} bytes)')
         return image_bytes
+    except gcp_exceptions.NotFound:
+        logger.error(f'Imagen no encontrada en Storage: {image_url}')
+        return None
+    except (gcp_exceptions.TooManyRequests, gcp_exceptions.ServiceUnavailable) as e:
+        limiter.record_throttle()
+        logger.error(f'Storage limitó la descarga: {e}')
+        return None
     except Exception as e:
         logger.error(f'Error al descargar imagen: {e}')
         return None
@@ -178,36 +348,363 @@ def download_image_from_storage(image_url: str) -> Optional[bytes]:
 # QUERY HELPERS
 # ============================================
 
-def get_pending_invoices(limit: int = 10):
-    """Obtener facturas pendientes de procesamiento OCR"""
+# Consultas collection group desactivadas porque Firestore respondió que falta su índice
+_collection_group_disabled = set()
+
+def _invoice_from_doc(invoice_doc) -> dict:
+    """Convertir un documento de factura (de cualquier empresa) a dict con id y companyId"""
+    invoice_data = invoice_doc.to_dict()
+    invoice_data['id'] = invoice_doc.id
+    invoice_data['companyId'] = invoice_doc.reference.parent.parent.id
+    return invoice_data
+
+def _query_invoices_collection_group(name: str, query_fn, limit: int) -> Optional[List[dict]]:
+    """
+    Ejecutar una consulta sobre el collection group `invoices` (todas las empresas)
+    
+    Args:
+        name: Nombre de la consulta (para desactivarla si falta su índice)
+        query_fn: Función que recibe la referencia al collection group y retorna la query
+        limit: Máximo de documentos
+    
+    Returns:
+        Lista de facturas, o None si hay que usar la búsqueda por empresa
+    """
+    if name in _collection_group_disabled:
+        return None
+    
     try:
         db = get_firestore()
+        query = query_fn(db.collection_group('invoices')).limit(limit)
+        return [_invoice_from_doc(doc) for doc in query.stream()]
+    except gcp_exceptions.FailedPrecondition as e:
+        # Índice no desplegado: ver firestore.indexes.json
+        logger.warning(f'Falta índice del collection group invoices, usando búsqueda por empresa: {e}')
+        _collection_group_disabled.add(name)
+        return None
+    except Exception as e:
+        logger.warning(f'Error en consulta collection group, usando búsqueda por empresa: {e}')
+        return None
+
+def _query_invoices_per_company(query_fn, limit: int) -> List[dict]:
+    """Fallback: ejecutar la consulta empresa por empresa (una query por empresa)"""
+    db = get_firestore()
+    results = []
+    
+    for company in db.collection('companies').stream():
+        query = query_fn(company.reference.collection('invoices')).limit(limit - len(results))
         
-        # Buscar en todas las empresas (requiere índice compuesto en Firestore)
-        # Alternativa: iterar por empresas
-        companies_ref = db.collection('companies')
-        companies = companies_ref.stream()
-        
-        pending_invoices = []
+        for invoice_doc in query.stream():
+            results.append(_invoice_from_doc(invoice_doc))
         
-        for company in companies:
-            invoices_ref = company.reference.collection('invoices')
-            query = invoices_ref.where('status', '==', 'pending_ocr').limit(limit)
-            
-            for invoice_doc in query.stream():
-                invoice_data = invoice_doc.to_dict()
-                invoice_data['id'] = invoice_doc.id
-                invoice_data['companyId'] = company.id
-                pending_invoices.append(invoice_data)
-                
-                if len(pending_invoices) >= limit:
-                    break
-            
-            if len(pending_invoices) >= limit:
+        if len(results) >= limit:
+            break
+    
+    return results
+
+# Empresa en la que parte el próximo poll de pendientes sin índice (rota entre polls)
+_pending_company_cursor = 0
+
+def _query_pending_per_company(limit: int) -> List[dict]:
+    """
+    Fallback sin índice: repartir `limit` facturas pendientes entre empresas
+
+    Una query por empresa (sin ordenar, para no requerir índice compuesto por
+    empresa), con hasta `limit // n_empresas` (al menos 1) cada una; los cupos
+    que dejan libres las empresas con pocas pendientes se reparten después
+    entre las que llenaron el suyo. Con más empresas que cupos, el poll
+    siguiente parte donde terminó éste.
+    """
+    global _pending_company_cursor
+    db = get_firestore()
+    # list_documents no lee los documentos de las empresas, sólo sus referencias
+    companies = list(db.collection('companies').list_documents())
+    if not companies:
+        return []
+
+    start = _pending_company_cursor % len(companies)
+    companies = (companies[start:] + companies[:start])[:limit]
+    _pending_company_cursor = start + len(companies)
+
+    results = []
+    full = [(company_ref, None) for company_ref in companies]
+    while full and len(results) < limit:
+        quota = max(1, (limit - len(results)) // len(full))
+        next_full = []
+        for company_ref, last_doc in full:
+            room = min(quota, limit - len(results))
+            if room <= 0:
                 break
+
+            query = company_ref.collection('invoices').where('status', '==', 'pending_ocr')
+            if last_doc is not None:
+                query = query.start_after(last_doc)
+            docs = list(query.limit(room).stream())
+
+            results.extend(_invoice_from_doc(doc) for doc in docs)
+            if len(docs) == room:
+                # Puede tener más pendientes: entra a la repartición de los cupos libres
+                next_full.append((company_ref, docs[-1]))
+        full = next_full
+
+    return results
+
+def get_pending_invoices(limit: int = 10):
+    """
+    Obtener facturas pendientes de procesamiento OCR
+    
+    Usa una sola consulta collection group sobre `invoices`, ordenada por
+    `createdAt` (requiere los índices de firestore.indexes.json): un poll
+    cuesta una consulta sin importar cuántas empresas existan. El reparto
+    entre empresas lo hace el FairScheduler sobre la ventana leída. Si el
+    índice no está disponible, reparte `limit` entre las empresas.
+    """
+    try:
+        def pending_query(invoices_ref):
+            return invoices_ref.where('status', '==', 'pending_ocr').order_by('createdAt')
+        
+        pending_invoices = _query_invoices_collection_group('pending', pending_query, limit)
+        
+        if pending_invoices is None:
+            pending_invoices = _query_pending_per_company(limit)
         
         logger.info(f'✓ {len(pending_invoices)} facturas pendientes encontradas')
         return pending_invoices
     except Exception as e:
         logger.error(f'Error al obtener facturas pendientes: {e}')
         return []
+
+def watch_pending_invoices(on_invoices: Callable[[List[dict]], None]):
+    """
+    Suscribirse con on_snapshot a las facturas pendientes de todas las empresas
+    
+    Args:
+        on_invoices: Callback que recibe las facturas que entran a "pending_ocr"
+            (se llama desde el thread del listener)
+    
+    Returns:
+        Watch de Firestore (llamar a `unsubscribe()` para cerrarlo)
+    """
+    db = get_firestore()
+    query = db.collection_group('invoices').where('status', '==', 'pending_ocr')
+    
+    def on_snapshot(docs, changes, read_time):
+        arrivals = [
+            _invoice_from_doc(change.document)
+            for change in changes
+            if change.type.name in ('ADDED', 'MODIFIED')
+        ]
+        if arrivals:
+            on_invoices(arrivals)
+    
+    return query.on_snapshot(on_snapshot)
+
+# ============================================
+# LEASES (CLAIM DE FACTURAS ENTRE RÉPLICAS)
+# ============================================
+
+def _invoice_ref(db: firestore.Client, company_id: str, invoice_id: str):
+    return db.collection('companies').document(company_id).collection('invoices').document(invoice_id)
+
+@firestore.transactional
+def _claim_in_transaction(transaction, refs, worker_id: str, lease_expires_at: datetime) -> List[dict]:
+    """Pasar a "processing" las facturas que sigan pendientes dentro de la transacción"""
+    # Todas las lecturas deben ir antes que las escrituras
+    snapshots = list(transaction.get_all(refs))
+    claimed = []
+    
+    for snapshot in snapshots:
+        if not snapshot.exists:
+            continue
+        
+        data = snapshot.to_dict()
+        if data.get('status') != 'pending_ocr':
+            # Otra réplica la reclamó primero
+            continue
+        
+        transaction.update(snapshot.reference, {
+            'status': 'processing',
+            'leaseOwner': worker_id,
+            'leaseExpiresAt': lease_expires_at,
+            'processedAt': firestore.SERVER_TIMESTAMP
+        })
+        
+        data['id'] = snapshot.id
+        data['companyId'] = snapshot.reference.parent.parent.id
+        data['status'] = 'processing'
+        data['leaseOwner'] = worker_id
+        data['leaseExpiresAt'] = lease_expires_at
+        claimed.append(data)
+    
+    return claimed
+
+def claim_invoices(worker_id: str, invoices: List[dict], lease_seconds: int = 300) -> List[dict]:
+    """
+    Reclamar atómicamente un lote de facturas candidatas para este worker
+    
+    Las facturas reclamadas quedan con status "processing", `leaseOwner` y
+    `leaseExpiresAt`, de modo que otras réplicas no las procesen. Si el worker
+    muere, `reap_expired_leases` las devuelve a "pending_ocr" al vencer el lease.
+    
+    Args:
+        worker_id: Identificador único del worker (proceso/nodo)
+        invoices: Facturas candidatas (con `id` y `companyId`)
+        lease_seconds: Duración del lease
+    
+    Returns:
+        Facturas efectivamente reclamadas (las que seguían pendientes)
+    """
+    if not invoices:
+        return []
+    
+    try:
+        db = get_firestore()
+        refs = [_invoice_ref(db, inv['companyId'], inv['id']) for inv in invoices]
+        lease_expires_at = datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)
+        
+        claimed = _claim_in_transaction(db.transaction(), refs, worker_id, lease_expires_at)
+        
+        if len(claimed) < len(invoices):
+            logger.info(f'{len(invoices) - len(claimed)} facturas ya reclamadas por otra réplica')
+        logger.info(f'✓ {len(claimed)} facturas reclamadas por {worker_id}')
+        return claimed
+    except Exception as e:
+        logger.error(f'Error al reclamar facturas pendientes: {e}')
+        return []
+
+@firestore.transactional
+def _renew_in_transaction(transaction, refs, worker_id: str, lease_expires_at: datetime) -> List[Tuple[str, str]]:
+    """Extender los leases que siguen siendo de este worker; retorna (companyId, id) de los perdidos"""
+    snapshots = list(transaction.get_all(refs))
+    lost = []
+    
+    for snapshot in snapshots:
+        key = (snapshot.reference.parent.parent.id, snapshot.id)
+        data = snapshot.to_dict() if snapshot.exists else {}
+        if data.get('status') != 'processing' or data.get('leaseOwner') != worker_id:
+            lost.append(key)
+            continue
+        
+        transaction.update(snapshot.reference, {'leaseExpiresAt': lease_expires_at})
+    
+    return lost
+
+def renew_leases(worker_id: str, invoices: List[dict], lease_seconds: int = 300) -> List[Tuple[str, str]]:
+    """
+    Heartbeat: extender el lease de las facturas que este worker tiene en vuelo
+    
+    Args:
+        worker_id: Identificador del worker dueño de los leases
+        invoices: Facturas en vuelo (con `id` y `companyId`)
+        lease_seconds: Nueva duración del lease desde ahora
+    
+    Returns:
+        (companyId, id) de las facturas cuyo lease ya no es de este worker
+    """
+    db = get_firestore()
+    lease_expires_at = datetime.now(timezone.utc) + timedelta(seconds=lease_seconds)
+    lost = []
+    
+    # Una transacción admite hasta 500 escrituras
+    for start in range(0, len(invoices), 400):
+        chunk = invoices[start:start + 400]
+        refs = [_invoice_ref(db, inv['companyId'], inv['id']) for inv in chunk]
+        lost.extend(_renew_in_transaction(db.transaction(), refs, worker_id, lease_expires_at))
+    
+    logger.debug(f'✓ {len(invoices) - len(lost)} leases renovados por {worker_id}')
+    return lost
+
+@firestore.transactional
+def _update_if_owner_in_transaction(transaction, ref, worker_id: str, data: dict) -> bool:
+    snapshot = ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return False
+    
+    current = snapshot.to_dict()
+    if current.get('status') != 'processing' or current.get('leaseOwner') != worker_id:
+        return False
+    
+    transaction.update(ref, data)
+    return True
+
+def update_invoice_with_lease(company_id: str, invoice_id: str, worker_id: str, data: dict) -> Optional[bool]:
+    """
+    Escribir el resultado de una factura sólo si este worker sigue teniendo su lease
+    
+    Si el lease venció y otra réplica la reclamó (o se devolvió a "pending_ocr"),
+    el resultado se descarta para no pisar el de la réplica que la tiene ahora.
+    
+    Returns:
+        True si se escribió, False si el lease ya no es de este worker, None si hubo error
+    """
+    try:
+        db = get_firestore()
+        ref = _invoice_ref(db, company_id, invoice_id)
+        if not _update_if_owner_in_transaction(db.transaction(), ref, worker_id, data):
+            logger.warning(f'Lease de la factura {invoice_id} perdido: se descarta el resultado de {worker_id}')
+            return False
+        
+        logger.info(f'✓ Factura {invoice_id} actualizada')
+        return True
+    except Exception as e:
+        logger.error(f'Error al actualizar factura {invoice_id}: {e}')
+        return None
+
+@firestore.transactional
+def _reap_in_transaction(transaction, ref, now: datetime) -> bool:
+    """Devolver una factura a "pending_ocr" si su lease sigue vencido"""
+    snapshot = ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return False
+    
+    data = snapshot.to_dict()
+    lease_expires_at = data.get('leaseExpiresAt')
+    
+    if data.get('status') != 'processing' or not lease_expires_at or lease_expires_at > now:
+        # Terminó o fue renovada mientras tanto
+        return False
+    
+    transaction.update(ref, {
+        'status': 'pending_ocr',
+        **release_lease_data()
+    })
+    return True
+
+def reap_expired_leases(limit: int = 50) -> int:
+    """
+    Devolver a "pending_ocr" las facturas cuyo lease venció
+    
+    Returns:
+        Cantidad de facturas liberadas
+    """
+    try:
+        db = get_firestore()
+        now = datetime.now(timezone.utc)
+        reaped = 0
+        
+        def expired_query(invoices_ref):
+            return (
+                invoices_ref
+                .where('status', '==', 'processing')
+                .where('leaseExpiresAt', '<', now)
+            )
+        
+        expired = _query_invoices_collection_group('expired_leases', expired_query, limit)
+        if expired is None:
+            expired = _query_invoices_per_company(expired_query, limit)
+        
+        for invoice in expired:
+            ref = _invoice_ref(db, invoice['companyId'], invoice['id'])
+            if _reap_in_transaction(db.transaction(), ref, now):
+                logger.warning(
+                    f'Lease vencido de {invoice.get("leaseOwner")}: '
+                    f'factura {invoice["id"]} devuelta a pending_ocr'
+                )
+                reaped += 1
+        
+        if reaped:
+            logger.info(f'✓ {reaped} leases vencidos liberados')
+        return reaped
+    except Exception as e:
+        logger.error(f'Error al liberar leases vencidos: {e}')
+        return 0
@@ -0,0 +1,180 @@
+"""
+Ingesta de facturas pendientes
+Modo push con un listener on_snapshot de Firestore: las facturas subidas desde
+la app entran a la cola apenas se crean. Si el listener se cae (o no está
+habilitado), se usa polling con intervalo adaptativo: corto mientras hay
+trabajo y creciente mientras no hay facturas pendientes.
+Las candidatas pasan por el FairScheduler antes de reclamarse, para repartir
+el procesamiento entre empresas
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional
+
+from scheduler import FairScheduler
+
+logger = logging.getLogger(__name__)
+
+class PendingInvoiceFeed:
+    """
+    Fuente de facturas pendientes ya reclamadas para esta réplica
+
+    Args:
+        fetch_fn: Función (limit) -> facturas pendientes candidatas, usada al hacer polling
+        claim_fn: Función (facturas) -> facturas efectivamente reclamadas
+        subscribe_fn: Función (callback) -> watch; None para usar sólo polling
+        scheduler: Scheduler que decide el orden de despacho entre empresas
+        window: Con menos candidatas en cola que la mitad de `window`, se vuelve a hacer poll
+        fetch_window: Cantidad de candidatas a leer en cada poll (por defecto `window`); más
+            grande que `window` para que el scheduler reparta entre empresas aunque una
+            tenga una carga masiva al inicio de la cola
+        min_interval: Intervalo de polling mientras hay trabajo (segundos)
+        max_interval: Intervalo máximo de polling sin trabajo (segundos)
+        safety_interval: Con el listener activo, cada cuánto hacer un poll de respaldo
+        resubscribe_interval: Cada cuánto reintentar el listener si se cayó
+    """
+
+    def __init__(
+        self,
+        fetch_fn: Callable[[int], List[Dict[str, Any]]],
+        claim_fn: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]],
+        subscribe_fn: Optional[Callable[[Callable], Any]] = None,
+        scheduler: Optional[FairScheduler] = None,
+        window: int = 100,
+        fetch_window: Optional[int] = None,
+        min_interval: float = 1.0,
+        max_interval: float = 10.0,
+        safety_interval: float = 60.0,
+        resubscribe_interval: float = 60.0
+    ):
+        self._fetch_fn = fetch_fn
+        self._claim_fn = claim_fn
+        self._subscribe_fn = subscribe_fn
+        self._scheduler = scheduler or FairScheduler()
+        self._window = window
+        self._fetch_window = max(window, fetch_window or window)
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._safety_interval = safety_interval
+        self._resubscribe_interval = resubscribe_interval
+
+        # El evento indica que el scheduler tiene candidatas; el lock coordina push/pop con el evento
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+
+        self._watch = None
+        self._interval = min_interval
+        self._next_subscribe_at = 0.0
+        self._next_safety_poll_at = 0.0
+        self._stopped = False
+
+    def start(self):
+        """Iniciar el listener (si está habilitado)"""
+        if self._subscribe_fn:
+            self._subscribe()
+        else:
+            logger.info('Ingesta por polling adaptativo')
+
+    def stop(self):
+        """Cerrar el listener y despertar a quien esté esperando en next_batch"""
+        self._stopped = True
+        self._event.set()
+
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception as e:
+                logger.warning(f'Error al cerrar listener: {e}')
+            self._watch = None
+
+    def listening(self) -> bool:
+        """True si el listener on_snapshot está activo"""
+        # Watch.is_active pasa a False cuando el stream deja de recibir mensajes (se cayó o se cerró)
+        return self._watch is not None and self._watch.is_active
+
+    def next_batch(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        Obtener hasta `limit` facturas reclamadas, en el orden del scheduler
+
+        Bloquea hasta que haya candidatas o venza el intervalo correspondiente,
+        por lo que el loop principal no necesita dormir entre llamadas.
+        """
+        if self._stopped:
+            return []
+
+        if self.listening():
+            self._wait_for_arrivals()
+        elif self._subscribe_fn and time.monotonic() >= self._next_subscribe_at:
+            logger.warning('Listener de facturas inactivo, reintentando suscripción...')
+            self._subscribe()
+            if self.listening():
+                self._wait_for_arrivals()
+            else:
+                self._poll()
+        else:
+            self._poll()
+
+        if self._stopped:
+            return []
+
+        with self._lock:
+            batch = self._scheduler.pop(limit)
+            if not len(self._scheduler):
+                self._event.clear()
+
+        return self._claim_fn(batch) if batch else []
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Candidatas en cola por empresa"""
+        return self._scheduler.depths()
+
+    def _add_candidates(self, invoices: List[Dict[str, Any]]) -> int:
+        added = 0
+
+        with self._lock:
+            for invoice in invoices:
+                if self._scheduler.push(invoice):
+                    added += 1
+            if len(self._scheduler):
+                self._event.set()
+
+        return added
+
+    def _subscribe(self):
+        self._next_subscribe_at = time.monotonic() + self._resubscribe_interval
+        self._next_safety_poll_at = time.monotonic() + self._safety_interval
+
+        try:
+            self._watch = self._subscribe_fn(self._add_candidates)
+            logger.info('✓ Listener de facturas pendientes activo')
+        except Exception as e:
+            logger.warning(f'No se pudo iniciar el listener, usando polling adaptativo: {e}')
+            self._watch = None
+
+    def _wait_for_arrivals(self):
+        """Esperar notificaciones del listener, revisando periódicamente que siga vivo"""
+        while not self._event.wait(timeout=self._max_interval):
+            if not self.listening():
+                return
+
+            if time.monotonic() >= self._next_safety_poll_at:
+                # Poll de respaldo por si se perdió algún evento
+                self._next_safety_poll_at = time.monotonic() + self._safety_interval
+                self._add_candidates(self._fetch_fn(self._fetch_window))
+                return
+
+    def _poll(self):
+        """Poll con intervalo adaptativo; sólo consulta si el scheduler se está vaciando"""
+        if len(self._scheduler) >= self._window // 2:
+            return
+
+        self._add_candidates(self._fetch_fn(self._fetch_window))
+
+        if len(self._scheduler):
+            self._interval = self._min_interval
+        else:
+            logger.debug(f'No hay facturas pendientes, esperando {self._interval:.0f}s...')
+            time.sleep(self._interval)
+            self._interval = min(self._interval * 2, self._max_interval)
@@ -0,0 +1,323 @@
+"""
+Geometría de las palabras del OCR y extracción de la tabla de items
+Las cajas de las palabras se guardan en arreglos NumPy (una fila por palabra)
+en vez de un dict por palabra. Sobre ellas se agrupan filas y columnas
+ordenando (O(n log n) en la cantidad de palabras) para armar los items con la
+forma de `InvoiceItem` de la app: description, quantity, unitPrice, total
+"""
+
+import logging
+import re
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# CAJAS DE PALABRAS
+# ============================================
+
+class WordBoxes:
+    """
+    Palabras del OCR con su caja alineada a los ejes
+
+    Attributes:
+        texts: Texto de cada palabra
+        boxes: float32 (n, 4) con x0, y0, x1, y1 en píxeles de la página
+        pages: int32 (n,) con el índice de página de cada palabra
+    """
+
+    __slots__ = ('texts', 'boxes', 'pages')
+
+    def __init__(self, texts: List[str], boxes: np.ndarray, pages: np.ndarray):
+        self.texts = texts
+        self.boxes = boxes
+        self.pages = pages
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Forma serializable a JSON (para el cache OCR)"""
+        return {
+            'texts': self.texts,
+            'boxes': self.boxes.round(1).ravel().tolist(),
+            'pages': self.pages.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'WordBoxes':
+        return cls(
+            list(data['texts']),
+            np.asarray(data['boxes'], dtype=np.float32).reshape(-1, 4),
+            np.asarray(data['pages'], dtype=np.int32)
+        )
+
+def word_boxes_from_annotations(annotations: List[Any]) -> WordBoxes:
+    """
+    Cajas de todas las palabras de uno o más full_text_annotation (protobuf crudo)
+
+    Las imágenes traen vértices en píxeles; las páginas de PDF/TIFF traen
+    vértices normalizados (0..1), que se escalan al tamaño de la página.
+    """
+    texts = []
+    # 4 vértices (x, y) por palabra, en una lista plana
+    coords = []
+    pages = []
+    page_index = 0
+
+    for annotation in annotations:
+        for page in annotation.pages:
+            width = page.width or 1
+            height = page.height or 1
+
+            for block in page.blocks:
+                for paragraph in block.paragraphs:
+                    for word in paragraph.words:
+                        box = word.bounding_box
+                        vertices = box.vertices
+                        if len(vertices) == 4:
+                            for vertex in vertices:
+                                coords.append(vertex.x)
+                                coords.append(vertex.y)
+                        elif len(box.normalized_vertices) == 4:
+                            for vertex in box.normalized_vertices:
+                                coords.append(vertex.x * width)
+                                coords.append(vertex.y * height)
+                        else:
+                            continue
+
+                        texts.append(''.join([symbol.text for symbol in word.symbols]))
+                        pages.append(page_index)
+
+            page_index += 1
+
+    points = np.asarray(coords, dtype=np.float32).reshape(-1, 4, 2)
+    boxes = np.concatenate([points.min(axis=1), points.max(axis=1)], axis=1)
+    return WordBoxes(texts, boxes, np.asarray(pages, dtype=np.int32))
+
+# ============================================
+# FILAS Y CELDAS
+# ============================================
+
+def _group_rows(boxes: np.ndarray, pages: np.ndarray) -> np.ndarray:
+    """
+    Fila de cada palabra (0, 1, ... de arriba hacia abajo)
+
+    Se ordena por página y centro vertical; una fila nueva empieza donde el salto
+    entre centros consecutivos supera media altura de palabra (mediana).
+    """
+    heights = boxes[:, 3] - boxes[:, 1]
+    tolerance = max(float(np.median(heights)) * 0.5, 1.0)
+    centers = (boxes[:, 1] + boxes[:, 3]) / 2
+
+    order = np.lexsort((centers, pages))
+    new_row = np.empty(len(order), dtype=bool)
+    new_row[0] = True
+    new_row[1:] = (np.diff(centers[order]) > tolerance) | (np.diff(pages[order]) != 0)
+
+    row_ids = np.empty(len(order), dtype=np.int64)
+    row_ids[order] = np.cumsum(new_row) - 1
+    return row_ids
+
+def _rows_cells(words: WordBoxes, gap: float) -> List[List[Dict[str, Any]]]:
+    """
+    Celdas de cada fila, de izquierda a derecha
+
+    Una celda son palabras contiguas de una fila (separación menor a `gap`);
+    filas y celdas se cortan con operaciones sobre todos los arreglos a la vez.
+    """
+    boxes = words.boxes
+    row_ids = _group_rows(boxes, words.pages)
+
+    # Palabras ordenadas por fila y, dentro de la fila, de izquierda a derecha
+    order = np.lexsort((boxes[:, 0], row_ids))
+    sorted_boxes = boxes[order]
+    sorted_rows = row_ids[order]
+
+    new_row = np.empty(len(order), dtype=bool)
+    new_row[0] = True
+    new_row[1:] = sorted_rows[1:] != sorted_rows[:-1]
+    new_cell = new_row.copy()
+    new_cell[1:] |= sorted_boxes[1:, 0] - sorted_boxes[:-1, 2] > gap
+
+    cell_starts = np.flatnonzero(new_cell)
+    cell_ends = np.append(cell_starts[1:], len(order))
+    cell_x0 = sorted_boxes[cell_starts, 0]
+    cell_x1 = np.maximum.reduceat(sorted_boxes[:, 2], cell_starts)
+
+    texts = [words.texts[index] for index in order.tolist()]
+    rows = []
+    for start, end, x0, x1, starts_row in zip(
+        cell_starts.tolist(), cell_ends.tolist(), cell_x0.tolist(), cell_x1.tolist(), new_row[cell_starts].tolist()
+    ):
+        if starts_row:
+            rows.append([])
+        rows[-1].append({'text': ' '.join(texts[start:end]), 'x0': x0, 'x1': x1})
+    return rows
+
+# ============================================
+# ITEMS
+# ============================================
+
+# Encabezados de columna (texto de la celda en minúsculas)
+_COLUMN_HEADERS = [
+    ('quantity', re.compile(r'^(?:cant(?:idad)?\.?|qty|unid(?:ades)?\.?)$')),
+    ('unitPrice', re.compile(r'^(?:p(?:recio)?\.?\s*unit(?:ario)?\.?|precio|valor\s+unit(?:ario)?\.?|v\.?\s*unit\.?)$')),
+    ('discount', re.compile(r'^(?:desc(?:uento)?\.?|dcto\.?|%\s*desc\.?)$')),
+    ('total', re.compile(r'^(?:total|valor|monto|subtotal|importe|total\s+l[íi]nea)$')),
+    ('description', re.compile(r'^(?:descripci[óo]n|detalle|glosa|producto|art[íi]culo|[íi]tem|concepto)')),
+]
+
+# Filas que cierran la tabla (totales del documento)
+_FOOTER_RE = re.compile(r'^(?:monto\s+)?(?:neto|sub\s*total|i\.?v\.?a\.?|total|exento|impuesto|descuento\s+global)\b')
+
+_NUMBER_RE = re.compile(r'^\$?\s*(\d{1,3}(?:\.\d{3})+|\d+)(?:,(\d+))?$')
+
+def _parse_number(text: str) -> Optional[float]:
+    """Número chileno (puntos de miles, coma decimal, $ opcional) o None"""
+    match = _NUMBER_RE.match(text.strip())
+    if not match:
+        return None
+    integer, decimals = match.groups()
+    return float(integer.replace('.', '') + ('.' + decimals if decimals else ''))
+
+def _header_columns(cells: List[Dict[str, Any]]) -> Optional[Dict[str, float]]:
+    """Centro horizontal de cada columna si la fila es un encabezado de tabla de items"""
+    columns = {}
+    for cell in cells:
+        text = cell['text'].lower()
+        for role, pattern in _COLUMN_HEADERS:
+            if role not in columns and pattern.match(text):
+                columns[role] = (cell['x0'] + cell['x1']) / 2
+                break
+
+    if 'description' in columns and 'total' in columns and len(columns) >= 3:
+        return columns
+    return None
+
+def _item_from_values(description: str, values: Dict[str, float]) -> Optional[Dict[str, Any]]:
+    """Completar cantidad, precio unitario y total a partir de los que estén"""
+    quantity = values.get('quantity')
+    unit_price = values.get('unitPrice')
+    total = values.get('total')
+
+    if total is None and unit_price is None:
+        return None
+    if quantity is None or quantity <= 0:
+        quantity = total / unit_price if total is not None and unit_price else 1.0
+    if unit_price is None:
+        unit_price = total / quantity
+    if total is None:
+        total = quantity * unit_price
+
+    item = {
+        'description': description,
+        'quantity': quantity,
+        'unitPrice': unit_price,
+        'total': total
+    }
+    if values.get('discount') is not None:
+        item['discount'] = values['discount']
+    return item
+
+def _row_item(cells: List[Dict[str, Any]], roles: List[str], bounds: List[float]):
+    """
+    Asignar cada celda de una fila a la columna más cercana del encabezado
+
+    Returns:
+        (descripción, valores numéricos por columna)
+    """
+    description = []
+    values: Dict[str, float] = {}
+    for cell in cells:
+        role = roles[bisect_left(bounds, (cell['x0'] + cell['x1']) / 2)]
+        number = None if role == 'description' else _parse_number(cell['text'])
+        if number is None:
+            description.append(cell['text'])
+        else:
+            values.setdefault(role, number)
+    return ' '.join(description), values
+
+def _items_without_header(rows_cells: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Sin encabezado reconocible: filas con texto seguido de cantidad, precio y total
+    consistentes (cantidad × precio ≈ total)
+    """
+    items = []
+    for cells in rows_cells:
+        if len(cells) < 4 or _FOOTER_RE.match(cells[0]['text'].lower()):
+            continue
+
+        numbers = [_parse_number(cell['text']) for cell in cells[-3:]]
+        if None in numbers:
+            continue
+
+        quantity, unit_price, total = numbers
+        if quantity > 0 and abs(quantity * unit_price - total) <= max(1.0, total * 0.01):
+            description = ' '.join(cell['text'] for cell in cells[:-3])
+            items.append(_item_from_values(description, {'quantity': quantity, 'unitPrice': unit_price, 'total': total}))
+    return items
+
+def extract_layout_items(words: WordBoxes) -> List[Dict[str, Any]]:
+    """
+    Extraer los items de la factura a partir de la geometría de las palabras
+
+    Agrupa las palabras en filas (orden por centro vertical) y celdas (palabras
+    contiguas), busca el encabezado de la tabla (Descripción / Cantidad / Precio /
+    Total) y asigna cada celda de las filas siguientes a la columna más cercana
+    hasta llegar a los totales del documento. Sin encabezado, toma las filas que
+    terminan en cantidad, precio unitario y total consistentes.
+
+    Args:
+        words: Cajas de las palabras (ver word_boxes_from_annotations)
+
+    Returns:
+        Lista de items con description, quantity, unitPrice, total (y discount si hay)
+    """
+    if not len(words):
+        return []
+
+    heights = words.boxes[:, 3] - words.boxes[:, 1]
+    # Separación entre palabras de una misma celda: ~un espacio
+    gap = max(float(np.median(heights)) * 0.8, 1.0)
+
+    rows_cells = _rows_cells(words, gap)
+
+    items = []
+    found_header = False
+    # Columnas del encabezado vigente: roles de izquierda a derecha y límites
+    # entre columnas (puntos medios entre centros consecutivos)
+    roles = None
+    bounds = None
+
+    for cells in rows_cells:
+        columns = _header_columns(cells)
+        if columns:
+            found_header = True
+            roles = sorted(columns, key=columns.get)
+            centers = [columns[role] for role in roles]
+            bounds = [(left + right) / 2 for left, right in zip(centers, centers[1:])]
+            continue
+
+        if roles is None:
+            continue
+        if _FOOTER_RE.match(cells[0]['text'].lower()):
+            roles = None
+            continue
+
+        description, values = _row_item(cells, roles, bounds)
+        item = _item_from_values(description, values) if values else None
+        if item:
+            items.append(item)
+        elif description and items:
+            # Descripción en varias líneas: continuar el item anterior
+            items[-1]['description'] = f'{items[-1]["description"]} {description}'
+
+    if not found_header:
+        items = _items_without_header(rows_cells)
+
+    logger.debug(f'{len(items)} items extraídos de {len(words)} palabras')
+    return items
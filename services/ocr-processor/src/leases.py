@@ -0,0 +1,106 @@
+"""
+Renovación de leases de facturas en vuelo
+Una factura reclamada puede esperar en la cola del pool o del pipeline, o
+tardar más que OCR_LEASE_SECONDS en procesarse. Mientras esta réplica la
+tenga, un heartbeat extiende su `leaseExpiresAt` para que ninguna réplica
+(ni ésta) la devuelva a "pending_ocr" y la vuelva a procesar
+"""
+
+import logging
+import threading
+from typing import Callable, Dict, Any, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+LeaseKey = Tuple[str, str]
+
+def lease_key(invoice_data: Dict[str, Any]) -> LeaseKey:
+    return (invoice_data.get('companyId'), invoice_data.get('id'))
+
+class LeaseKeeper:
+    """
+    Heartbeat de los leases de las facturas reclamadas por esta réplica
+
+    Args:
+        renew_fn: Función (facturas) -> claves (companyId, id) de las que ya no
+            son de esta réplica; extiende el lease de las demás
+        interval: Cada cuántos segundos renovar (menor que la duración del lease)
+    """
+
+    def __init__(self, renew_fn: Callable[[List[Dict[str, Any]]], Iterable[LeaseKey]], interval: float):
+        self._renew_fn = renew_fn
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._leases: Dict[LeaseKey, Dict[str, Any]] = {}
+        self._lost: Set[LeaseKey] = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Iniciar el thread del heartbeat"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='lease-heartbeat', daemon=True)
+        self._thread.start()
+        logger.info(f'✓ Heartbeat de leases cada {self._interval:.0f}s')
+
+    def stop(self):
+        """Detener el heartbeat (después de drenar las facturas en vuelo)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def track(self, invoices: Iterable[Dict[str, Any]]):
+        """Empezar a renovar el lease de facturas recién reclamadas"""
+        with self._lock:
+            for invoice in invoices:
+                if invoice.get('leaseOwner'):
+                    key = lease_key(invoice)
+                    self._leases[key] = invoice
+                    self._lost.discard(key)
+
+    def release(self, invoice_data: Dict[str, Any]):
+        """Dejar de renovar el lease (la factura terminó, bien o con error)"""
+        key = lease_key(invoice_data)
+        with self._lock:
+            self._leases.pop(key, None)
+            self._lost.discard(key)
+
+    def is_lost(self, invoice_data: Dict[str, Any]) -> bool:
+        """True si el último heartbeat encontró la factura reclamada por otra réplica"""
+        with self._lock:
+            return lease_key(invoice_data) in self._lost
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._leases)
+
+    def renew(self) -> int:
+        """
+        Renovar ahora todos los leases en vuelo
+
+        Returns:
+            Cantidad de leases renovados
+        """
+        with self._lock:
+            invoices = list(self._leases.values())
+        if not invoices:
+            return 0
+
+        try:
+            lost = set(self._renew_fn(invoices))
+        except Exception as e:
+            logger.error(f'Error al renovar leases: {e}')
+            return 0
+
+        with self._lock:
+            for key in lost:
+                if self._leases.pop(key, None) is not None:
+                    self._lost.add(key)
+                    logger.warning(f'Lease perdido: la factura {key[1]} ya no es de esta réplica')
+
+        return len(invoices) - len(lost)
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self.renew()
@@ -3,25 +3,73 @@ Script principal para procesamiento de facturas con OCR
 Escucha facturas pendientes en Firestore y las procesa automáticamente
 """
 
+import asyncio
 import logging
+import threading
 import time
 import sys
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 
 # Importar módulos locales
-from config import validate_config
+from config import (
+    validate_config,
+    OCR_MODE,
+    OCR_WORKERS,
+    OCR_QUEUE_SIZE,
+    OCR_WORKER_ID,
+    OCR_LEASE_SECONDS,
+    OCR_LEASE_REAP_INTERVAL,
+    OCR_LEASE_RENEW_INTERVAL,
+    OCR_INGESTION,
+    OCR_POLL_MIN_INTERVAL,
+    OCR_POLL_MAX_INTERVAL,
+    OCR_SAFETY_POLL_INTERVAL,
+    OCR_SCHEDULER_WINDOW,
+    OCR_FETCH_WINDOW,
+    OCR_COMPANY_WEIGHTS,
+    PIPELINE_STAGE_CONCURRENCY,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_OCR_BATCH_SIZE,
+    OCR_DEDUP,
+    OCR_DEDUP_REUSE,
+    OCR_DEDUP_MAX_DISTANCE,
+    OCR_DEDUP_WINDOW_HOURS,
+    OCR_DEDUP_INDEX_SIZE,
+    OCR_EXTRACT_ITEMS,
+    PARSER_STREAMING
+)
 from firebase_client import (
     initialize_firebase,
+    get_invoice,
+    get_recent_image_hashes,
     get_pending_invoices,
+    claim_invoices,
+    watch_pending_invoices,
+    reap_expired_leases,
+    renew_leases,
+    release_lease_data,
+    invoice_status_data,
     update_invoice,
     update_invoice_status,
+    update_invoice_with_lease,
     download_image_from_storage,
     get_supplier_from_cache,
     save_supplier_cache
 )
-from ocr import extract_text_from_image
-from parser import parse_invoice_text, validate_rut
-from sii import query_sii_by_rut, format_rut
+from ocr import extract_text_from_image, extract_text_from_images, preprocess_image_if_needed
+from ocr_cache import get_ocr_cache, image_hash
+from parser import parse_invoice_blocks, parse_invoice_text
+from rut import format_rut, parse_rut
+from sii import query_sii_by_rut
+from supplier_cache import SingleFlight, SupplierCache, get_supplier_cache
+from worker_pool import InvoiceWorkerPool
+from pipeline import AsyncPipeline, Stage
+from ingestion import PendingInvoiceFeed
+from leases import LeaseKeeper
+from scheduler import FairScheduler, parse_company_weights
+from dedup import NearDuplicateIndex, perceptual_hash
+from contributors import lookup_contributor
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +77,413 @@ logger = logging.getLogger(__name__)
 # PIPELINE DE PROCESAMIENTO
 # ============================================
 
+# Hashes perceptuales recientes por empresa (se precargan desde Firestore)
+duplicate_index = NearDuplicateIndex(
+    max_distance=OCR_DEDUP_MAX_DISTANCE,
+    max_per_company=OCR_DEDUP_INDEX_SIZE,
+    max_age_seconds=OCR_DEDUP_WINDOW_HOURS * 3600,
+    loader=lambda company_id: get_recent_image_hashes(company_id, OCR_DEDUP_INDEX_SIZE)
+)
+
+# Leases de las facturas reclamadas por esta réplica, renovados mientras están en vuelo
+lease_keeper = LeaseKeeper(
+    renew_fn=lambda invoices: renew_leases(OCR_WORKER_ID, invoices, OCR_LEASE_SECONDS),
+    interval=OCR_LEASE_RENEW_INTERVAL
+)
+
+# Campos parseados que deben coincidir para confirmar que una foto casi idéntica es la misma factura
+_DUPLICATE_KEY_FIELDS = ('number', 'emisorRut', 'totalAmount')
+
+# Datos del SII de la factura original que se copian a un duplicado confirmado (OCR_DEDUP_REUSE)
+_REUSED_FIELDS = (
+    'emisorRazonSocial', 'emisorGiro', 'emisorDireccion', 'emisorComuna', 'receptorRazonSocial'
+)
+
+# Campos parseados que además se copian de una re-subida byte a byte idéntica (se salta el OCR)
+_REUSED_PARSED_FIELDS = (
+    'type', 'number', 'date', 'emisorRut', 'receptorRut', 'netoAmount', 'ivaAmount', 'totalAmount', 'items'
+)
+
+def _detect_near_duplicate(job: Dict[str, Any], image_bytes: bytes) -> None:
+    """
+    Calcular el hash perceptual de la imagen y, si es casi idéntica a una factura
+    reciente de la misma empresa, guardarla como candidata (`duplicate_candidate`)
+    
+    El hash no distingue facturas distintas de la misma plantilla (mismo proveedor,
+    otros montos), así que la candidata se confirma después del parseo. Si el
+    contenido es idéntico byte a byte (SHA-256) se confirma aquí y, con
+    OCR_DEDUP_REUSE, se reutiliza el resultado de la original sin pasar por el OCR.
+    """
+    job['image_sha256'] = image_hash(image_bytes)
+    phash = perceptual_hash(image_bytes)
+    if phash is None:
+        return
+    job['perceptual_hash'] = phash
+    
+    invoice_data = job['invoice']
+    match = duplicate_index.find(invoice_data.get('companyId'), phash)
+    if not match or match[0] == invoice_data.get('id'):
+        return
+    
+    if match[1] == 0 and OCR_DEDUP_REUSE and _reuse_identical_image(job, match[0]):
+        return
+    logger.info(f'Foto parecida a la factura {match[0]} (distancia {match[1]}), se confirmará tras el parseo')
+    job['duplicate_candidate'] = match[0]
+
+def _reuse_identical_image(job: Dict[str, Any], original_id: str) -> bool:
+    """
+    Copiar el texto OCR y los datos de la original si la imagen es la misma (mismo SHA-256)
+    
+    Sólo originales ya procesadas que guardaron `imageSha256`; las anteriores a
+    ese campo siguen por la confirmación tras el parseo.
+    
+    Returns:
+        True si el job quedó completo (`reused`) y se saltan OCR, parseo y SII
+    """
+    invoice_data = job['invoice']
+    original = get_invoice(invoice_data.get('companyId'), original_id)
+    if (
+        not original
+        or original.get('imageSha256') != job['image_sha256']
+        or original.get('status') not in ('ocr_done', 'verified')
+        or not original.get('ocrRawText')
+    ):
+        return False
+    
+    logger.info(f'✓ Imagen idéntica a la factura {original_id}: se reutiliza su resultado sin OCR')
+    job['duplicate_of'] = original_id
+    job['reused'] = True
+    job['text'] = original['ocrRawText']
+    job['confidence'] = original.get('ocrConfidence', 0.0)
+    job['parsed_data'] = {
+        field: original.get(field) for field in _REUSED_PARSED_FIELDS + _REUSED_FIELDS
+    }
+    return True
+
+def _same_key_fields(parsed_data: Dict[str, Any], original: Dict[str, Any]) -> bool:
+    """Número, RUT del emisor y total presentes y iguales en ambas facturas"""
+    for field in _DUPLICATE_KEY_FIELDS:
+        value, original_value = parsed_data.get(field), original.get(field)
+        if value is None or original_value is None:
+            return False
+        if field == 'emisorRut':
+            value, original_value = parse_rut(str(value)), parse_rut(str(original_value))
+            if value is None or value != original_value:
+                return False
+        elif field == 'totalAmount':
+            try:
+                if float(value) != float(original_value):
+                    return False
+            except (TypeError, ValueError):
+                return False
+        elif str(value).strip() != str(original_value).strip():
+            return False
+    return True
+
+def _confirm_near_duplicate(job: Dict[str, Any]) -> None:
+    """
+    Marcar `duplicate_of` sólo si la candidata del hash tiene el mismo número,
+    RUT del emisor y total que lo parseado
+    
+    Con OCR_DEDUP_REUSE se copian además los datos del SII de la original
+    (marcando `reused`) para saltar la consulta.
+    """
+    original_id = job.pop('duplicate_candidate', None)
+    if not original_id:
+        return
+    
+    invoice_data = job['invoice']
+    original = get_invoice(invoice_data.get('companyId'), original_id)
+    if not original or not _same_key_fields(job['parsed_data'], original):
+        logger.info(f'La factura {original_id} tiene otros datos: no es un duplicado')
+        return
+    
+    logger.info(f'✓ Duplicado confirmado de la factura {original_id} (mismo número, emisor y total)')
+    job['duplicate_of'] = original_id
+    
+    if OCR_DEDUP_REUSE and original.get('status') in ('ocr_done', 'verified'):
+        job['reused'] = True
+        job['parsed_data'].update(
+            (field, original[field]) for field in _REUSED_FIELDS if original.get(field) is not None
+        )
+
+def download_step(job: Dict[str, Any]) -> None:
+    """Paso 1: Marcar la factura como "processing", descargar su imagen, detectar duplicados y pre-procesarla"""
+    invoice_data = job['invoice']
+    
+    # Actualizar estado a "processing" (las facturas reclamadas con lease ya lo están)
+    if not invoice_data.get('leaseOwner'):
+        update_invoice_status(invoice_data.get('companyId'), invoice_data.get('id'), 'processing')
+    
+    logger.info('PASO 1: Descargando imagen desde Storage...')
+    image_bytes = download_image_from_storage(invoice_data.get('imageUrl'))
+    
+    if not image_bytes:
+        raise Exception('No se pudo descargar la imagen desde Storage')
+    
+    if OCR_DEDUP:
+        _detect_near_duplicate(job, image_bytes)
+        if job.get('reused'):
+            return
+    
+    # Reducir la imagen aquí, antes de que espere en cola para el OCR
+    job['image_bytes'] = preprocess_image_if_needed(image_bytes)
+
+def _apply_ocr_result(job: Dict[str, Any], ocr_result: Dict[str, Any]) -> None:
+    """Validar el resultado del OCR y guardarlo en el job"""
+    if ocr_result.get('error'):
+        raise Exception(f'Error en OCR: {ocr_result["error"]}')
+    
+    text = ocr_result.get('text', '')
+    confidence = ocr_result.get('confidence', 0.0)
+    
+    if not text:
+        raise Exception('No se extrajo texto de la imagen')
+    
+    logger.info(f'✓ Texto extraído: {len(text)} caracteres (confianza: {confidence:.1%})')
+    
+    job['text'] = text
+    job['confidence'] = confidence
+    job['layout'] = ocr_result.get('layout')
+    job['blocks'] = ocr_result.get('blocks')
+
+def ocr_step(job: Dict[str, Any]) -> None:
+    """Paso 2: Extraer texto con OCR"""
+    if job.get('reused'):
+        return
+    logger.info('PASO 2: Extrayendo texto con Google Cloud Vision OCR...')
+    
+    # La imagen ya no se necesita después del OCR, liberar memoria
+    # El parser usa el texto completo y las cajas de las palabras (items); los
+    # bloques sólo en modo streaming
+    _apply_ocr_result(
+        job,
+        extract_text_from_image(
+            job.pop('image_bytes'),
+            include_blocks=PARSER_STREAMING,
+            include_layout=OCR_EXTRACT_ITEMS
+        )
+    )
+
+def ocr_batch_step(jobs: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+    """Paso 2 en lote: una sola solicitud a Vision para varias facturas"""
+    # Las re-subidas idénticas ya traen el resultado de la original
+    pending = [job for job in jobs if not job.get('reused')]
+    errors: Dict[int, Exception] = {}
+    
+    if pending:
+        logger.info(f'PASO 2: Extrayendo texto con Google Cloud Vision OCR ({len(pending)} facturas)...')
+        ocr_results = extract_text_from_images(
+            [job.pop('image_bytes') for job in pending],
+            include_blocks=PARSER_STREAMING,
+            include_layout=OCR_EXTRACT_ITEMS
+        )
+        
+        for job, ocr_result in zip(pending, ocr_results):
+            try:
+                _apply_ocr_result(job, ocr_result)
+            except Exception as e:
+                errors[id(job)] = e
+    
+    return [errors.get(id(job)) for job in jobs]
+
+def parse_step(job: Dict[str, Any]) -> None:
+    """Paso 3: Parsear texto y extraer datos estructurados"""
+    if job.get('reused'):
+        return
+    logger.info('PASO 3: Parseando texto y extrayendo datos...')
+    layout = job.pop('layout', None)
+    blocks = job.pop('blocks', None)
+    
+    if blocks is None:
+        job['parsed_data'] = parse_invoice_text(job['text'], layout=layout)
+        return
+    
+    def on_field(field: str, value: Any):
+        if field == 'emisorRut':
+            _prefetch_supplier(job, value)
+    
+    job['parsed_data'] = parse_invoice_blocks(blocks, layout=layout, on_field=on_field)
+
+# Consultas al SII adelantadas desde el parseo por bloques (el rate limiter 'sii' marca el ritmo)
+_supplier_prefetch: Optional[ThreadPoolExecutor] = None
+_supplier_prefetch_lock = threading.Lock()
+
+def _prefetch_supplier(job: Dict[str, Any], emisor_rut: str) -> None:
+    """Empezar a buscar los datos del emisor mientras el parseo sigue con los montos"""
+    global _supplier_prefetch
+    
+    emisor = parse_rut(emisor_rut)
+    if not emisor or not emisor.is_valid:
+        return
+    
+    # Varios workers o etapas de parseo pueden llegar acá a la vez: un solo executor
+    with _supplier_prefetch_lock:
+        if _supplier_prefetch is None:
+            _supplier_prefetch = ThreadPoolExecutor(max_workers=4, thread_name_prefix='sii-prefetch')
+    job['supplier_prefetch'] = (str(emisor), _supplier_prefetch.submit(_lookup_supplier, str(emisor)))
+
+# Búsquedas de proveedor en vuelo por RUT normalizado (compartidas por workers, etapas y prefetch)
+_supplier_flights = SingleFlight()
+
+def _lookup_supplier(emisor_rut: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """
+    Datos del emisor desde el cache en memoria, el registro local de
+    contribuyentes, el cache de proveedores en Firestore o, si no están, desde el SII
+    
+    Búsquedas simultáneas del mismo RUT (ej: lote mensual de un proveedor)
+    esperan la que ya está en vuelo y comparten su resultado.
+    
+    Returns:
+        (datos o None, si vinieron del cache)
+    """
+    emisor_rut = format_rut(emisor_rut)
+    memory = get_supplier_cache()
+    if memory:
+        found, data = memory.get(emisor_rut)
+        if found:
+            if data is None:
+                logger.info(f'RUT {emisor_rut} sin datos en el SII (según cache en memoria)')
+            return data, data is not None
+    
+    # Registro local: datos completos (dirección, comuna) sin red
+    local_data = lookup_contributor(emisor_rut)
+    if local_data:
+        logger.info(f'✓ Emisor {emisor_rut} encontrado en el registro local de contribuyentes')
+        return local_data, False
+    
+    return _supplier_flights.do(emisor_rut, lambda: _fetch_supplier(emisor_rut, memory))
+
+def _fetch_supplier(emisor_rut: str, memory: Optional[SupplierCache]) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """Firestore y después el SII; el resultado queda en el cache en memoria antes de soltar a los que esperan"""
+    cached_data = get_supplier_from_cache(emisor_rut)
+    if cached_data:
+        if memory:
+            memory.put(emisor_rut, cached_data)
+        return cached_data, True
+    
+    try:
+        sii_data = query_sii_by_rut(emisor_rut, raise_errors=True)
+    except Exception:
+        # Error de red o del SII: no se recuerda como "no encontrado"
+        return None, False
+    
+    if sii_data:
+        # Guardar en cache
+        save_supplier_cache(emisor_rut, sii_data)
+        if memory:
+            memory.put(emisor_rut, sii_data)
+    elif memory:
+        memory.put_not_found(emisor_rut)
+    return sii_data, False
+
+def sii_step(job: Dict[str, Any]) -> None:
+    """Paso 4: Consultar SII por RUT del emisor (si existe)"""
+    # Confirmar aquí (etapa que espera red) la candidata a duplicado con los datos ya parseados
+    _confirm_near_duplicate(job)
+    if job.get('reused'):
+        return
+    
+    parsed_data = job['parsed_data']
+    emisor = parse_rut(parsed_data.get('emisorRut') or '')
+    
+    if emisor and emisor.is_valid:
+        # Forma normalizada: la misma clave de cache para cualquier forma de escribir el RUT
+        emisor_rut = str(emisor)
+        logger.info(f'PASO 4: Consultando SII para emisor: {emisor_rut}')
+        
+        # Cache primero y después el SII; en modo streaming la búsqueda ya empezó durante el parseo
+        prefetch = job.pop('supplier_prefetch', None)
+        if prefetch and prefetch[0] == emisor_rut:
+            supplier_data, from_cache = prefetch[1].result()
+        else:
+            supplier_data, from_cache = _lookup_supplier(emisor_rut)
+        
+        if supplier_data and from_cache:
+            logger.info('✓ Datos obtenidos desde cache')
+            parsed_data['emisorRazonSocial'] = supplier_data.get('razonSocial', parsed_data.get('emisorRazonSocial'))
+            parsed_data['emisorGiro'] = supplier_data.get('giro', '')
+        elif supplier_data:
+            parsed_data['emisorRazonSocial'] = supplier_data.get('razonSocial', parsed_data.get('emisorRazonSocial'))
+            parsed_data['emisorGiro'] = supplier_data.get('giro', '')
+            parsed_data['emisorDireccion'] = supplier_data.get('direccion', '')
+            parsed_data['emisorComuna'] = supplier_data.get('comuna', '')
+        else:
+            logger.warning('No se pudieron obtener datos del SII para el emisor')
+    else:
+        logger.warning('RUT del emisor no encontrado o inválido, saltando consulta al SII')
+
+def _write_final_result(invoice_data: Dict[str, Any], data: Dict[str, Any]) -> Optional[bool]:
+    """
+    Escribir el resultado final (ocr_done o error) de una factura
+    
+    Las facturas reclamadas se escriben sólo si esta réplica sigue teniendo el
+    lease; si lo perdió, otra réplica la está procesando y el resultado se descarta.
+    
+    Returns:
+        True si se escribió, False si se perdió el lease, None si hubo error
+    """
+    company_id, invoice_id = invoice_data.get('companyId'), invoice_data.get('id')
+    if not invoice_data.get('leaseOwner'):
+        return update_invoice(company_id, invoice_id, data) or None
+    return update_invoice_with_lease(company_id, invoice_id, OCR_WORKER_ID, data)
+
+def update_step(job: Dict[str, Any]) -> None:
+    """Paso 5: Actualizar documento en Firestore"""
+    invoice_data = job['invoice']
+    logger.info('PASO 5: Actualizando factura en Firestore...')
+    
+    update_data = {
+        'status': 'ocr_done',
+        'ocrRawText': job['text'],
+        'ocrConfidence': job['confidence'],
+        **release_lease_data(),
+        **{k: v for k, v in job['parsed_data'].items() if v is not None and k != 'raw_matches'}
+    }
+    
+    phash = job.get('perceptual_hash')
+    if phash is not None:
+        update_data['perceptualHash'] = f'{phash:064x}'
+    if job.get('image_sha256'):
+        update_data['imageSha256'] = job['image_sha256']
+    if job.get('duplicate_of'):
+        update_data['duplicateOf'] = job['duplicate_of']
+    
+    written = _write_final_result(invoice_data, update_data)
+    
+    if written is None:
+        raise Exception('Error al actualizar factura en Firestore')
+    
+    lease_keeper.release(invoice_data)
+    if not written:
+        logger.warning(f'Factura {invoice_data.get("id")} procesada por otra réplica, resultado descartado\n')
+        return
+    
+    # Sólo las originales entran al índice: un duplicado siempre apunta a la primera foto
+    if phash is not None and not job.get('duplicate_of'):
+        duplicate_index.add(invoice_data.get('companyId'), invoice_data.get('id'), phash)
+    
+    logger.info(f'✓✓✓ Factura {invoice_data.get("id")} procesada exitosamente ✓✓✓\n')
+
+def mark_invoice_failed(job: Dict[str, Any], error: Exception) -> None:
+    """Registrar el error y marcar la factura con status error"""
+    invoice_data = job['invoice']
+    logger.error(f'✗✗✗ Error al procesar factura {invoice_data.get("id")}: {error} ✗✗✗\n')
+    try:
+        _write_final_result(invoice_data, invoice_status_data('error', str(error)))
+    finally:
+        lease_keeper.release(invoice_data)
+
+# Pasos en orden; process_invoice los ejecuta en secuencia y el pipeline
+# asyncio los usa como cuerpo de cada etapa
+PROCESSING_STEPS = [
+    ('download', download_step),
+    ('ocr', ocr_step),
+    ('parse', parse_step),
+    ('sii', sii_step),
+    ('update', update_step),
+]
+
 def process_invoice(invoice_data: Dict[str, Any]) -> bool:
     """
     Procesar una factura completa: OCR -> Parser -> SII -> Actualizar Firestore
@@ -40,100 +495,213 @@ def process_invoice(invoice_data: Dict[str, Any]) -> bool:
         True si se procesó exitosamente, False si hubo error
     """
     invoice_id = invoice_data.get('id')
-    company_id = invoice_data.get('companyId')
-    image_url = invoice_data.get('imageUrl')
     
     logger.info(f'========================================')
     logger.info(f'Procesando factura: {invoice_id}')
     logger.info(f'========================================')
     
+    job = {'invoice': invoice_data}
+    
     try:
-        # Actualizar estado a "processing"
-        update_invoice_status(company_id, invoice_id, 'processing')
-        
-        # Paso 1: Descargar imagen
-        logger.info('PASO 1: Descargando imagen desde Storage...')
-        image_bytes = download_image_from_storage(image_url)
-        
-        if not image_bytes:
-            raise Exception('No se pudo descargar la imagen desde Storage')
-        
-        # Paso 2: Extraer texto con OCR
-        logger.info('PASO 2: Extrayendo texto con Google Cloud Vision OCR...')
-        ocr_result = extract_text_from_image(image_bytes)
-        
-        if ocr_result.get('error'):
-            raise Exception(f'Error en OCR: {ocr_result["error"]}')
-        
-        text = ocr_result.get('text', '')
-        confidence = ocr_result.get('confidence', 0.0)
-        
-        if not text:
-            raise Exception('No se extrajo texto de la imagen')
-        
-        logger.info(f'✓ Texto extraído: {len(text)} caracteres (confianza: {confidence:.1%})')
-        
-        # Paso 3: Parsear texto y extraer datos estructurados
-        logger.info('PASO 3: Parseando texto y extrayendo datos...')
-        parsed_data = parse_invoice_text(text)
-        
-        # Paso 4: Consultar SII por RUT del emisor (si existe)
-        emisor_rut = parsed_data.get('emisorRut')
-        
-        if emisor_rut and validate_rut(emisor_rut):
-            logger.info(f'PASO 4: Consultando SII para emisor: {emisor_rut}')
-            
-            # Intentar obtener desde cache primero
-            cached_data = get_supplier_from_cache(emisor_rut)
-            
-            if cached_data:
-                logger.info('✓ Datos obtenidos desde cache')
-                parsed_data['emisorRazonSocial'] = cached_data.get('razonSocial', parsed_data.get('emisorRazonSocial'))
-                parsed_data['emisorGiro'] = cached_data.get('giro', '')
-            else:
-                # Consultar al SII
-                sii_data = query_sii_by_rut(emisor_rut)
-                
-                if sii_data:
-                    parsed_data['emisorRazonSocial'] = sii_data.get('razonSocial', parsed_data.get('emisorRazonSocial'))
-                    parsed_data['emisorGiro'] = sii_data.get('giro', '')
-                    parsed_data['emisorDireccion'] = sii_data.get('direccion', '')
-                    parsed_data['emisorComuna'] = sii_data.get('comuna', '')
-                    
-                    # Guardar en cache
-                    save_supplier_cache(emisor_rut, sii_data)
-                else:
-                    logger.warning('No se pudieron obtener datos del SII para el emisor')
-        else:
-            logger.warning('RUT del emisor no encontrado o inválido, saltando consulta al SII')
-        
-        # Paso 5: Actualizar documento en Firestore
-        logger.info('PASO 5: Actualizando factura en Firestore...')
-        
-        update_data = {
-            'status': 'ocr_done',
-            'ocrRawText': text,
-            'ocrConfidence': confidence,
-            **{k: v for k, v in parsed_data.items() if v is not None and k != 'raw_matches'}
-        }
-        
-        success = update_invoice(company_id, invoice_id, update_data)
-        
-        if success:
-            logger.info('✓✓✓ Factura procesada exitosamente ✓✓✓\n')
-            return True
-        else:
-            raise Exception('Error al actualizar factura en Firestore')
+        for _, step in PROCESSING_STEPS:
+            step(job)
+        return True
     
     except Exception as e:
-        logger.error(f'✗✗✗ Error al procesar factura: {e} ✗✗✗\n')
-        update_invoice_status(company_id, invoice_id, 'error', str(e))
+        mark_invoice_failed(job, e)
         return False
 
 # ============================================
 # MAIN LOOP
 # ============================================
 
+_next_reap_at = 0.0
+
+def _maybe_reap_expired_leases():
+    """Devolver periódicamente a "pending_ocr" las facturas de réplicas caídas"""
+    global _next_reap_at
+    
+    if time.monotonic() >= _next_reap_at:
+        reap_expired_leases()
+        _next_reap_at = time.monotonic() + OCR_LEASE_REAP_INTERVAL
+
+def fetch_pending_candidates(limit: int):
+    """Buscar facturas pendientes candidatas a reclamar (sin reclamarlas aún)"""
+    _maybe_reap_expired_leases()
+    return get_pending_invoices(limit=limit)
+
+def claim_scheduled_invoices(invoices):
+    """Reclamar para esta réplica las facturas elegidas por el scheduler"""
+    claimed = claim_invoices(OCR_WORKER_ID, invoices, lease_seconds=OCR_LEASE_SECONDS)
+    # Desde aquí hasta la escritura final (incluida la espera en cola) el heartbeat mantiene el lease
+    lease_keeper.track(claimed)
+    return claimed
+
+def create_invoice_feed() -> PendingInvoiceFeed:
+    """Crear la fuente de facturas según OCR_INGESTION ("listen" o "poll")"""
+    feed = PendingInvoiceFeed(
+        fetch_fn=fetch_pending_candidates,
+        claim_fn=claim_scheduled_invoices,
+        subscribe_fn=watch_pending_invoices if OCR_INGESTION == 'listen' else None,
+        scheduler=FairScheduler(weights=parse_company_weights(OCR_COMPANY_WEIGHTS)),
+        window=OCR_SCHEDULER_WINDOW,
+        fetch_window=OCR_FETCH_WINDOW,
+        min_interval=OCR_POLL_MIN_INTERVAL,
+        max_interval=OCR_POLL_MAX_INTERVAL,
+        safety_interval=OCR_SAFETY_POLL_INTERVAL
+    )
+    feed.start()
+    return feed
+
+def _log_queue_depths(feed: PendingInvoiceFeed) -> None:
+    """Reportar facturas en cola por empresa"""
+    depths = feed.queue_depths()
+    if depths:
+        logger.debug('Facturas en cola por empresa: ' + ', '.join(
+            f'{company_id}={depth}'
+            for company_id, depth in sorted(depths.items(), key=lambda item: -item[1])
+        ))
+
+def _log_throughput(stats: Dict[str, Any]) -> None:
+    """Reportar throughput al cerrar"""
+    logger.info(
+        f'Procesadas: {stats["processed"]}, con error: {stats["failed"]} '
+        f'en {stats["elapsedSeconds"]:.1f}s ({stats["invoicesPerSecond"]:.2f} facturas/s)'
+    )
+    
+    cache = get_ocr_cache()
+    if cache:
+        cache_stats = cache.stats()
+        logger.info(
+            f'Cache OCR: aciertos {cache_stats["hits"]}, fallos {cache_stats["misses"]} '
+            f'({cache_stats["hitRate"]:.0%} de aciertos)'
+        )
+    
+    suppliers = get_supplier_cache()
+    if suppliers:
+        supplier_stats = suppliers.stats()
+        logger.info(
+            f'Cache de proveedores: aciertos {supplier_stats["hits"]} (+{supplier_stats["negativeHits"]} sin datos en el SII), '
+            f'fallos {supplier_stats["misses"]} ({supplier_stats["hitRate"]:.0%} de aciertos, {supplier_stats["entries"]} RUTs)'
+        )
+    
+    flight_stats = _supplier_flights.stats()
+    if flight_stats['coalesced']:
+        logger.info(f'Búsquedas de proveedor compartidas con otra en vuelo: {flight_stats["coalesced"]} de {flight_stats["calls"]}')
+
+def run_worker_pool():
+    """Modo "pool": cada worker ejecuta process_invoice completo"""
+    pool = InvoiceWorkerPool(process_invoice, workers=OCR_WORKERS, queue_size=OCR_QUEUE_SIZE)
+    pool.start()
+    lease_keeper.start()
+    feed = create_invoice_feed()
+    error_backoff = 1
+    
+    try:
+        # Loop infinito para procesar facturas
+        while True:
+            try:
+                slots = pool.available_slots()
+                
+                if slots == 0:
+                    # Pool lleno, esperar a que se libere algún worker
+                    time.sleep(1)
+                    continue
+                
+                # Facturas reclamadas (quedan en "processing" con lease de esta réplica);
+                # next_batch espera hasta que haya facturas o venza el intervalo de polling
+                pending_invoices = feed.next_batch(slots)
+                submitted = 0
+                
+                for invoice in pending_invoices:
+                    if pool.submit(invoice):
+                        submitted += 1
+                
+                if submitted:
+                    logger.info(f'Se encolaron {submitted} facturas pendientes')
+                    _log_queue_depths(feed)
+                error_backoff = 1
+            
+            except KeyboardInterrupt:
+                logger.info('\n\nInterrupción recibida, cerrando...')
+                break
+            
+            except Exception as e:
+                logger.error(f'Error en el loop principal (reintentando en {error_backoff}s): {e}')
+                time.sleep(error_backoff)
+                error_backoff = min(error_backoff * 2, 30)
+    finally:
+        feed.stop()
+        logger.info('Esperando que terminen las facturas en vuelo...')
+        pool.shutdown(wait=True)
+        lease_keeper.stop()
+        _log_throughput(pool.stats())
+
+async def run_pipeline():
+    """Modo "pipeline": cada paso es una etapa asyncio con su propia cola y concurrencia"""
+    stages = [
+        Stage(
+            name=name,
+            fn=step,
+            concurrency=PIPELINE_STAGE_CONCURRENCY.get(name, 1),
+            queue_size=PIPELINE_QUEUE_SIZE,
+            # El parseo es CPU puro y rápido; el resto espera red
+            blocking=name != 'parse'
+        )
+        for name, step in PROCESSING_STEPS
+    ]
+    
+    if PIPELINE_OCR_BATCH_SIZE > 1:
+        # Agrupar en una sola solicitud a Vision las imágenes que esperan en la etapa OCR
+        ocr_stage = next(stage for stage in stages if stage.name == 'ocr')
+        ocr_stage.batch_fn = ocr_batch_step
+        ocr_stage.batch_size = PIPELINE_OCR_BATCH_SIZE
+    pipeline = AsyncPipeline(
+        stages,
+        on_error=mark_invoice_failed,
+        key_fn=lambda job: (job['invoice'].get('companyId'), job['invoice'].get('id'))
+    )
+    await pipeline.start()
+    lease_keeper.start()
+    feed = await asyncio.to_thread(create_invoice_feed)
+    error_backoff = 1
+    
+    try:
+        while True:
+            try:
+                slots = pipeline.available_slots()
+                
+                if slots == 0:
+                    await asyncio.sleep(1)
+                    continue
+                
+                pending_invoices = await asyncio.to_thread(feed.next_batch, slots)
+                submitted = 0
+                
+                for invoice in pending_invoices:
+                    if await pipeline.submit({'invoice': invoice}):
+                        submitted += 1
+                
+                if submitted:
+                    logger.info(f'Se encolaron {submitted} facturas pendientes')
+                    _log_queue_depths(feed)
+                error_backoff = 1
+            
+            except asyncio.CancelledError:
+                logger.info('\n\nInterrupción recibida, cerrando...')
+                break
+            
+            except Exception as e:
+                logger.error(f'Error en el loop principal (reintentando en {error_backoff}s): {e}')
+                await asyncio.sleep(error_backoff)
+                error_backoff = min(error_backoff * 2, 30)
+    finally:
+        feed.stop()
+        logger.info('Esperando que terminen las facturas en vuelo...')
+        await pipeline.stop()
+        lease_keeper.stop()
+        _log_throughput(pipeline.stats())
+
 def main():
     """
     Loop principal que busca y procesa facturas pendientes
@@ -152,34 +720,15 @@ def main():
         initialize_firebase()
         
         logger.info('\n✓ Sistema inicializado correctamente')
-        logger.info('Escuchando facturas pendientes...\n')
+        logger.info(f'Escuchando facturas pendientes (modo: {OCR_MODE}, ingesta: {OCR_INGESTION})...\n')
         
-        # Loop infinito para procesar facturas
-        while True:
+        if OCR_MODE == 'pipeline':
             try:
-                # Obtener facturas pendientes
-                pending_invoices = get_pending_invoices(limit=5)
-                
-                if pending_invoices:
-                    logger.info(f'Se encontraron {len(pending_invoices)} facturas pendientes')
-                    
-                    for invoice in pending_invoices:
-                        process_invoice(invoice)
-                        
-                        # Pequeño delay entre facturas para no saturar APIs
-                        time.sleep(2)
-                else:
-                    # No hay facturas pendientes, esperar antes de volver a consultar
-                    logger.debug('No hay facturas pendientes, esperando...')
-                    time.sleep(10)  # Esperar 10 segundos
-            
+                asyncio.run(run_pipeline())
             except KeyboardInterrupt:
-                logger.info('\n\nInterrupción recibida, cerrando...')
-                break
-            
-            except Exception as e:
-                logger.error(f'Error en el loop principal: {e}')
-                time.sleep(30)  # Esperar 30 segundos antes de reintentar
+                pass
+        else:
+            run_worker_pool()
     
     except Exception as e:
         logger.error(f'Error fatal: {e}')
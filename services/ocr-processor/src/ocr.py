@@ -1,133 +1,376 @@
 """
 Servicio de OCR usando Google Cloud Vision API
 Optimizado para documentos tributarios chilenos
+Las llamadas a Vision pasan por el backend configurado (ver ocr_backends.py)
 """
 
 import logging
-from typing import Optional, Dict, Any
-from google.cloud import vision
-from google.cloud.vision_v1 import types
-import os
+from typing import Optional, Dict, Any, List
+from google.api_core import exceptions as gcp_exceptions
 
-from config import GOOGLE_VISION_SERVICE_ACCOUNT_PATH
+from config import (
+    OCR_PREPROCESS,
+    OCR_MAX_LONG_EDGE,
+    OCR_TARGET_DPI,
+    OCR_MAX_IMAGE_BYTES,
+    OCR_GRAYSCALE
+)
+from layout import word_boxes_from_annotations
+from ocr_backends import get_ocr_backend
+from ocr_cache import get_ocr_cache, image_hash
+from preprocess import preprocess_image
+from rate_limit import get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
 # ============================================
-# GOOGLE CLOUD VISION CLIENT
+# OCR FUNCTIONS
 # ============================================
-_vision_client: Optional[vision.ImageAnnotatorClient] = None
 
-def get_vision_client() -> vision.ImageAnnotatorClient:
-    """Obtener cliente de Google Cloud Vision"""
-    global _vision_client
+# Límites de Vision por solicitud
+MAX_IMAGES_PER_BATCH = 16
+MAX_PAGES_PER_FILE_REQUEST = 5
+
+# Tipos de archivo multi-página que van por la anotación de archivos (por magic bytes)
+_FILE_SIGNATURES = {
+    b'%PDF': 'application/pdf',
+    b'II*\x00': 'image/tiff',
+    b'MM\x00*': 'image/tiff',
+}
+
+_THROTTLE_EXCEPTIONS = (
+    gcp_exceptions.TooManyRequests,
+    gcp_exceptions.ResourceExhausted,
+    gcp_exceptions.ServiceUnavailable
+)
+
+def _document_mime_type(content: bytes) -> Optional[str]:
+    """Mime type si el contenido es PDF/TIFF (multi-página), None si es una imagen simple"""
+    return _FILE_SIGNATURES.get(content[:4])
+
+def _error_result(error_msg: str) -> Dict[str, Any]:
+    return {
+        'text': '',
+        'confidence': 0.0,
+        'blocks': [],
+        'layout': None,
+        'error': error_msg
+    }
+
+def _raw_message(message: Any) -> Any:
+    """Mensaje protobuf detrás de un wrapper proto-plus (o el mismo objeto si no lo es)"""
+    pb = getattr(type(message), 'pb', None)
+    return pb(message) if pb else message
+
+def _result_from_annotations(
+    annotations: List[Any],
+    include_blocks: bool = True,
+    include_layout: bool = False
+) -> Dict[str, Any]:
+    """
+    Construir el dict de resultado a partir de uno o más full_text_annotation
+    (uno por imagen, o uno por página en PDFs)
     
-    if _vision_client is None:
-        # Configurar ruta de credenciales
-        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = GOOGLE_VISION_SERVICE_ACCOUNT_PATH
-        _vision_client = vision.ImageAnnotatorClient()
-        logger.info('✓ Google Cloud Vision client inicializado')
+    Recorre páginas -> bloques una sola vez: la confianza se acumula en el mismo
+    recorrido que arma los bloques, y el texto de cada palabra, párrafo y bloque
+    se construye con join en vez de concatenaciones sucesivas.
     
-    return _vision_client
-
-# ============================================
-# OCR FUNCTIONS
-# ============================================
+    Args:
+        annotations: full_text_annotation de cada imagen o página
+        include_blocks: Si es False no se arma el texto por bloque (`blocks` es None);
+            útil cuando sólo se necesita el texto completo
+        include_layout: Agregar las cajas de las palabras (`layout`, un WordBoxes)
+    """
+    # Recorrer el protobuf subyacente: cada acceso a atributo de los wrappers
+    # proto-plus crea un objeto nuevo, y son miles de símbolos por factura
+    annotations = [_raw_message(a) for a in annotations if a]
+    
+    # Extraer texto completo (Vision ya lo entrega armado)
+    full_text = '\n'.join(annotation.text for annotation in annotations)
+    
+    total_confidence = 0.0
+    block_count = 0
+    blocks = [] if include_blocks else None
+    
+    for annotation in annotations:
+        for page in annotation.pages:
+            for block in page.blocks:
+                block_confidence = block.confidence
+                total_confidence += block_confidence
+                block_count += 1
+                
+                if include_blocks:
+                    block_text = '\n'.join(
+                        ' '.join([
+                            ''.join([symbol.text for symbol in word.symbols])
+                            for word in paragraph.words
+                        ]).strip()
+                        for paragraph in block.paragraphs
+                    )
+                    blocks.append({
+                        'text': block_text.strip(),
+                        'confidence': block_confidence
+                    })
+    
+    # Calcular confianza promedio
+    confidence = total_confidence / block_count if block_count else 0.0
+    
+    logger.info(f'✓ Texto extraído: {len(full_text)} caracteres, confianza: {confidence:.2%}')
+    
+    return {
+        'text': full_text,
+        'confidence': confidence,
+        'blocks': blocks,
+        'layout': word_boxes_from_annotations(annotations) if include_layout else None,
+        'error': None
+    }
 
-def extract_text_from_image(image_bytes: bytes) -> Dict[str, Any]:
+def extract_text_from_image(
+    image_bytes: bytes,
+    include_blocks: bool = True,
+    include_layout: bool = False
+) -> Dict[str, Any]:
     """
     Extraer texto de una imagen usando Google Cloud Vision OCR
     
+    Los PDF y TIFF se detectan por su contenido y se procesan con
+    `extract_text_from_document` (todas sus páginas).
+    
     Args:
         image_bytes: Bytes de la imagen a procesar
+        include_blocks: Armar el texto por bloque (False si sólo se necesita el texto)
+        include_layout: Agregar las cajas de las palabras (para extraer los items)
     
     Returns:
         Dict con:
         - text: Texto completo extraído
         - confidence: Nivel de confianza promedio
-        - blocks: Bloques de texto estructurados (opcional)
+        - blocks: Bloques de texto estructurados (None si include_blocks=False)
+        - layout: Cajas de las palabras, WordBoxes (None si include_layout=False)
         - error: Mensaje de error si falló
     """
+    mime_type = _document_mime_type(image_bytes)
+    if mime_type:
+        return extract_text_from_document(
+            image_bytes,
+            mime_type,
+            include_blocks=include_blocks,
+            include_layout=include_layout
+        )
+    
+    return _with_cache(
+        image_bytes,
+        include_blocks,
+        include_layout,
+        lambda: _detect_image_text(image_bytes, include_blocks, include_layout)
+    )
+
+def _with_cache(content: bytes, include_blocks: bool, include_layout: bool, detect) -> Dict[str, Any]:
+    """Consultar el cache OCR por hash del contenido; si no está, llamar a Vision y guardar"""
+    cache = get_ocr_cache()
+    if cache is None:
+        return detect()
+    
+    key = image_hash(content)
+    result = cache.get(key, include_blocks=include_blocks, include_layout=include_layout)
+    if result is None:
+        result = detect()
+        cache.put(key, result)
+    return result
+
+def _detect_image_text(image_bytes: bytes, include_blocks: bool, include_layout: bool) -> Dict[str, Any]:
+    limiter = get_rate_limiter('vision')
+    
     try:
-        client = get_vision_client()
-        
-        # Crear objeto Image
-        image = vision.Image(content=image_bytes)
-        
-        # Usar DOCUMENT_TEXT_DETECTION (optimizado para documentos densos)
-        response = client.document_text_detection(image=image)
+        # DOCUMENT_TEXT_DETECTION (optimizado para documentos densos)
+        limiter.acquire()
+        response = get_ocr_backend().annotate_image(image_bytes)
         
         if response.error.message:
             raise Exception(response.error.message)
         
-        # Extraer texto completo
-        full_text = response.full_text_annotation.text if response.full_text_annotation else ''
+        limiter.record_success()
         
-        # Calcular confianza promedio
-        confidence = 0.0
-        if response.full_text_annotation and response.full_text_annotation.pages:
-            total_confidence = 0.0
-            block_count = 0
-            
-            for page in response.full_text_annotation.pages:
-                for block in page.blocks:
-                    total_confidence += block.confidence
-                    block_count += 1
+        return _result_from_annotations([response.full_text_annotation], include_blocks, include_layout)
+    
+    except Exception as e:
+        if isinstance(e, _THROTTLE_EXCEPTIONS):
+            limiter.record_throttle()
+        
+        error_msg = f'Error en OCR: {str(e)}'
+        logger.error(error_msg)
+        return _error_result(error_msg)
+
+def extract_text_from_images(
+    images: List[bytes],
+    include_blocks: bool = True,
+    include_layout: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Extraer texto de varias imágenes con batch_annotate_images
+    
+    Envía hasta 16 imágenes por solicitud para amortizar la latencia de red.
+    Las imágenes ya presentes en el cache OCR no se envían.
+    Los PDF/TIFF de la lista se procesan aparte con `extract_text_from_document`.
+    
+    Args:
+        images: Bytes de cada imagen
+        include_blocks: Armar el texto por bloque (False si sólo se necesita el texto)
+        include_layout: Agregar las cajas de las palabras (para extraer los items)
+    
+    Returns:
+        Lista de resultados (mismo formato que extract_text_from_image), en el mismo orden
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(images)
+    image_indexes = []
+    cache = get_ocr_cache()
+    keys = [image_hash(content) for content in images] if cache else []
+    
+    for index, content in enumerate(images):
+        mime_type = _document_mime_type(content)
+        if mime_type:
+            results[index] = extract_text_from_document(
+                content,
+                mime_type,
+                include_blocks=include_blocks,
+                include_layout=include_layout
+            )
+            continue
+        
+        if cache:
+            results[index] = cache.get(keys[index], include_blocks=include_blocks, include_layout=include_layout)
+        if results[index] is None:
+            image_indexes.append(index)
+    
+    limiter = get_rate_limiter('vision')
+    
+    for start in range(0, len(image_indexes), MAX_IMAGES_PER_BATCH):
+        chunk = image_indexes[start:start + MAX_IMAGES_PER_BATCH]
+        
+        try:
+            # La cuota de Vision se cobra por imagen
+            limiter.acquire(tokens=len(chunk))
+            responses = get_ocr_backend().annotate_images([images[index] for index in chunk])
+            limiter.record_success()
             
-            if block_count > 0:
-                confidence = total_confidence / block_count
+            for index, response in zip(chunk, responses):
+                if response.error.message:
+                    error_msg = f'Error en OCR: {response.error.message}'
+                    logger.error(error_msg)
+                    results[index] = _error_result(error_msg)
+                else:
+                    results[index] = _result_from_annotations(
+                        [response.full_text_annotation],
+                        include_blocks,
+                        include_layout
+                    )
+                    if cache:
+                        cache.put(keys[index], results[index])
         
-        # Extraer bloques estructurados (opcional para análisis detallado)
-        blocks = []
-        if response.full_text_annotation:
-            for page in response.full_text_annotation.pages:
-                for block in page.blocks:
-                    block_text = ''
-                    for paragraph in block.paragraphs:
-                        para_text = ''
-                        for word in paragraph.words:
-                            word_text = ''.join([symbol.text for symbol in word.symbols])
-                            para_text += word_text + ' '
-                        block_text += para_text.strip() + '\n'
-                    
-                    blocks.append({
-                        'text': block_text.strip(),
-                        'confidence': block.confidence
-                    })
+        except Exception as e:
+            if isinstance(e, _THROTTLE_EXCEPTIONS):
+                limiter.record_throttle()
+            
+            error_msg = f'Error en OCR: {str(e)}'
+            logger.error(error_msg)
+            for index in chunk:
+                results[index] = _error_result(error_msg)
+    
+    logger.info(f'✓ OCR en lote: {len(images)} documentos')
+    return results
+
+def extract_text_from_document(
+    content: bytes,
+    mime_type: str = 'application/pdf',
+    include_blocks: bool = True,
+    include_layout: bool = False
+) -> Dict[str, Any]:
+    """
+    Extraer texto de un PDF o TIFF multi-página con batch_annotate_files
+    
+    Vision procesa hasta 5 páginas por solicitud; las páginas siguientes se
+    piden en solicitudes adicionales hasta cubrir el documento completo.
+    
+    Args:
+        content: Bytes del archivo
+        mime_type: 'application/pdf' o 'image/tiff'
+        include_blocks: Armar el texto por bloque (False si sólo se necesita el texto)
+        include_layout: Agregar las cajas de las palabras (para extraer los items)
+    
+    Returns:
+        Dict con el mismo formato que extract_text_from_image (texto de todas las páginas)
+    """
+    return _with_cache(
+        content,
+        include_blocks,
+        include_layout,
+        lambda: _detect_document_text(content, mime_type, include_blocks, include_layout)
+    )
+
+def _detect_document_text(
+    content: bytes,
+    mime_type: str,
+    include_blocks: bool,
+    include_layout: bool
+) -> Dict[str, Any]:
+    limiter = get_rate_limiter('vision')
+    
+    try:
+        backend = get_ocr_backend()
+        annotations = []
+        total_pages = None
+        first_page = 1
         
-        logger.info(f'✓ Texto extraído: {len(full_text)} caracteres, confianza: {confidence:.2%}')
+        while total_pages is None or first_page <= total_pages:
+            last_page = first_page + MAX_PAGES_PER_FILE_REQUEST - 1
+            if total_pages is not None:
+                last_page = min(last_page, total_pages)
+            pages = list(range(first_page, last_page + 1))
+            
+            limiter.acquire(tokens=len(pages))
+            file_response = backend.annotate_file(content, mime_type, pages)
+            limiter.record_success()
+            
+            if file_response.error.message:
+                raise Exception(file_response.error.message)
+            
+            total_pages = file_response.total_pages
+            
+            for page_response in file_response.responses:
+                if page_response.error.message:
+                    raise Exception(page_response.error.message)
+                annotations.append(page_response.full_text_annotation)
+            
+            first_page = last_page + 1
         
-        return {
-            'text': full_text,
-            'confidence': confidence,
-            'blocks': blocks,
-            'error': None
-        }
+        logger.info(f'✓ Documento de {total_pages} páginas procesado')
+        return _result_from_annotations(annotations, include_blocks, include_layout)
     
     except Exception as e:
+        if isinstance(e, _THROTTLE_EXCEPTIONS):
+            limiter.record_throttle()
+        
         error_msg = f'Error en OCR: {str(e)}'
         logger.error(error_msg)
-        return {
-            'text': '',
-            'confidence': 0.0,
-            'blocks': [],
-            'error': error_msg
-        }
+        return _error_result(error_msg)
 
 def preprocess_image_if_needed(image_bytes: bytes) -> bytes:
     """
-    Pre-procesar imagen si es necesario (mejorar contraste, deskew, etc.)
+    Pre-procesar imagen antes del OCR: orientación EXIF, escala de grises,
+    reducción a OCR_MAX_LONG_EDGE / OCR_TARGET_DPI y recompresión a OCR_MAX_IMAGE_BYTES
     
-    TODO: Implementar con Pillow si se requiere mejoras en la calidad del OCR
-    Por ahora, retorna la imagen sin cambios
+    Retorna la imagen sin cambios si OCR_PREPROCESS está desactivado
     """
-    # Implementación futura con Pillow:
-    # - Convertir a escala de grises
-    # - Aumentar contraste
-    # - Corregir inclinación (deskew)
-    # - Aplicar threshold adaptativo
+    if not OCR_PREPROCESS:
+        return image_bytes
     
-    return image_bytes
+    return preprocess_image(
+        image_bytes,
+        max_long_edge=OCR_MAX_LONG_EDGE,
+        target_dpi=OCR_TARGET_DPI,
+        max_bytes=OCR_MAX_IMAGE_BYTES,
+        grayscale=OCR_GRAYSCALE
+    )
 
 def extract_text_with_preprocessing(image_bytes: bytes) -> Dict[str, Any]:
     """
@@ -142,9 +385,4 @@ def extract_text_with_preprocessing(image_bytes: bytes) -> Dict[str, Any]:
     
     except Exception as e:
         logger.error(f'Error en extracción con preprocesamiento: {e}')
-        return {
-            'text': '',
-            'confidence': 0.0,
-            'blocks': [],
-            'error': str(e)
-        }
+        return _error_result(str(e))
@@ -0,0 +1,262 @@
+"""
+Backends de OCR
+`ocr.py` habla con un backend que entrega respuestas crudas de Vision
+(AnnotateImageResponse / AnnotateFileResponse); así el mismo código de OCR
+corre contra la API real, grabando sus respuestas a disco, o reproduciendo
+esas grabaciones con latencia simulada en una máquina sin credenciales
+
+Backends (OCR_BACKEND):
+    vision: Google Cloud Vision
+    record: Google Cloud Vision, guardando cada respuesta en OCR_RECORDINGS_DIR
+    replay: Respuestas grabadas en OCR_RECORDINGS_DIR, sin red
+"""
+
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Protocol
+
+from google.cloud import vision
+
+from config import (
+    GOOGLE_VISION_SERVICE_ACCOUNT_PATH,
+    OCR_BACKEND,
+    OCR_RECORDINGS_DIR,
+    OCR_REPLAY_LATENCY_MS,
+    OCR_REPLAY_JITTER_MS
+)
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# PROTOCOLO
+# ============================================
+
+class OcrBackend(Protocol):
+    """Operaciones de Vision que usa `ocr.py` (DOCUMENT_TEXT_DETECTION)"""
+
+    name: str
+
+    def annotate_image(self, content: bytes) -> vision.AnnotateImageResponse:
+        """OCR de una imagen"""
+
+    def annotate_images(self, contents: List[bytes]) -> List[vision.AnnotateImageResponse]:
+        """OCR de varias imágenes en una solicitud (respuestas en el mismo orden)"""
+
+    def annotate_file(self, content: bytes, mime_type: str, pages: List[int]) -> vision.AnnotateFileResponse:
+        """OCR de algunas páginas de un PDF/TIFF"""
+
+def _document_text_feature() -> vision.Feature:
+    # DOCUMENT_TEXT_DETECTION: optimizado para documentos densos
+    return vision.Feature(type_=vision.Feature.Type.DOCUMENT_TEXT_DETECTION)
+
+# ============================================
+# GOOGLE CLOUD VISION
+# ============================================
+
+_vision_client: Optional[vision.ImageAnnotatorClient] = None
+
+def get_vision_client() -> vision.ImageAnnotatorClient:
+    """Obtener cliente de Google Cloud Vision"""
+    global _vision_client
+
+    if _vision_client is None:
+        # Configurar ruta de credenciales
+        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = GOOGLE_VISION_SERVICE_ACCOUNT_PATH
+        _vision_client = vision.ImageAnnotatorClient()
+        logger.info('✓ Google Cloud Vision client inicializado')
+
+    return _vision_client
+
+class VisionBackend:
+    """Backend real: Google Cloud Vision API"""
+
+    name = 'vision'
+
+    def annotate_image(self, content: bytes) -> vision.AnnotateImageResponse:
+        return get_vision_client().document_text_detection(image=vision.Image(content=content))
+
+    def annotate_images(self, contents: List[bytes]) -> List[vision.AnnotateImageResponse]:
+        requests = [
+            vision.AnnotateImageRequest(
+                image=vision.Image(content=content),
+                features=[_document_text_feature()]
+            )
+            for content in contents
+        ]
+        return list(get_vision_client().batch_annotate_images(requests=requests).responses)
+
+    def annotate_file(self, content: bytes, mime_type: str, pages: List[int]) -> vision.AnnotateFileResponse:
+        request = vision.AnnotateFileRequest(
+            input_config=vision.InputConfig(content=content, mime_type=mime_type),
+            features=[_document_text_feature()],
+            pages=pages
+        )
+        return get_vision_client().batch_annotate_files(requests=[request]).responses[0]
+
+# ============================================
+# GRABACIÓN Y REPRODUCCIÓN
+# ============================================
+
+def _image_recording_name(content: bytes) -> str:
+    return f'{hashlib.sha256(content).hexdigest()}.image.json'
+
+def _file_recording_name(content: bytes, pages: List[int]) -> str:
+    return f'{hashlib.sha256(content).hexdigest()}.pages-{pages[0]}-{pages[-1]}.json'
+
+class RecordingBackend:
+    """
+    Delega en otro backend y guarda cada respuesta exitosa como JSON
+
+    Args:
+        inner: Backend que responde (normalmente VisionBackend)
+        directory: Directorio de grabaciones
+    """
+
+    name = 'record'
+
+    def __init__(self, inner: OcrBackend, directory: str):
+        self._inner = inner
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+    def annotate_image(self, content: bytes) -> vision.AnnotateImageResponse:
+        response = self._inner.annotate_image(content)
+        self._save(_image_recording_name(content), vision.AnnotateImageResponse, response)
+        return response
+
+    def annotate_images(self, contents: List[bytes]) -> List[vision.AnnotateImageResponse]:
+        responses = self._inner.annotate_images(contents)
+        for content, response in zip(contents, responses):
+            self._save(_image_recording_name(content), vision.AnnotateImageResponse, response)
+        return responses
+
+    def annotate_file(self, content: bytes, mime_type: str, pages: List[int]) -> vision.AnnotateFileResponse:
+        response = self._inner.annotate_file(content, mime_type, pages)
+        self._save(_file_recording_name(content, pages), vision.AnnotateFileResponse, response)
+        return response
+
+    def _save(self, name: str, message_type, response):
+        if response.error.message:
+            return
+
+        try:
+            (self._directory / name).write_text(message_type.to_json(response), encoding='utf-8')
+        except OSError as e:
+            logger.warning(f'No se pudo grabar la respuesta de Vision {name}: {e}')
+
+class ReplayBackend:
+    """
+    Reproduce respuestas grabadas con latencia simulada, sin red ni credenciales
+
+    Args:
+        directory: Directorio de grabaciones (de RecordingBackend)
+        latency_ms: Latencia simulada por solicitud
+        jitter_ms: Variación aleatoria agregada a la latencia (0..jitter_ms)
+        cycle: Si el contenido no tiene grabación, responder con las grabaciones
+            disponibles en rotación (para pruebas de carga con imágenes cualquiera);
+            si es False, responder con error
+    """
+
+    name = 'replay'
+
+    def __init__(self, directory: str, latency_ms: float = 0.0, jitter_ms: float = 0.0, cycle: bool = True):
+        self._directory = Path(directory)
+        self._latency = latency_ms / 1000
+        self._jitter = jitter_ms / 1000
+        self._cycle = cycle
+
+        self._responses: Dict[str, object] = {}
+        self._rotation: Dict[str, List[str]] = {}
+        self._next_index: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        for path in sorted(self._directory.glob('*.json')):
+            self._rotation.setdefault(self._kind(path.name), []).append(path.name)
+
+        total = sum(len(names) for names in self._rotation.values())
+        if not total:
+            logger.warning(f'No hay respuestas grabadas en {self._directory}')
+        logger.info(f'✓ Replay de OCR: {total} respuestas grabadas, latencia {latency_ms:.0f}±{jitter_ms:.0f} ms')
+
+    def annotate_image(self, content: bytes) -> vision.AnnotateImageResponse:
+        self._simulate_latency()
+        return self._response(_image_recording_name(content), vision.AnnotateImageResponse)
+
+    def annotate_images(self, contents: List[bytes]) -> List[vision.AnnotateImageResponse]:
+        # Una sola solicitud: una sola latencia para todo el lote
+        self._simulate_latency()
+        return [
+            self._response(_image_recording_name(content), vision.AnnotateImageResponse)
+            for content in contents
+        ]
+
+    def annotate_file(self, content: bytes, mime_type: str, pages: List[int]) -> vision.AnnotateFileResponse:
+        self._simulate_latency()
+        return self._response(_file_recording_name(content, pages), vision.AnnotateFileResponse)
+
+    @staticmethod
+    def _kind(name: str) -> str:
+        """Tipo de grabación: 'image' o el rango de páginas ('pages-1-5')"""
+        return name.split('.', 1)[1].rsplit('.', 1)[0]
+
+    def _simulate_latency(self):
+        delay = self._latency + random.uniform(0, self._jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _response(self, name: str, message_type):
+        with self._lock:
+            if not (self._directory / name).exists():
+                candidates = self._rotation.get(self._kind(name)) if self._cycle else None
+                if not candidates:
+                    return message_type(error={'message': f'Sin respuesta grabada para {name}'})
+
+                kind = self._kind(name)
+                index = self._next_index.get(kind, 0)
+                self._next_index[kind] = index + 1
+                name = candidates[index % len(candidates)]
+
+            if name not in self._responses:
+                text = (self._directory / name).read_text(encoding='utf-8')
+                self._responses[name] = message_type.from_json(text)
+
+            return self._responses[name]
+
+# ============================================
+# BACKEND CONFIGURADO
+# ============================================
+
+_backend: Optional[OcrBackend] = None
+_backend_lock = threading.Lock()
+
+def create_ocr_backend(name: str) -> OcrBackend:
+    """Crear un backend por nombre ('vision', 'record' o 'replay')"""
+    if name == 'vision':
+        return VisionBackend()
+    if name == 'record':
+        return RecordingBackend(VisionBackend(), OCR_RECORDINGS_DIR)
+    if name == 'replay':
+        return ReplayBackend(OCR_RECORDINGS_DIR, OCR_REPLAY_LATENCY_MS, OCR_REPLAY_JITTER_MS)
+    raise ValueError(f'Backend de OCR desconocido: {name}')
+
+def get_ocr_backend() -> OcrBackend:
+    """Obtener el backend configurado en OCR_BACKEND"""
+    global _backend
+
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_ocr_backend(OCR_BACKEND)
+            logger.info(f'✓ Backend de OCR: {_backend.name}')
+        return _backend
+
+def set_ocr_backend(backend: Optional[OcrBackend]):
+    """Reemplazar el backend (ej: benchmarks con latencias distintas); None vuelve al configurado"""
+    global _backend
+
+    with _backend_lock:
+        _backend = backend
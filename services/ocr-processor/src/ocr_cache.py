@@ -0,0 +1,280 @@
+"""
+Cache de resultados OCR direccionado por contenido
+La clave es el SHA-256 de los bytes de la imagen: una foto subida de nuevo, o
+una factura reintentada tras un error posterior al OCR (timeout del SII,
+escritura en Firestore), reutiliza el resultado sin volver a pagar Vision.
+Tiers: disco local (LRU por tamaño y antigüedad) y, opcionalmente, Firestore
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from config import (
+    OCR_CACHE_ENABLED,
+    OCR_CACHE_DIR,
+    OCR_CACHE_MAX_MB,
+    OCR_CACHE_MAX_AGE_DAYS,
+    OCR_CACHE_FIRESTORE
+)
+from layout import WordBoxes
+
+logger = logging.getLogger(__name__)
+
+# Campos del resultado OCR que se guardan (`layout` como WordBoxes.to_dict())
+_CACHED_FIELDS = ('text', 'confidence', 'blocks', 'layout')
+
+def image_hash(image_bytes: bytes) -> str:
+    """Clave de cache: SHA-256 hexadecimal de los bytes de la imagen"""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+# ============================================
+# TIERS
+# ============================================
+
+class DiskCacheTier:
+    """
+    Cache en disco: un archivo JSON por imagen, desalojo LRU por tamaño total y por antigüedad
+
+    Args:
+        directory: Directorio del cache
+        max_bytes: Tamaño máximo total de los archivos
+        max_age_seconds: Antigüedad máxima de una entrada (desde su último uso)
+    """
+
+    name = 'disk'
+
+    def __init__(self, directory: str, max_bytes: int, max_age_seconds: float):
+        self._directory = Path(directory)
+        self._max_bytes = max_bytes
+        self._max_age = max_age_seconds
+        self._lock = threading.Lock()
+
+        # hash -> tamaño en bytes, en orden de uso (el más antiguo primero)
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()
+        self._total_bytes = 0
+
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+
+        with self._lock:
+            if key not in self._entries:
+                return None
+
+            try:
+                if time.time() - path.stat().st_mtime > self._max_age:
+                    self._remove(key)
+                    return None
+                data = json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                self._remove(key)
+                return None
+
+            # La fecha de modificación es la del último uso: _load_index arma el orden LRU con ella
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+            self._entries.move_to_end(key)
+            return data
+
+    def put(self, key: str, data: Dict[str, Any]):
+        payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        path = self._path(key)
+
+        with self._lock:
+            path.parent.mkdir(exist_ok=True)
+
+            # Escritura atómica: otros procesos nunca ven un archivo a medias
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(payload)
+            os.replace(tmp_path, path)
+
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = len(payload)
+            self._total_bytes += len(payload)
+
+            while self._total_bytes > self._max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def _path(self, key: str) -> Path:
+        # Subdirectorio por prefijo para no acumular miles de archivos en un solo directorio
+        return self._directory / key[:2] / f'{key}.json'
+
+    def _remove(self, key: str):
+        self._total_bytes -= self._entries.pop(key, 0)
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+    def _load_index(self):
+        """Reconstruir el índice LRU desde disco (orden por fecha de modificación = último uso)"""
+        now = time.time()
+        found = []
+
+        for path in self._directory.glob('*/*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self._max_age:
+                path.unlink(missing_ok=True)
+                continue
+            found.append((stat.st_mtime, path.stem, stat.st_size))
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+
+class FirestoreCacheTier:
+    """
+    Cache compartido entre réplicas en la colección `ocrCache` de Firestore
+
+    Args:
+        max_age_seconds: Antigüedad máxima de una entrada
+    """
+
+    name = 'firestore'
+
+    def __init__(self, max_age_seconds: float, collection: str = 'ocrCache'):
+        self._max_age = max_age_seconds
+        self._collection = collection
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        from firebase_client import get_firestore
+
+        doc = get_firestore().collection(self._collection).document(key).get()
+        if not doc.exists:
+            return None
+
+        data = doc.to_dict()
+        cached_at = data.get('cachedAt')
+        if cached_at and datetime.now(timezone.utc) - cached_at > timedelta(seconds=self._max_age):
+            return None
+
+        return {field: data.get(field) for field in _CACHED_FIELDS}
+
+    def put(self, key: str, data: Dict[str, Any]):
+        from firebase_client import get_firestore
+        from firebase_admin import firestore
+
+        get_firestore().collection(self._collection).document(key).set({
+            **data,
+            'cachedAt': firestore.SERVER_TIMESTAMP
+        })
+
+# ============================================
+# CACHE
+# ============================================
+
+class OcrCache:
+    """
+    Cache OCR de varios tiers, consultados en orden
+
+    Un acierto en un tier inferior (ej: Firestore) se copia a los superiores
+    (ej: disco). Sólo se guardan resultados exitosos.
+    """
+
+    def __init__(self, tiers: List[Any]):
+        self._tiers = tiers
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {tier.name: 0 for tier in tiers}
+        self._misses = 0
+
+    def get(self, key: str, include_blocks: bool = True, include_layout: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Obtener un resultado OCR (con `error: None`) o None si no está en ningún tier
+
+        Con include_blocks=True, una entrada guardada sin bloques cuenta como fallo;
+        lo mismo con include_layout=True y una entrada sin cajas de palabras
+        """
+        for index, tier in enumerate(self._tiers):
+            try:
+                data = tier.get(key)
+            except Exception as e:
+                logger.warning(f'Error al leer cache OCR ({tier.name}): {e}')
+                continue
+
+            if data is not None and not (
+                (include_blocks and data.get('blocks') is None) or (include_layout and data.get('layout') is None)
+            ):
+                with self._lock:
+                    self._hits[tier.name] += 1
+
+                for upper in self._tiers[:index]:
+                    self._safe_put(upper, key, data)
+
+                logger.info(f'✓ Resultado OCR desde cache ({tier.name}): {key[:12]}')
+                layout = data.get('layout')
+                return {**data, 'layout': WordBoxes.from_dict(layout) if layout else None, 'error': None}
+
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def put(self, key: str, ocr_result: Dict[str, Any]):
+        """Guardar un resultado OCR exitoso en todos los tiers"""
+        if ocr_result.get('error') or not ocr_result.get('text'):
+            return
+
+        data = {field: ocr_result.get(field) for field in _CACHED_FIELDS}
+        if data['layout'] is not None:
+            data['layout'] = data['layout'].to_dict()
+        for tier in self._tiers:
+            self._safe_put(tier, key, data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de aciertos por tier y fallos"""
+        with self._lock:
+            hits = sum(self._hits.values())
+            total = hits + self._misses
+            return {
+                'hits': dict(self._hits),
+                'misses': self._misses,
+                'hitRate': hits / total if total else 0.0
+            }
+
+    @staticmethod
+    def _safe_put(tier, key: str, data: Dict[str, Any]):
+        try:
+            tier.put(key, data)
+        except Exception as e:
+            logger.warning(f'Error al guardar en cache OCR ({tier.name}): {e}')
+
+_ocr_cache: Optional[OcrCache] = None
+_ocr_cache_lock = threading.Lock()
+
+def get_ocr_cache() -> Optional[OcrCache]:
+    """Obtener el cache OCR configurado (None si OCR_CACHE_ENABLED=false)"""
+    global _ocr_cache
+
+    if not OCR_CACHE_ENABLED:
+        return None
+
+    with _ocr_cache_lock:
+        if _ocr_cache is None:
+            max_age = OCR_CACHE_MAX_AGE_DAYS * 86400
+            tiers = [DiskCacheTier(OCR_CACHE_DIR, OCR_CACHE_MAX_MB * 1024 * 1024, max_age)]
+            if OCR_CACHE_FIRESTORE:
+                tiers.append(FirestoreCacheTier(max_age))
+
+            _ocr_cache = OcrCache(tiers)
+            logger.info(f'✓ Cache OCR inicializado: {", ".join(t.name for t in tiers)}')
+
+        return _ocr_cache
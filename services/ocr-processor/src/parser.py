@@ -5,8 +5,12 @@ Extrae información estructurada usando expresiones regulares
 
 import re
 import logging
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, Callable, Iterable, Iterator, List, Match, Pattern, Tuple
 from datetime import datetime
+from functools import lru_cache
+
+from layout import WordBoxes, extract_layout_items
+from rut import parse_rut
 
 logger = logging.getLogger(__name__)
 
@@ -56,39 +60,196 @@ MESES = {
     'septiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12
 }
 
+# ============================================
+# PATRONES COMPILADOS
+# ============================================
+
+_RUT_RE = re.compile(RUT_PATTERN)
+_RUT_RUN_RE = re.compile(r'[\d\.\-kK]+')
+_NUMERO_FACTURA_RE = re.compile(NUMERO_FACTURA_PATTERN, re.IGNORECASE)
+_NUMERO_SIMPLE_RE = re.compile(NUMERO_SIMPLE_PATTERN)
+_MONTO_RE = re.compile(MONTO_PATTERN)
+_FECHA_1_RE = re.compile(FECHA_PATTERN_1)
+_FECHA_1_SEPARATOR_RE = re.compile(r'[/\-\.]\d{1,2}[/\-\.]\d{2}')
+_FECHA_2_RE = re.compile(FECHA_PATTERN_2, re.IGNORECASE)
+_TIPO_DOC_RES = [(doc_type, re.compile(pattern)) for doc_type, pattern in TIPO_DOC_PATTERNS.items()]
+
+# Etiqueta seguida de un monto
+_MONTO_ETIQUETA_PATTERN = r'{}\s*:?\s*\$?\s*([\d\.]+(?:,\d{{1,2}})?)'
+_MONTO_ETIQUETA_RES = {
+    amount_type: [
+        re.compile(_MONTO_ETIQUETA_PATTERN.format(etiqueta), re.IGNORECASE)
+        for etiqueta in ETIQUETAS[amount_type]
+    ]
+    for amount_type in ('total', 'neto', 'iva')
+}
+
+# ============================================
+# ESCÁNER DE UNA PASADA
+# ============================================
+#
+# Tipo de documento, número y etiquetas de montos se buscan en una sola pasada:
+# una alternancia con todas las ramas recorre el texto en minúsculas (sin
+# IGNORECASE el motor de re salta directo a las letras con que empieza alguna
+# rama, un orden de magnitud más rápido). En cada coincidencia se prueban todas
+# las ramas y se sigue desde la posición siguiente, así una etiqueta dentro de
+# otra ("total" en "subtotal") se encuentra igual que buscando etiqueta por
+# etiqueta. Con el número ya encontrado se sigue con la alternancia sin esa rama.
+#
+# RUTs y fechas DD/MM/YYYY empiezan con dígitos: mezclados en la alternancia
+# anulan ese salto, así que siguen con su propio patrón compilado.
+
+# Caracteres cuyo cambio de mayúsculas/minúsculas produce letras ASCII (ß, ſ, K
+# Kelvin, ligaduras ﬁ...): ahí lower() no equivale a IGNORECASE/upper() y se usa
+# la extracción campo por campo
+_UNFOLDABLE_CHARS = '\u00df\u0130\u0131\u0149\u017f\u01f0\u1e96\u1e97\u1e98\u1e99\u1e9a\u212a\ufb00\ufb01\ufb02\ufb03\ufb04\ufb05\ufb06'
+
+def _build_scanner_branches() -> List[Tuple[str, Any, str]]:
+    """Ramas (campo, dato, patrón en minúsculas) en orden de prioridad"""
+    branches = []
+    for priority, pattern in enumerate(TIPO_DOC_PATTERNS.values()):
+        branches.append(('type', priority, pattern.lower()))
+    branches.append(('number', None, NUMERO_FACTURA_PATTERN.lower()))
+    for amount_type in _MONTO_ETIQUETA_RES:
+        for label_index, etiqueta in enumerate(ETIQUETAS[amount_type]):
+            branches.append(('amount', (amount_type, label_index), _MONTO_ETIQUETA_PATTERN.format(etiqueta)))
+    return branches
+
+_SCANNER_PATTERNS = _build_scanner_branches()
+_SCANNER_BRANCHES = [(kind, info, re.compile(pattern)) for kind, info, pattern in _SCANNER_PATTERNS]
+_SCANNER_RE = re.compile('|'.join(pattern for _, _, pattern in _SCANNER_PATTERNS))
+_SCANNER_WITHOUT_NUMBER_RE = re.compile('|'.join(pattern for kind, _, pattern in _SCANNER_PATTERNS if kind != 'number'))
+
+# Condición necesaria de FECHA_PATTERN_2: un año precedido por espacio
+_FECHA_2_YEAR_RE = re.compile(r'\s\d{4}')
+_FECHA_2_LOWER_RE = re.compile(FECHA_PATTERN_2)
+
+def _scan(text: str) -> Dict[str, Any]:
+    """Campos de parse_invoice_text en una pasada (mismo resultado que extract_*)"""
+    lowered = text.lower()
+
+    doc_priority = None
+    number = None
+    # Primer monto de cada etiqueta: {tipo: {índice de etiqueta: texto}}
+    label_amounts = {amount_type: {} for amount_type in _MONTO_ETIQUETA_RES}
+
+    search = _SCANNER_RE.search
+    pos = 0
+    while True:
+        match = search(lowered, pos)
+        if match is None:
+            break
+
+        start = match.start()
+        for kind, info, regex in _SCANNER_BRANCHES:
+            branch_match = regex.match(lowered, start)
+            if branch_match is None:
+                continue
+
+            if kind == 'amount':
+                amount_type, label_index = info
+                label_amounts[amount_type].setdefault(label_index, branch_match.group(1))
+            elif kind == 'type':
+                if doc_priority is None or info < doc_priority:
+                    doc_priority = info
+            elif number is None:
+                number = int(branch_match.group(1))
+                search = _SCANNER_WITHOUT_NUMBER_RE.search
+
+        pos = start + 1
+
+    if doc_priority is None:
+        logger.warning('Tipo de documento no detectado, asumiendo "factura"')
+        doc_type = 'factura'
+    else:
+        doc_type = _TIPO_DOC_RES[doc_priority][0]
+
+    if number is None:
+        logger.warning('No se pudo extraer número de factura')
+
+    match = _search_fecha_1(text)
+    if match:
+        date = _date_from_numbers(*match.groups())
+    elif _FECHA_2_YEAR_RE.search(lowered):
+        date = _date_from_month_name(lowered, _FECHA_2_LOWER_RE)
+    else:
+        logger.warning('No se pudo extraer fecha')
+        date = None
+
+    amounts = {}
+    for amount_type, found in label_amounts.items():
+        amount = None
+        for label_index in sorted(found):
+            amount = _parse_amount(found[label_index])
+            if amount is not None:
+                break
+        if amount is None and amount_type == 'total':
+            amount = _max_dollar_amount(text)
+        if amount is None:
+            logger.warning(f'No se pudo extraer monto: {amount_type}')
+        amounts[amount_type] = amount
+
+    return {
+        'type': doc_type,
+        'number': number,
+        'date': date,
+        'neto': amounts['neto'],
+        'iva': amounts['iva'],
+        'total': amounts['total'],
+        'ruts': extract_all_ruts(text)
+    }
+
+def _scan_by_field(text: str) -> Dict[str, Any]:
+    """Campos de parse_invoice_text buscando campo por campo"""
+    return {
+        'type': extract_document_type(text),
+        'number': extract_invoice_number(text),
+        'date': extract_date(text),
+        'neto': extract_amount(text, 'neto'),
+        'iva': extract_amount(text, 'iva'),
+        'total': extract_amount(text, 'total'),
+        'ruts': extract_all_ruts(text)
+    }
+
 # ============================================
 # FUNCIONES DE EXTRACCIÓN
 # ============================================
 
-def parse_invoice_text(text: str) -> Dict[str, Any]:
+def parse_invoice_text(text: str, layout: Optional[WordBoxes] = None) -> Dict[str, Any]:
     """
     Parsear texto OCR y extraer información estructurada de la factura
     
     Args:
         text: Texto extraído por OCR
+        layout: Cajas de las palabras del OCR; sin ellas no se extraen items
     
     Returns:
         Dict con los datos extraídos
     """
     logger.info('Iniciando parseo de texto OCR')
+
+    if any(char in text for char in _UNFOLDABLE_CHARS):
+        fields = _scan_by_field(text)
+    else:
+        fields = _scan(text)
     
     data = {
-        'type': extract_document_type(text),
-        'number': extract_invoice_number(text),
-        'date': extract_date(text),
+        'type': fields['type'],
+        'number': fields['number'],
+        'date': fields['date'],
         'emisorRut': None,
         'emisorRazonSocial': None,
         'receptorRut': None,
         'receptorRazonSocial': None,
-        'netoAmount': extract_amount(text, 'neto'),
-        'ivaAmount': extract_amount(text, 'iva'),
-        'totalAmount': extract_amount(text, 'total'),
-        'items': extract_items(text),
+        'netoAmount': fields['neto'],
+        'ivaAmount': fields['iva'],
+        'totalAmount': fields['total'],
+        'items': extract_items(text, layout),
         'raw_matches': {}  # Para debugging
     }
     
-    # Extraer RUTs (emisor y receptor)
-    ruts = extract_all_ruts(text)
+    # RUTs (emisor y receptor)
+    ruts = fields['ruts']
     if len(ruts) >= 1:
         data['emisorRut'] = ruts[0]
     if len(ruts) >= 2:
@@ -102,8 +263,8 @@ def extract_document_type(text: str) -> str:
     """Detectar tipo de documento"""
     text_upper = text.upper()
     
-    for doc_type, pattern in TIPO_DOC_PATTERNS.items():
-        if re.search(pattern, text_upper):
+    for doc_type, regex in _TIPO_DOC_RES:
+        if regex.search(text_upper):
             logger.debug(f'Tipo de documento detectado: {doc_type}')
             return doc_type
     
@@ -114,24 +275,18 @@ def extract_document_type(text: str) -> str:
 def extract_invoice_number(text: str) -> Optional[int]:
     """Extraer número de factura"""
     # Intentar con patrón completo
-    match = re.search(NUMERO_FACTURA_PATTERN, text, re.IGNORECASE)
+    match = _NUMERO_FACTURA_RE.search(text)
     if match:
-        try:
-            numero = int(match.group(1))
-            logger.debug(f'Número de factura extraído: {numero}')
-            return numero
-        except ValueError:
-            pass
+        numero = int(match.group(1))
+        logger.debug(f'Número de factura extraído: {numero}')
+        return numero
     
     # Intentar con patrón simple
-    match = re.search(NUMERO_SIMPLE_PATTERN, text)
+    match = _NUMERO_SIMPLE_RE.search(text)
     if match:
-        try:
-            numero = int(match.group(1))
-            logger.debug(f'Número de factura extraído (patrón simple): {numero}')
-            return numero
-        except ValueError:
-            pass
+        numero = int(match.group(1))
+        logger.debug(f'Número de factura extraído (patrón simple): {numero}')
+        return numero
     
     logger.warning('No se pudo extraer número de factura')
     return None
@@ -139,53 +294,85 @@ def extract_invoice_number(text: str) -> Optional[int]:
 def extract_date(text: str) -> Optional[str]:
     """Extraer fecha de emisión"""
     # Intentar formato DD/MM/YYYY
-    match = re.search(FECHA_PATTERN_1, text)
+    match = _search_fecha_1(text)
     if match:
-        try:
-            day, month, year = match.groups()
-            if len(year) == 2:
-                year = '20' + year
-            fecha = f'{year}-{month.zfill(2)}-{day.zfill(2)}'
-            logger.debug(f'Fecha extraída: {fecha}')
-            return fecha
-        except:
-            pass
+        return _date_from_numbers(*match.groups())
     
     # Intentar formato DD de Mes de YYYY
-    match = re.search(FECHA_PATTERN_2, text, re.IGNORECASE)
-    if match:
-        try:
-            day, month_name, year = match.groups()
-            month_name_lower = month_name.lower()
-            
-            # Buscar mes
-            for mes_str, mes_num in MESES.items():
-                if mes_str.startswith(month_name_lower[:3]):
-                    fecha = f'{year}-{str(mes_num).zfill(2)}-{day.zfill(2)}'
-                    logger.debug(f'Fecha extraída: {fecha}')
-                    return fecha
-        except:
-            pass
+    return _date_from_month_name(text, _FECHA_2_RE)
+
+def _search_fecha_1(text: str) -> Optional[Match]:
+    """
+    Igual que _FECHA_1_RE.search(text), partiendo desde los separadores
+
+    Toda fecha DD/MM/YYYY tiene su primer separador 1 o 2 caracteres después
+    del inicio; buscar "/MM/YY" salta los dígitos sueltos (montos, cantidades)
+    que el patrón completo prueba uno por uno.
+    """
+    pos = 0
+    last_start = -1
+    while True:
+        separator = _FECHA_1_SEPARATOR_RE.search(text, pos)
+        if separator is None:
+            return None
+
+        position = separator.start()
+        for start in (position - 2, position - 1):
+            if start > last_start and start >= 0:
+                last_start = start
+                match = _FECHA_1_RE.match(text, start)
+                if match:
+                    return match
+        pos = position + 1
+
+def _date_from_numbers(day: str, month: str, year: str) -> str:
+    if len(year) == 2:
+        year = '20' + year
+    fecha = f'{year}-{month.zfill(2)}-{day.zfill(2)}'
+    logger.debug(f'Fecha extraída: {fecha}')
+    return fecha
+
+def _date_from_month_name(text: str, regex: Pattern) -> Optional[str]:
+    fecha = _date_from_month_match(regex.search(text))
+    if fecha:
+        return fecha
     
     logger.warning('No se pudo extraer fecha')
     return None
 
+def _date_from_month_match(match: Optional[Match]) -> Optional[str]:
+    """Fecha de una coincidencia de FECHA_PATTERN_2, si el nombre del mes es válido"""
+    if match:
+        day, month_name, year = match.groups()
+        mes_num = _month_from_prefix(month_name.lower()[:3])
+        if mes_num:
+            fecha = f'{year}-{str(mes_num).zfill(2)}-{day.zfill(2)}'
+            logger.debug(f'Fecha extraída: {fecha}')
+            return fecha
+    return None
+
+@lru_cache(maxsize=256)
+def _month_from_prefix(prefix: str) -> Optional[int]:
+    """Primer mes cuyo nombre empieza con `prefix`"""
+    for mes_str, mes_num in MESES.items():
+        if mes_str.startswith(prefix):
+            return mes_num
+    return None
+
 def extract_all_ruts(text: str) -> List[str]:
     """Extraer todos los RUTs encontrados en el texto"""
-    matches = re.findall(RUT_PATTERN, text)
-    
-    # Limpiar y formatear
-    ruts = []
-    for rut in matches:
-        # Agregar puntos y guión si no los tiene
-        cleaned = rut.replace('.', '').replace('-', '')
-        if len(cleaned) >= 2:
-            dv = cleaned[-1].upper()
-            number = cleaned[:-1]
-            
-            # Formatear con puntos
-            formatted = f'{int(number):,}'.replace(',', '.') + f'-{dv}'
-            ruts.append(formatted)
+    # Un RUT sólo tiene dígitos, puntos, guión y K, con 8 caracteres o más: buscarlo
+    # dentro de esas corridas da lo mismo que en todo el texto, sin probar el patrón
+    # en cada dígito de montos y cantidades
+    matches = []
+    for run in _RUT_RUN_RE.findall(text):
+        if len(run) >= 8:
+            matches.extend(_RUT_RE.findall(run))
+    return _format_ruts(matches)
+
+def _format_ruts(matches: List[str]) -> List[str]:
+    # Forma normalizada (con puntos y guión); el dígito verificador no se valida acá
+    ruts = [str(rut) for rut in map(parse_rut, matches) if rut is not None]
     
     logger.debug(f'{len(ruts)} RUTs extraídos: {ruts}')
     return ruts
@@ -199,81 +386,216 @@ def extract_amount(text: str, amount_type: str) -> Optional[float]:
         amount_type: Tipo de monto ('total', 'neto', 'iva')
     """
     # Buscar etiquetas relacionadas
-    etiquetas = ETIQUETAS.get(amount_type, [amount_type])
+    regexes = _MONTO_ETIQUETA_RES.get(amount_type)
+    if regexes is None:
+        etiquetas = ETIQUETAS.get(amount_type, [amount_type])
+        regexes = [re.compile(_MONTO_ETIQUETA_PATTERN.format(etiqueta), re.IGNORECASE) for etiqueta in etiquetas]
     
-    for etiqueta in etiquetas:
-        # Crear patrón que busque la etiqueta seguida de un monto
-        pattern = rf'{etiqueta}\s*:?\s*\$?\s*([\d\.]+(?:,\d{{1,2}})?)'
-        match = re.search(pattern, text, re.IGNORECASE)
-        
+    for regex in regexes:
+        match = regex.search(text)
         if match:
-            try:
-                # Convertir a float (remover puntos de miles, reemplazar coma por punto)
-                amount_str = match.group(1).replace('.', '').replace(',', '.')
-                amount = float(amount_str)
+            amount = _parse_amount(match.group(1))
+            if amount is not None:
                 logger.debug(f'Monto {amount_type} extraído: ${amount:,.0f}')
                 return amount
-            except ValueError:
-                continue
     
     # Si no se encuentra con etiqueta, buscar montos genéricos y tomar el mayor (para "total")
     if amount_type == 'total':
-        montos = re.findall(MONTO_PATTERN, text)
-        if montos:
-            try:
-                amounts = [float(m.replace('.', '').replace(',', '.')) for m in montos]
-                max_amount = max(amounts)
-                logger.debug(f'Monto total inferido (máximo): ${max_amount:,.0f}')
-                return max_amount
-            except ValueError:
-                pass
+        max_amount = _max_dollar_amount(text)
+        if max_amount is not None:
+            return max_amount
     
     logger.warning(f'No se pudo extraer monto: {amount_type}')
     return None
 
-def extract_items(text: str) -> List[Dict[str, Any]]:
+def _parse_amount(amount_str: str) -> Optional[float]:
+    """Monto chileno a float (puntos de miles, coma decimal); None si no es un número"""
+    try:
+        return float(amount_str.replace('.', '').replace(',', '.'))
+    except ValueError:
+        return None
+
+def _max_dollar_amount(text: str) -> Optional[float]:
+    """Mayor monto precedido por $"""
+    montos = _MONTO_RE.findall(text)
+    if not montos:
+        return None
+    
+    amounts = [_parse_amount(m) for m in montos]
+    if None in amounts:
+        return None
+    
+    max_amount = max(amounts)
+    logger.debug(f'Monto total inferido (máximo): ${max_amount:,.0f}')
+    return max_amount
+
+def extract_items(text: str, layout: Optional[WordBoxes] = None) -> List[Dict[str, Any]]:
     """
     Extraer items/líneas de la factura
     
-    TODO: Implementar extracción de tabla de items
-    Requiere análisis más detallado de la estructura del documento
+    La tabla de items se reconoce por la posición de las palabras (ver layout.py);
+    el texto plano no basta para separar columnas, así que sin `layout` no hay items
     """
-    # Implementación futura
-    return []
-
-def format_rut(rut: str) -> str:
-    """Formatear RUT con puntos y guión"""
-    cleaned = rut.replace('.', '').replace('-', '')
-    if len(cleaned) < 2:
-        return rut
-    
-    dv = cleaned[-1].upper()
-    number = cleaned[:-1]
+    if layout is None or not len(layout):
+        return []
     
-    try:
-        formatted = f'{int(number):,}'.replace(',', '.') + f'-{dv}'
-        return formatted
-    except:
-        return rut
+    items = extract_layout_items(layout)
+    logger.debug(f'{len(items)} items extraídos')
+    return items
 
-def validate_rut(rut: str) -> bool:
-    """Validar dígito verificador de RUT chileno"""
-    try:
-        cleaned = rut.replace('.', '').replace('-', '')
-        dv = cleaned[-1].upper()
-        number = cleaned[:-1]
-        
-        # Calcular dígito verificador
-        sum_val = 0
-        multiplier = 2
-        
-        for digit in reversed(number):
-            sum_val += int(digit) * multiplier
-            multiplier = 7 if multiplier == 2 else multiplier + 1
-        
-        expected_dv = 11 - (sum_val % 11)
-        expected_dv_str = '0' if expected_dv == 11 else ('K' if expected_dv == 10 else str(expected_dv))
-        
-        return dv == expected_dv_str
-    except:
-        return False
+# ============================================
+# PARSEO POR BLOQUES (STREAMING)
+# ============================================
+#
+# Tipo, número, fecha y RUTs están casi siempre en los primeros bloques del OCR
+# y los montos en los últimos. En vez de pasar cada extractor por todo el texto,
+# el encabezado se busca bloque a bloque desde el inicio y los montos desde el
+# final, y cada recorrido se detiene apenas tiene todos sus campos: la tabla de
+# items del medio de un documento largo no se revisa.
+
+_HEADER_FIELDS = ('type', 'number', 'date', 'emisorRut', 'receptorRut')
+_AMOUNT_FIELDS = (('netoAmount', 'neto'), ('ivaAmount', 'iva'), ('totalAmount', 'total'))
+
+def _block_header_fields(text: str, found: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """Campos del encabezado que todavía faltan y aparecen en el texto de un bloque"""
+    fields = []
+
+    if 'type' not in found:
+        text_upper = text.upper()
+        for doc_type, regex in _TIPO_DOC_RES:
+            if regex.search(text_upper):
+                fields.append(('type', doc_type))
+                break
+
+    if 'number' not in found:
+        match = _NUMERO_FACTURA_RE.search(text) or _NUMERO_SIMPLE_RE.search(text)
+        if match:
+            fields.append(('number', int(match.group(1))))
+
+    if 'date' not in found:
+        match = _search_fecha_1(text)
+        date = _date_from_numbers(*match.groups()) if match else _date_from_month_match(_FECHA_2_RE.search(text))
+        if date:
+            fields.append(('date', date))
+
+    if 'receptorRut' not in found:
+        # El primer RUT del documento es el del emisor y el segundo el del receptor
+        missing = [field for field in ('emisorRut', 'receptorRut') if field not in found]
+        fields.extend(zip(missing, extract_all_ruts(text)))
+
+    return fields
+
+def _block_amounts(text: str, found: Dict[str, Any]) -> List[Tuple[str, float]]:
+    """Montos con etiqueta que todavía faltan y aparecen en el texto de un bloque"""
+    fields = []
+    for field, amount_type in _AMOUNT_FIELDS:
+        if field in found:
+            continue
+        for regex in _MONTO_ETIQUETA_RES[amount_type]:
+            match = regex.search(text)
+            amount = _parse_amount(match.group(1)) if match else None
+            if amount is not None:
+                fields.append((field, amount))
+                break
+    return fields
+
+def iter_invoice_fields(blocks: Iterable[Dict[str, Any]]) -> Iterator[Tuple[str, Any]]:
+    """
+    Extraer los campos de la factura bloque a bloque, a medida que aparecen
+
+    Los campos del encabezado salen en cuanto se leen los bloques que los
+    contienen (el RUT del emisor, típicamente en el primero o segundo), antes
+    de consumir el resto de `blocks`. Cada campo se entrega una sola vez.
+
+    Difiere de parse_invoice_text en que toma la primera coincidencia en el
+    orden de lectura (tipo de documento, fecha) y, para los montos, el bloque
+    más cercano al final del documento.
+
+    Args:
+        blocks: Bloques del OCR (`blocks` de extract_text_from_image), o cualquier
+            iterable de dicts con `text`
+
+    Yields:
+        (campo, valor) con las claves de parse_invoice_text
+    """
+    found: Dict[str, Any] = {}
+    iterator = iter(blocks)
+    consumed = []
+
+    # Encabezado: desde el inicio hasta tener todos sus campos
+    for block in iterator:
+        consumed.append(block)
+        for field, value in _block_header_fields(block.get('text') or '', found):
+            found[field] = value
+            yield field, value
+        if len(found) == len(_HEADER_FIELDS):
+            break
+
+    # Montos: desde el final hacia atrás hasta tener los tres
+    consumed.extend(iterator)
+    max_dollar_amount = None
+    for block in reversed(consumed):
+        text = block.get('text') or ''
+        for field, value in _block_amounts(text, found):
+            found[field] = value
+            yield field, value
+        if all(field in found for field, _ in _AMOUNT_FIELDS):
+            break
+
+        if 'totalAmount' not in found:
+            block_max = _max_dollar_amount(text)
+            if block_max is not None and (max_dollar_amount is None or block_max > max_dollar_amount):
+                max_dollar_amount = block_max
+
+    if 'totalAmount' not in found and max_dollar_amount is not None:
+        # Sin etiqueta de total se recorrieron todos los bloques: el mayor monto con $
+        yield 'totalAmount', max_dollar_amount
+    if 'type' not in found:
+        yield 'type', 'factura'
+
+def parse_invoice_blocks(
+    blocks: Iterable[Dict[str, Any]],
+    layout: Optional[WordBoxes] = None,
+    on_field: Optional[Callable[[str, Any], None]] = None
+) -> Dict[str, Any]:
+    """
+    Parsear la factura a partir de los bloques del OCR (ver iter_invoice_fields)
+
+    Args:
+        blocks: Bloques del OCR
+        layout: Cajas de las palabras del OCR; sin ellas no se extraen items
+        on_field: Se llama con (campo, valor) apenas se encuentra cada campo, p. ej.
+            para empezar la consulta al SII con el RUT del emisor
+
+    Returns:
+        Dict con las mismas claves que parse_invoice_text
+    """
+    logger.info('Iniciando parseo por bloques')
+
+    data = {
+        'type': 'factura',
+        'number': None,
+        'date': None,
+        'emisorRut': None,
+        'emisorRazonSocial': None,
+        'receptorRut': None,
+        'receptorRazonSocial': None,
+        'netoAmount': None,
+        'ivaAmount': None,
+        'totalAmount': None,
+        'items': extract_items('', layout),
+        'raw_matches': {}
+    }
+
+    for field, value in iter_invoice_fields(blocks):
+        data[field] = value
+        if on_field:
+            on_field(field, value)
+
+    for field, name in (('number', 'número de factura'), ('date', 'fecha'), ('totalAmount', 'monto: total')):
+        if data[field] is None:
+            logger.warning(f'No se pudo extraer {name}')
+
+    logger.info(f'✓ Parseo completado: Tipo={data["type"]}, Número={data["number"]}, Total={data["totalAmount"]}')
+
+    return data
@@ -0,0 +1,242 @@
+"""
+Motor de pipeline asyncio por etapas
+Cada etapa (descarga, OCR, parseo, SII, Firestore) tiene su propia cola acotada
+y su propio límite de concurrencia, de modo que una etapa lenta (ej: scraping
+del SII) no detiene las llamadas a Vision de las siguientes facturas
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Any, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# DEFINICIÓN DE ETAPAS
+# ============================================
+
+@dataclass
+class Stage:
+    """
+    Etapa del pipeline
+
+    Attributes:
+        name: Nombre de la etapa (para logs y estadísticas)
+        fn: Función que recibe el job (dict) y lo modifica; lanza excepción si falla
+        concurrency: Cantidad de jobs procesados en paralelo en esta etapa
+        queue_size: Tamaño máximo de la cola de entrada de la etapa
+        blocking: Si es True, `fn` se ejecuta en un thread del executor
+        batch_fn: Alternativa a `fn` que procesa varios jobs juntos y retorna el
+            error de cada uno (o None); recibe hasta `batch_size` jobs ya encolados
+        batch_size: Máximo de jobs por lote cuando se usa `batch_fn`
+    """
+    name: str
+    fn: Optional[Callable[[Dict[str, Any]], None]] = None
+    concurrency: int = 1
+    queue_size: int = 10
+    blocking: bool = True
+    batch_fn: Optional[Callable[[List[Dict[str, Any]]], List[Optional[Exception]]]] = None
+    batch_size: int = 1
+
+# ============================================
+# PIPELINE
+# ============================================
+
+class AsyncPipeline:
+    """
+    Pipeline de etapas conectadas por colas acotadas
+
+    Un job que falla en cualquier etapa sale del pipeline y se entrega a
+    `on_error`; los que completan todas las etapas se entregan a `on_success`.
+    Ambos callbacks se ejecutan en el executor.
+    """
+
+    def __init__(
+        self,
+        stages: List[Stage],
+        on_success: Optional[Callable[[Dict[str, Any]], None]] = None,
+        on_error: Optional[Callable[[Dict[str, Any], Exception], None]] = None,
+        key_fn: Optional[Callable[[Dict[str, Any]], Tuple]] = None
+    ):
+        if not stages:
+            raise ValueError('El pipeline necesita al menos una etapa')
+
+        self._stages = stages
+        self._on_success = on_success
+        self._on_error = on_error
+        self._key_fn = key_fn or (lambda job: id(job))
+
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self._in_flight: Set[Any] = set()
+        self._completed = 0
+        self._failed = 0
+        self._stage_seconds: Dict[str, float] = {stage.name: 0.0 for stage in stages}
+        self._started_at: Optional[float] = None
+
+    async def start(self):
+        """Crear colas y lanzar los workers de cada etapa"""
+        max_threads = sum(stage.concurrency for stage in self._stages if stage.blocking) + 2
+        self._executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='pipeline')
+        self._queues = [asyncio.Queue(maxsize=max(1, stage.queue_size)) for stage in self._stages]
+        self._started_at = time.monotonic()
+
+        for index, stage in enumerate(self._stages):
+            for i in range(max(1, stage.concurrency)):
+                task = asyncio.create_task(self._stage_worker(index), name=f'{stage.name}-{i + 1}')
+                self._tasks.append(task)
+
+        logger.info(
+            '✓ Pipeline iniciado: ' +
+            ', '.join(f'{s.name}={s.concurrency}' for s in self._stages)
+        )
+
+    async def submit(self, job: Dict[str, Any]) -> bool:
+        """
+        Encolar un job en la primera etapa (espera si la cola está llena)
+
+        Returns:
+            True si se encoló, False si el job ya estaba en vuelo
+        """
+        key = self._key_fn(job)
+        if key in self._in_flight:
+            return False
+
+        self._in_flight.add(key)
+        await self._queues[0].put(job)
+        return True
+
+    def available_slots(self) -> int:
+        """Cantidad de jobs que caben en la cola de entrada sin esperar"""
+        first = self._queues[0]
+        return max(0, first.maxsize - first.qsize())
+
+    def in_flight(self) -> int:
+        """Cantidad de jobs dentro del pipeline"""
+        return len(self._in_flight)
+
+    async def join(self):
+        """Esperar a que todos los jobs encolados salgan del pipeline"""
+        for queue in self._queues:
+            await queue.join()
+
+    async def stop(self):
+        """Vaciar el pipeline y detener los workers"""
+        await self.join()
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de throughput y tiempo acumulado por etapa"""
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        total = self._completed + self._failed
+
+        return {
+            'processed': self._completed,
+            'failed': self._failed,
+            'elapsedSeconds': elapsed,
+            'invoicesPerSecond': total / elapsed if elapsed > 0 else 0.0,
+            'stageSeconds': dict(self._stage_seconds),
+            'queueDepths': {s.name: q.qsize() for s, q in zip(self._stages, self._queues)}
+        }
+
+    async def _run_blocking(self, fn: Callable, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def _run_stage(self, stage: Stage, jobs: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+        """Ejecutar la etapa sobre uno o más jobs; retorna el error de cada job (o None)"""
+        started = time.monotonic()
+
+        try:
+            if stage.batch_fn:
+                runner = self._run_blocking if stage.blocking else self._run_inline
+                errors = await runner(stage.batch_fn, jobs)
+                return list(errors) if errors else [None] * len(jobs)
+
+            if stage.blocking:
+                await self._run_blocking(stage.fn, jobs[0])
+            else:
+                stage.fn(jobs[0])
+            return [None]
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Falla del job (o del lote completo)
+            return [e] * len(jobs)
+
+        finally:
+            self._stage_seconds[stage.name] += time.monotonic() - started
+
+    async def _run_inline(self, fn: Callable, *args):
+        return fn(*args)
+
+    async def _stage_worker(self, index: int):
+        """Worker de una etapa: tomar jobs de su cola y pasarlos a la siguiente"""
+        stage = self._stages[index]
+        queue = self._queues[index]
+        is_last = index == len(self._stages) - 1
+
+        while True:
+            jobs = [await queue.get()]
+
+            if stage.batch_fn:
+                # Lote oportunista: sólo lo que ya está esperando, sin agregar latencia
+                while len(jobs) < stage.batch_size:
+                    try:
+                        jobs.append(queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+
+            try:
+                errors = await self._run_stage(stage, jobs)
+
+                for job, error in zip(jobs, errors):
+                    if error is not None:
+                        await self._fail(stage, job, error)
+                    elif is_last:
+                        await self._succeed(job)
+                    else:
+                        # Espera si la siguiente etapa está saturada (backpressure)
+                        await self._queues[index + 1].put(job)
+
+            finally:
+                for _ in jobs:
+                    queue.task_done()
+
+    async def _succeed(self, job: Dict[str, Any]):
+        try:
+            if self._on_success:
+                await self._run_blocking(self._on_success, job)
+        except Exception as e:
+            logger.error(f'Error en callback de éxito del pipeline: {e}')
+        self._finish(job, success=True)
+
+    async def _fail(self, stage: Stage, job: Dict[str, Any], error: Exception):
+        logger.debug(f'Job falló en etapa {stage.name}: {error}')
+        try:
+            if self._on_error:
+                await self._run_blocking(self._on_error, job, error)
+        except Exception as callback_error:
+            logger.error(f'Error en callback de error del pipeline: {callback_error}')
+        self._finish(job, success=False)
+
+    def _finish(self, job: Dict[str, Any], success: bool):
+        self._in_flight.discard(self._key_fn(job))
+        if success:
+            self._completed += 1
+        else:
+            self._failed += 1
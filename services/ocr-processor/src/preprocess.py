@@ -0,0 +1,123 @@
+"""
+Pre-procesamiento de imágenes antes de enviarlas a Vision
+Las fotos de teléfono (8-12 MB) se corrigen de orientación, se pasan a escala
+de grises, se reducen a una resolución suficiente para OCR y se recomprimen
+hasta un presupuesto de bytes. Menos bytes = menos latencia de subida y menos
+memoria por factura en vuelo
+"""
+
+import io
+import logging
+import time
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Formatos que no se tocan (multi-página, van por la anotación de archivos de Vision)
+_PASSTHROUGH_SIGNATURES = (b'%PDF', b'II*\x00', b'MM\x00*')
+
+# Tag EXIF de orientación
+_EXIF_ORIENTATION = 0x0112
+
+# Calidades JPEG a probar, de mejor a peor
+_JPEG_QUALITIES = (85, 75, 65, 55)
+
+def _target_size(size: Tuple[int, int], max_long_edge: int, scale: float) -> Tuple[int, int]:
+    width, height = size
+    scale = min(scale, max_long_edge / max(width, height)) if max_long_edge else scale
+    if scale >= 1.0:
+        return size
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def _encode_jpeg(image: Image.Image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+def preprocess_image(
+    image_bytes: bytes,
+    max_long_edge: int = 2500,
+    target_dpi: Optional[int] = 300,
+    max_bytes: int = 1_500_000,
+    grayscale: bool = True
+) -> bytes:
+    """
+    Preparar una imagen para OCR
+
+    1. Corregir orientación según EXIF
+    2. Convertir a escala de grises
+    3. Reducir a `max_long_edge` px (y a `target_dpi` si la imagen informa DPI mayor)
+    4. Recomprimir como JPEG bajando calidad (y luego tamaño) hasta `max_bytes`
+
+    Si la imagen ya cumple los límites y no necesita rotarse, se retorna sin cambios
+    para no perder calidad recomprimiendo. PDF/TIFF se retornan sin cambios.
+
+    Args:
+        image_bytes: Bytes de la imagen original
+        max_long_edge: Máximo de píxeles del lado mayor (0 = sin límite)
+        target_dpi: DPI objetivo si la imagen declara uno mayor (None = ignorar)
+        max_bytes: Presupuesto de bytes del resultado
+        grayscale: Convertir a escala de grises
+
+    Returns:
+        Bytes de la imagen procesada
+    """
+    if image_bytes[:4] in _PASSTHROUGH_SIGNATURES:
+        return image_bytes
+
+    started = time.perf_counter()
+
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        original_size = image.size
+
+        scale = 1.0
+        dpi = image.info.get('dpi')
+        if target_dpi and dpi and dpi[0] and dpi[0] > target_dpi:
+            scale = target_dpi / float(dpi[0])
+
+        needs_rotation = image.getexif().get(_EXIF_ORIENTATION, 1) != 1
+        new_size = _target_size(original_size, max_long_edge, scale)
+
+        if len(image_bytes) <= max_bytes and new_size == original_size and not needs_rotation:
+            logger.debug(f'Imagen ya optimizada ({len(image_bytes)} bytes), sin pre-procesar')
+            return image_bytes
+
+        image = ImageOps.exif_transpose(image)
+        new_size = _target_size(image.size, max_long_edge, scale)
+
+        image = image.convert('L') if grayscale else image.convert('RGB')
+        if new_size != image.size:
+            image = image.resize(new_size, Image.LANCZOS)
+
+        # Bajar calidad primero; si no alcanza, reducir la resolución un 20% y reintentar
+        result = b''
+        for _ in range(4):
+            for quality in _JPEG_QUALITIES:
+                result = _encode_jpeg(image, quality)
+                if len(result) <= max_bytes:
+                    break
+            if len(result) <= max_bytes:
+                break
+            image = image.resize(
+                (max(1, int(image.width * 0.8)), max(1, int(image.height * 0.8))),
+                Image.LANCZOS
+            )
+
+        # No empeorar: si la recompresión no redujo nada y no había que rotar, usar el original
+        if len(result) >= len(image_bytes) and not needs_rotation:
+            result = image_bytes
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(
+            f'✓ Imagen pre-procesada: {len(image_bytes)} -> {len(result)} bytes, '
+            f'{original_size[0]}x{original_size[1]} -> {image.width}x{image.height} '
+            f'({elapsed_ms:.0f} ms)'
+        )
+        return result
+
+    except Exception as e:
+        logger.warning(f'No se pudo pre-procesar la imagen, se usa la original: {e}')
+        return image_bytes
@@ -0,0 +1,163 @@
+"""
+Rate limiting compartido para APIs externas (Vision, SII, Storage)
+Token buckets configurables por servicio, seguros entre threads y usables desde
+asyncio. Ante respuestas 429/503 (o fallas repetidas) el bucket reduce su tasa
+a la mitad y se pausa; con respuestas exitosas recupera la tasa configurada
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from config import RATE_LIMITS
+
+logger = logging.getLogger(__name__)
+
+# Códigos HTTP que indican que el servicio nos está limitando
+THROTTLE_STATUS_CODES = (429, 503)
+
+class TokenBucket:
+    """
+    Token bucket con reservas: cada llamada reserva sus tokens y espera lo necesario
+
+    Args:
+        name: Nombre del servicio (para logs)
+        rate: Tokens por segundo (tasa configurada)
+        burst: Capacidad máxima del bucket
+        min_rate: Tasa mínima al reducir por throttling
+        max_cooldown: Pausa máxima tras fallas consecutivas (segundos)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: int = 1,
+        min_rate: Optional[float] = None,
+        max_cooldown: float = 60.0
+    ):
+        self.name = name
+        self._configured_rate = rate
+        self._rate = rate
+        self._burst = max(1, burst)
+        self._min_rate = min_rate if min_rate is not None else rate / 16
+        self._max_cooldown = max_cooldown
+
+        self._tokens = float(self._burst)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._consecutive_failures = 0
+        self._lock = threading.Lock()
+
+        self.throttled = 0
+
+    @property
+    def rate(self) -> float:
+        """Tasa actual (puede estar reducida por throttling)"""
+        return self._rate
+
+    def acquire(self, tokens: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Esperar (bloqueando el thread) hasta disponer de `tokens`
+
+        Returns:
+            True si se obtuvieron, False si la espera superaba `timeout`
+        """
+        wait = self._reserve(tokens, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    async def acquire_async(self, tokens: int = 1, timeout: Optional[float] = None) -> bool:
+        """Igual que `acquire`, pero esperando con asyncio.sleep"""
+        wait = self._reserve(tokens, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    def record_success(self):
+        """Registrar una respuesta exitosa: recuperar la tasa gradualmente"""
+        with self._lock:
+            self._consecutive_failures = 0
+            if self._rate < self._configured_rate:
+                self._rate = min(self._configured_rate, self._rate + self._configured_rate * 0.1)
+
+    def record_throttle(self, retry_after: Optional[float] = None):
+        """
+        Registrar un 429/503 o una falla: reducir la tasa a la mitad y pausar
+
+        Args:
+            retry_after: Segundos indicados por el servicio (header Retry-After), si los hay
+        """
+        with self._lock:
+            self._consecutive_failures += 1
+            self.throttled += 1
+            self._rate = max(self._min_rate, self._rate / 2)
+
+            if retry_after is None:
+                retry_after = min(self._max_cooldown, 2 ** (self._consecutive_failures - 1))
+
+            now = time.monotonic()
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+            # Descartar la ráfaga acumulada: al reanudar se respeta la nueva tasa
+            self._tokens = min(self._tokens, 0.0)
+
+        logger.warning(
+            f'Rate limit {self.name}: pausa de {retry_after:.1f}s, '
+            f'tasa reducida a {self._rate:.2f}/s'
+        )
+
+    def _refill(self, now: float):
+        # Durante una pausa no se acumulan tokens: se cuenta desde que termina
+        start = max(self._updated_at, self._blocked_until)
+        if now > start:
+            self._tokens = min(self._burst, self._tokens + (now - start) * self._rate)
+        self._updated_at = max(self._updated_at, now)
+
+    def _reserve(self, tokens: int, timeout: Optional[float]) -> Optional[float]:
+        """Reservar tokens y retornar cuántos segundos esperar (None si excede timeout)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            self._tokens -= tokens
+            # Los tokens faltantes se generan recién al terminar la pausa
+            wait = max(0.0, self._blocked_until - now)
+            if self._tokens < 0:
+                wait += -self._tokens / self._rate
+
+            if timeout is not None and wait > timeout:
+                # Deshacer la reserva
+                self._tokens += tokens
+                return None
+
+            return wait
+
+# ============================================
+# REGISTRO DE LIMITADORES POR SERVICIO
+# ============================================
+
+_limiters: Dict[str, TokenBucket] = {}
+_registry_lock = threading.Lock()
+
+def get_rate_limiter(service: str) -> TokenBucket:
+    """Obtener el limitador compartido de un servicio ('vision', 'sii', 'storage')"""
+    with _registry_lock:
+        if service not in _limiters:
+            rate, burst = RATE_LIMITS.get(service, (1.0, 1))
+            _limiters[service] = TokenBucket(service, rate=rate, burst=burst)
+            logger.info(f'✓ Rate limiter {service}: {rate}/s (ráfaga {burst})')
+        return _limiters[service]
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Leer el header Retry-After (sólo formato en segundos)"""
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
@@ -0,0 +1,237 @@
+"""
+Re-parseo masivo del texto OCR ya guardado
+Cuando cambian las reglas del parser, vuelve a correr `parse_invoice_text`
+sobre el `ocrRawText` de facturas ya procesadas, sin volver a llamar a Vision.
+El parser es CPU puro (regex), así que se reparte en procesos por bloques de
+textos y los resultados salen en el orden de entrada a medida que terminan
+
+Uso:
+    python src/reparse.py --input facturas.jsonl --output reparseadas.jsonl --workers 8
+    python src/reparse.py --input resultados.jsonl --firestore --company-id abc123
+
+Formato de entrada (una línea por factura, p. ej. la salida del backfill):
+    {"id": "f-0001", "companyId": "abc123", "ocrRawText": "FACTURA ELECTRÓNICA ..."}
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+import config  # noqa: F401  (configura el logging)
+import parser as invoice_parser
+from parser import parse_invoice_text
+
+logger = logging.getLogger(__name__)
+
+# Campos que salen del texto OCR. Se conservan las razones sociales (vienen del
+# SII) y los items (necesitan la geometría de las palabras, que no se guarda)
+PARSED_FIELDS = (
+    'type', 'number', 'date', 'emisorRut', 'receptorRut',
+    'netoAmount', 'ivaAmount', 'totalAmount'
+)
+
+# ============================================
+# PARSEO EN LOTE
+# ============================================
+
+def _init_worker():
+    # Los avisos por campo no encontrado de cada factura sólo son ruido en un re-parseo masivo
+    logging.getLogger(invoice_parser.__name__).setLevel(logging.ERROR)
+
+def _parse_chunk(texts: List[str]) -> List[Dict[str, Any]]:
+    return [parse_invoice_text(text) for text in texts]
+
+def _chunks(texts: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+    iterator = iter(texts)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def parse_invoices_batch(
+    texts: Iterable[str],
+    workers: Optional[int] = None,
+    chunk_size: int = 64
+) -> Iterator[Dict[str, Any]]:
+    """
+    Parsear muchos textos OCR en paralelo con un pool de procesos
+
+    Los textos se envían en bloques de `chunk_size` (un envío entre procesos
+    por bloque, no por factura) y hay como máximo `workers * 2` bloques en
+    vuelo: la entrada se consume a medida que avanza la salida, así que
+    `texts` puede ser un generador sobre todo el corpus.
+
+    Args:
+        texts: Textos OCR (cualquier iterable)
+        workers: Procesos del pool (por defecto, uno por CPU; 1 = sin pool)
+        chunk_size: Textos por bloque
+
+    Yields:
+        El resultado de parse_invoice_text de cada texto, en el orden de entrada
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk_size = max(1, chunk_size)
+
+    if workers <= 1:
+        for chunk in _chunks(texts, chunk_size):
+            yield from _parse_chunk(chunk)
+        return
+
+    max_in_flight = workers * 2
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    pending = deque()
+
+    try:
+        for chunk in _chunks(texts, chunk_size):
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+            pending.append(executor.submit(_parse_chunk, chunk))
+
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        # Si el consumidor deja de iterar, no seguir parseando bloques que nadie va a leer
+        executor.shutdown(wait=True, cancel_futures=True)
+
+# ============================================
+# ENTRADA Y SALIDA
+# ============================================
+
+def iter_records(input_path: str, stats: Dict[str, int]) -> Iterator[Dict[str, Any]]:
+    """Facturas del JSONL de entrada que tienen texto OCR"""
+    with open(input_path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.error(f'Línea {line_number} inválida en la entrada: {e}')
+                stats['skipped'] += 1
+                continue
+
+            if not isinstance(record.get('ocrRawText'), str):
+                stats['skipped'] += 1
+                continue
+
+            yield record
+
+def reparsed_record(record: Dict[str, Any], parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Factura con los campos del parser reemplazados por el nuevo resultado (sin el texto OCR)
+
+    Los campos que el parser ya no encuentra quedan en None, para que la
+    escritura en Firestore borre el valor anterior.
+    """
+    result = {k: v for k, v in record.items() if k != 'ocrRawText'}
+    result.update({field: parsed[field] for field in PARSED_FIELDS})
+    return result
+
+def run_reparse(
+    input_path: str,
+    write,
+    workers: Optional[int] = None,
+    chunk_size: int = 64,
+    limit: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Re-parsear todas las facturas de la entrada y entregar cada resultado a `write`
+
+    Returns:
+        Estadísticas de la ejecución
+    """
+    stats = {'parsed': 0, 'skipped': 0}
+    started = time.monotonic()
+
+    # Facturas leídas cuyo resultado todavía no salió (acotado por los bloques en vuelo)
+    records = deque()
+
+    def texts() -> Iterator[str]:
+        for record in islice(iter_records(input_path, stats), limit):
+            records.append(record)
+            yield record['ocrRawText']
+
+    for parsed in parse_invoices_batch(texts(), workers=workers, chunk_size=chunk_size):
+        write(reparsed_record(records.popleft(), parsed))
+        stats['parsed'] += 1
+
+        if stats['parsed'] % 10000 == 0:
+            elapsed = time.monotonic() - started
+            logger.info(f'Progreso: {stats["parsed"]} facturas ({stats["parsed"] / elapsed:.0f} facturas/s)')
+
+    stats['elapsedSeconds'] = time.monotonic() - started
+    stats['invoicesPerSecond'] = stats['parsed'] / stats['elapsedSeconds'] if stats['elapsedSeconds'] > 0 else 0.0
+    return stats
+
+# ============================================
+# CLI
+# ============================================
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Re-parsear el texto OCR guardado de facturas ya procesadas')
+    parser.add_argument('--input', required=True, help='Archivo JSONL con id, companyId y ocrRawText')
+    parser.add_argument('--output', help='Archivo JSONL de resultados')
+    parser.add_argument('--firestore', action='store_true', help='Escribir resultados en Firestore')
+    parser.add_argument('--company-id', help='Empresa destino para facturas sin companyId (con --firestore)')
+    parser.add_argument('--workers', type=int, help='Procesos de parseo (por defecto, uno por CPU)')
+    parser.add_argument('--chunk-size', type=int, default=64, help='Textos por bloque enviado a cada proceso')
+    parser.add_argument('--limit', type=int, help='Re-parsear como máximo N facturas')
+    args = parser.parse_args(argv)
+
+    if bool(args.output) == bool(args.firestore):
+        parser.error('Indicar exactamente uno de --output o --firestore')
+
+    _init_worker()
+
+    if args.firestore:
+        from firebase_client import initialize_firebase, update_reparsed_invoices
+        initialize_firebase()
+
+        pending: List[Dict[str, Any]] = []
+        totals = {'updated': 0, 'verified': 0, 'missing': 0}
+
+        def flush():
+            # Sólo los campos del parser; createdAt, processedAt y el estado no se tocan
+            written = update_reparsed_invoices(pending, PARSED_FIELDS, default_company_id=args.company_id)
+            if written['failed']:
+                raise RuntimeError(f'No se pudieron actualizar {written["failed"]} de {len(pending)} facturas en Firestore')
+            for key in totals:
+                totals[key] += written[key]
+            pending.clear()
+
+        def write(result: Dict[str, Any]):
+            pending.append(result)
+            if len(pending) >= 400:
+                flush()
+
+        stats = run_reparse(args.input, write, args.workers, args.chunk_size, args.limit)
+        if pending:
+            flush()
+        logger.info(
+            f'Firestore: {totals["updated"]} actualizadas, {totals["verified"]} verificadas por el usuario (sin cambios), '
+            f'{totals["missing"]} inexistentes'
+        )
+    else:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            def write(result: Dict[str, Any]):
+                output.write(json.dumps(result, ensure_ascii=False, default=str) + '\n')
+
+            stats = run_reparse(args.input, write, args.workers, args.chunk_size, args.limit)
+
+    logger.info(
+        f'✓ Re-parseo terminado: {stats["parsed"]} facturas, {stats["skipped"]} omitidas '
+        f'en {stats["elapsedSeconds"]:.1f}s ({stats["invoicesPerSecond"]:.0f} facturas/s)'
+    )
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,192 @@
+"""
+RUT chileno como valor: número entero más dígito verificador
+Se parsea una sola vez desde cualquier forma de escribirlo (con o sin puntos,
+guión o espacios, dv en minúscula) y la forma normalizada (`12.345.678-5`)
+es la que se usa en el parser, las claves de cache y las consultas al SII.
+Para columnas de RUTs (backfill, exportaciones) `validate_ruts` valida el
+dígito verificador de todas a la vez con NumPy
+"""
+
+import logging
+from functools import lru_cache
+from typing import Iterable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Dígito verificador según (11 - suma % 11) % 11
+_DV_CHARS = '0123456789K'
+
+# Caracteres que se ignoran al leer un RUT
+_SEPARATORS = str.maketrans('', '', '.- ')
+
+# Los RUTs vigentes tienen hasta 8 dígitos; se acepta uno más de margen
+_MAX_NUMBER_DIGITS = 9
+
+# ============================================
+# VALOR
+# ============================================
+
+def compute_dv(number: int) -> str:
+    """Dígito verificador (módulo 11) de un número de RUT"""
+    total = 0
+    multiplier = 2
+    while number:
+        number, digit = divmod(number, 10)
+        total += digit * multiplier
+        multiplier = 2 if multiplier == 7 else multiplier + 1
+    return _DV_CHARS[(11 - total % 11) % 11]
+
+class Rut:
+    """
+    RUT normalizado (inmutable por convención: las instancias se comparten)
+
+    Attributes:
+        number: Número sin dígito verificador
+        dv: Dígito verificador ('0'-'9' o 'K')
+    """
+
+    __slots__ = ('number', 'dv')
+
+    def __init__(self, number: int, dv: str):
+        self.number = number
+        self.dv = dv
+
+    @property
+    def is_valid(self) -> bool:
+        """El dígito verificador corresponde al número"""
+        return self.dv == compute_dv(self.number)
+
+    @property
+    def compact(self) -> str:
+        """Forma sin puntos (12345678-5), la que espera el formulario del SII"""
+        return f'{self.number}-{self.dv}'
+
+    def __str__(self) -> str:
+        return f'{self.number:,}'.replace(',', '.') + f'-{self.dv}'
+
+    def __repr__(self) -> str:
+        return f'Rut({str(self)!r})'
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Rut) and self.number == other.number and self.dv == other.dv
+
+    def __hash__(self) -> int:
+        return hash((self.number, self.dv))
+
+@lru_cache(maxsize=4096)
+def _interned(number: int, dv: str) -> Rut:
+    # Un mismo RUT escrito de distintas formas comparte la instancia
+    return Rut(number, dv)
+
+@lru_cache(maxsize=8192)
+def parse_rut(value: str) -> Optional[Rut]:
+    """
+    Parsear un RUT escrito de cualquier forma
+
+    Args:
+        value: RUT con o sin puntos, guión o espacios
+
+    Returns:
+        Rut (sin validar el dígito verificador) o None si no tiene forma de RUT
+    """
+    cleaned = value.translate(_SEPARATORS).upper()
+    number, dv = cleaned[:-1], cleaned[-1:]
+    if not dv or dv not in _DV_CHARS or len(number) > _MAX_NUMBER_DIGITS:
+        return None
+    if not number.isascii() or not number.isdigit():
+        return None
+    return _interned(int(number), dv)
+
+# ============================================
+# FUNCIONES SOBRE TEXTO
+# ============================================
+
+def validate_rut(rut: str) -> bool:
+    """
+    Validar formato y dígito verificador de RUT chileno
+
+    Args:
+        rut: RUT a validar (con o sin formato)
+
+    Returns:
+        True si es válido, False si no
+    """
+    parsed = parse_rut(rut)
+    return parsed is not None and parsed.is_valid
+
+def format_rut(rut: str) -> str:
+    """
+    Formatear RUT con puntos y guión
+
+    Args:
+        rut: RUT con o sin formato
+
+    Returns:
+        RUT formateado (XX.XXX.XXX-X), o el mismo texto si no tiene forma de RUT
+    """
+    parsed = parse_rut(rut)
+    return str(parsed) if parsed else rut
+
+# ============================================
+# VALIDACIÓN EN LOTE
+# ============================================
+
+# Ancho de la matriz de caracteres; los textos más largos se validan uno por uno
+_MAX_RUT_CHARS = 16
+
+def validate_ruts(ruts: Iterable[Optional[str]]) -> np.ndarray:
+    """
+    Validar una columna de RUTs de una vez
+
+    Los textos se pasan a una matriz de códigos de caracter; sacar separadores,
+    leer el dv y sumar los dígitos ponderados (2, 3, ..., 7 desde la derecha)
+    son operaciones sobre toda la matriz, sin un loop de Python por dígito.
+
+    Args:
+        ruts: RUTs con o sin formato (None cuenta como inválido)
+
+    Returns:
+        Arreglo bool con el mismo resultado que validate_rut para cada uno
+    """
+    values = [rut or '' for rut in ruts]
+    count = len(values)
+    if not count:
+        return np.zeros(0, dtype=bool)
+
+    chars = np.array(values, dtype=f'U{_MAX_RUT_CHARS}')
+    codes = chars.view(np.uint32).reshape(count, _MAX_RUT_CHARS)
+    columns = np.arange(_MAX_RUT_CHARS)
+
+    # Correr los caracteres útiles al inicio de cada fila (orden estable)
+    keep = (codes != 0) & (codes != ord('.')) & (codes != ord('-')) & (codes != ord(' '))
+    order = np.argsort(~keep, axis=1, kind='stable')
+    codes = np.take_along_axis(codes, order, axis=1)
+    lengths = keep.sum(axis=1)
+
+    dv = codes[np.arange(count), np.maximum(lengths - 1, 0)]
+    dv_value = np.where((dv == ord('K')) | (dv == ord('k')), 10, dv.astype(np.int64) - ord('0'))
+
+    in_number = columns < (lengths - 1)[:, None]
+    digits = codes.astype(np.int64) - ord('0')
+    digits_ok = ((digits >= 0) & (digits <= 9) | ~in_number).all(axis=1)
+
+    # Ponderador según la posición contando desde el último dígito del número
+    position = (lengths - 2)[:, None] - columns
+    weights = np.where(in_number, 2 + position % 6, 0)
+    total = (np.where(in_number, digits, 0) * weights).sum(axis=1)
+    expected = (11 - total % 11) % 11
+
+    valid = (
+        (lengths >= 2)
+        & (lengths <= _MAX_NUMBER_DIGITS + 1)
+        & digits_ok
+        & (dv_value >= 0) & (dv_value <= 10)
+        & (expected == dv_value)
+    )
+
+    # Textos que llenan todo el ancho pueden haber quedado truncados
+    for index in np.flatnonzero(codes[:, -1] != 0).tolist():
+        valid[index] = validate_rut(values[index])
+    return valid
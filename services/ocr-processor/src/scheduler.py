@@ -0,0 +1,136 @@
+"""
+Scheduler justo por empresa para la cola de procesamiento
+Mantiene una cola por empresa y despacha con round-robin ponderado, de modo que
+una empresa que sube 500 facturas de golpe no deja esperando a las demás.
+Las facturas con `priority` mayor (ej: escaneos individuales desde la app)
+se despachan antes que las de menor prioridad (ej: cargas masivas)
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRIORITY = 0
+
+def invoice_priority(invoice_data: Dict[str, Any]) -> int:
+    """Prioridad de una factura (campo opcional `priority`, mayor = antes)"""
+    try:
+        return int(invoice_data.get('priority', DEFAULT_PRIORITY))
+    except (TypeError, ValueError):
+        return DEFAULT_PRIORITY
+
+def parse_company_weights(value: str) -> Dict[str, int]:
+    """
+    Parsear pesos por empresa desde configuración
+
+    Args:
+        value: Texto "empresaA:3,empresaB:2" (empresas no listadas pesan 1)
+    """
+    weights = {}
+
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        company_id, _, weight = item.rpartition(':')
+        try:
+            weights[company_id] = max(1, int(weight))
+        except ValueError:
+            logger.warning(f'Peso inválido para empresa en OCR_COMPANY_WEIGHTS: {item}')
+
+    return weights
+
+class FairScheduler:
+    """
+    Colas por empresa con prioridad y round-robin ponderado entre empresas
+
+    Orden de despacho:
+    1. Siempre se atiende primero el nivel de prioridad más alto presente
+    2. Entre las empresas con facturas de ese nivel, round-robin ponderado
+       (smooth weighted round-robin: cada empresa recibe una fracción
+       proporcional a su peso, intercalada en vez de en ráfagas)
+    3. Dentro de una empresa, por prioridad y luego por orden de llegada
+    """
+
+    def __init__(self, weights: Optional[Dict[str, int]] = None, default_weight: int = 1):
+        self._weights = weights or {}
+        self._default_weight = max(1, default_weight)
+
+        # empresa -> heap de (-prioridad, secuencia, factura)
+        self._queues: Dict[str, List[Tuple[int, int, Dict[str, Any]]]] = {}
+        self._keys = set()
+        self._current: Dict[str, int] = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def push(self, invoice_data: Dict[str, Any]) -> bool:
+        """
+        Agregar una factura a la cola de su empresa
+
+        Returns:
+            True si se agregó, False si ya estaba encolada
+        """
+        key = (invoice_data.get('companyId'), invoice_data.get('id'))
+
+        with self._lock:
+            if key in self._keys:
+                return False
+
+            self._keys.add(key)
+            heap = self._queues.setdefault(key[0], [])
+            heapq.heappush(heap, (-invoice_priority(invoice_data), next(self._sequence), invoice_data))
+            return True
+
+    def pop(self, limit: int) -> List[Dict[str, Any]]:
+        """Sacar hasta `limit` facturas en orden de despacho"""
+        batch = []
+
+        with self._lock:
+            while len(batch) < limit and self._queues:
+                company_id = self._next_company()
+                heap = self._queues[company_id]
+                invoice_data = heapq.heappop(heap)[2]
+
+                if not heap:
+                    del self._queues[company_id]
+                    self._current.pop(company_id, None)
+
+                self._keys.discard((company_id, invoice_data.get('id')))
+                batch.append(invoice_data)
+
+        return batch
+
+    def depths(self) -> Dict[str, int]:
+        """Facturas en cola por empresa"""
+        with self._lock:
+            return {company_id: len(heap) for company_id, heap in self._queues.items()}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._keys)
+
+    def _weight(self, company_id: str) -> int:
+        return self._weights.get(company_id, self._default_weight)
+
+    def _next_company(self) -> str:
+        """Elegir empresa: prioridad más alta presente y luego smooth weighted round-robin"""
+        top_priority = min(heap[0][0] for heap in self._queues.values())
+        eligible = [c for c, heap in self._queues.items() if heap[0][0] == top_priority]
+
+        if len(eligible) == 1:
+            return eligible[0]
+
+        total_weight = 0
+        chosen = None
+
+        for company_id in eligible:
+            weight = self._weight(company_id)
+            total_weight += weight
+            self._current[company_id] = self._current.get(company_id, 0) + weight
+
+            if chosen is None or self._current[company_id] > self._current[chosen]:
+                chosen = company_id
+
+        self._current[chosen] -= total_weight
+        return chosen
@@ -4,11 +4,15 @@ Web scraping del portal del SII
 """
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from lxml import html as lxml_html
 import logging
-from typing import Optional, Dict, Any
-import time
-from config import MAX_RETRIES
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Iterable
+from config import MAX_RETRIES, SII_POOL_SIZE, SII_CONNECT_TIMEOUT, SII_READ_TIMEOUT
+from rate_limit import get_rate_limiter, parse_retry_after, THROTTLE_STATUS_CODES
+from rut import parse_rut
 
 logger = logging.getLogger(__name__)
 
@@ -28,16 +32,48 @@ HEADERS = {
     'Connection': 'keep-alive'
 }
 
+# ============================================
+# SESIÓN HTTP
+# ============================================
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def get_sii_session() -> requests.Session:
+    """
+    Sesión HTTP compartida para el SII
+    
+    Reutiliza conexiones keep-alive a zeus.sii.cl (sin un handshake TCP+TLS por
+    consulta). El pool admite hasta SII_POOL_SIZE conexiones; con todas en uso,
+    la siguiente consulta espera una libre en vez de abrir otra.
+    """
+    global _session
+    
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers.update(HEADERS)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SII_POOL_SIZE, pool_block=True)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+                logger.info(f'✓ Sesión SII creada (pool de {SII_POOL_SIZE} conexiones)')
+    
+    return _session
+
 # ============================================
 # FUNCIONES DE CONSULTA
 # ============================================
 
-def query_sii_by_rut(rut: str) -> Optional[Dict[str, Any]]:
+def query_sii_by_rut(rut: str, raise_errors: bool = False) -> Optional[Dict[str, Any]]:
     """
     Consultar datos de un contribuyente en el SII por RUT
     
     Args:
         rut: RUT del contribuyente (con o sin formato)
+        raise_errors: Propagar los errores de red o del SII en vez de devolver
+            None, para distinguirlos de un RUT que el SII no conoce
     
     Returns:
         Dict con datos del contribuyente o None si no se encuentra
@@ -52,34 +88,35 @@ def query_sii_by_rut(rut: str) -> Optional[Dict[str, Any]]:
         }
     """
     try:
-        # Limpiar y formatear RUT
-        cleaned_rut = rut.replace('.', '').replace('-', '')
-        if len(cleaned_rut) < 2:
+        parsed_rut = parse_rut(rut)
+        if parsed_rut is None:
             logger.error(f'RUT inválido: {rut}')
             return None
         
-        # Separar número y dígito verificador
-        dv = cleaned_rut[-1]
-        numero = cleaned_rut[:-1]
+        # El resultado lleva el RUT normalizado, escriba como se escriba la consulta
+        rut = str(parsed_rut)
+        logger.info(f'Consultando SII para RUT: {parsed_rut.compact}')
         
-        logger.info(f'Consultando SII para RUT: {numero}-{dv}')
+        limiter = get_rate_limiter('sii')
         
-        # Realizar consulta con reintentos
+        # Realizar consulta con reintentos; el rate limiter marca el ritmo y las pausas
         for attempt in range(MAX_RETRIES):
             try:
-                response = requests.post(
+                limiter.acquire()
+                response = get_sii_session().post(
                     SII_CONSULTA_URL,
                     data={
-                        'RUT': numero,
-                        'DV': dv,
+                        'RUT': str(parsed_rut.number),
+                        'DV': parsed_rut.dv,
                         'PRG': 'STC',  # Programa de consulta
                         'OPC': 'NOR'   # Opción normal
                     },
-                    headers=HEADERS,
-                    timeout=10
+                    timeout=(SII_CONNECT_TIMEOUT, SII_READ_TIMEOUT)
                 )
                 
                 if response.status_code == 200:
+                    limiter.record_success()
+                    
                     # Parsear respuesta HTML
                     data = parse_sii_response(response.text, rut)
                     
@@ -91,26 +128,98 @@ def query_sii_by_rut(rut: str) -> Optional[Dict[str, Any]]:
                         return None
                 
                 logger.warning(f'Intento {attempt + 1}/{MAX_RETRIES} falló: Status {response.status_code}')
-                time.sleep(1 * (attempt + 1))  # Backoff exponencial
+                
+                if response.status_code in THROTTLE_STATUS_CODES:
+                    limiter.record_throttle(parse_retry_after(response.headers.get('Retry-After')))
+                else:
+                    limiter.record_throttle()
                 
             except requests.RequestException as e:
                 logger.error(f'Error en solicitud HTTP (intento {attempt + 1}/{MAX_RETRIES}): {e}')
                 if attempt < MAX_RETRIES - 1:
-                    time.sleep(2 * (attempt + 1))
+                    limiter.record_throttle()
                 else:
                     raise
         
         logger.error(f'No se pudo consultar el SII después de {MAX_RETRIES} intentos')
+        if raise_errors:
+            raise RuntimeError(f'SII no disponible después de {MAX_RETRIES} intentos')
         return None
     
     except Exception as e:
         logger.error(f'Error al consultar SII: {e}')
+        if raise_errors:
+            raise
         return None
 
+def query_sii_by_ruts(ruts: Iterable[str], concurrency: Optional[int] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Consultar muchos RUTs en paralelo (backfill, proveedores nuevos en lote)
+    
+    Cada RUT distinto (según su forma normalizada) se consulta una sola vez, con
+    a lo más `concurrency` consultas en vuelo. El ritmo de solicitudes lo sigue
+    marcando el rate limiter 'sii'; la concurrencia superpone la latencia de red.
+    
+    Args:
+        ruts: RUTs con o sin formato
+        concurrency: Consultas simultáneas (por defecto SII_POOL_SIZE, el tamaño del pool)
+    
+    Returns:
+        Dict {rut tal como vino: resultado de query_sii_by_rut}
+    """
+    ruts = list(dict.fromkeys(ruts))
+    
+    # Agrupar las distintas formas de escribir un mismo RUT
+    by_normalized: Dict[str, list] = {}
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+    for rut in ruts:
+        parsed = parse_rut(rut)
+        if parsed is None or not parsed.is_valid:
+            logger.warning(f'RUT inválido, se omite: {rut}')
+            results[rut] = None
+        else:
+            by_normalized.setdefault(str(parsed), []).append(rut)
+    
+    if not by_normalized:
+        return results
+    
+    workers = max(1, min(concurrency or SII_POOL_SIZE, len(by_normalized)))
+    logger.info(f'Consultando {len(by_normalized)} RUTs en el SII ({workers} en paralelo)')
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sii') as executor:
+        for normalized, data in zip(by_normalized, executor.map(query_sii_by_rut, by_normalized)):
+            for rut in by_normalized[normalized]:
+                results[rut] = data
+    
+    found = sum(1 for data in results.values() if data)
+    logger.info(f'✓ {found} de {len(results)} RUTs con datos en el SII')
+    return results
+
+# Etiquetas de la tabla del contribuyente, en orden de prioridad
+_LABEL_FIELDS = (
+    (('razón social', 'nombre'), 'razonSocial'),
+    (('giro',), 'giro'),
+    (('actividad',), 'actividadEconomica'),
+    (('dirección', 'domicilio'), 'direccion'),
+    (('comuna',), 'comuna'),
+    (('región',), 'region'),
+)
+
+# Tabla del contribuyente: la de clase "cuadro" o, si no hay, la primera
+_CUADRO_XPATH = '(//table[contains(concat(" ", normalize-space(@class), " "), " cuadro ")])[1]'
+_TABLE_XPATH = '(//table)[1]'
+
+def _cell_text(cell) -> str:
+    # Igual que get_text(strip=True) de BeautifulSoup: fragmentos sin espacios, unidos
+    return ''.join(fragment.strip() for fragment in cell.itertext())
+
 def parse_sii_response(html: str, rut: str) -> Optional[Dict[str, Any]]:
     """
     Parsear respuesta HTML del SII
     
+    lxml arma el árbol en C y XPath va directo a la tabla del contribuyente;
+    sólo se lee el texto de las dos primeras celdas de cada fila.
+    
     Args:
         html: HTML de respuesta
         rut: RUT consultado
@@ -119,23 +228,23 @@ def parse_sii_response(html: str, rut: str) -> Optional[Dict[str, Any]]:
         Dict con los datos extraídos o None
     """
     try:
-        soup = BeautifulSoup(html, 'html.parser')
+        # lxml no acepta texto ya decodificado con declaración XML de encoding
+        if html.lstrip().startswith('<?xml'):
+            html = html.split('?>', 1)[-1]
         
         # El SII retorna los datos en diferentes formatos dependiendo del tipo de consulta
-        # Buscar tabla con datos del contribuyente
-        
-        # Método 1: Buscar por tabla con clase específica
-        table = soup.find('table', {'class': 'cuadro'})
-        if not table:
-            # Método 2: Buscar cualquier tabla
-            table = soup.find('table')
-        
-        if not table:
+        tables = []
+        if html.strip():
+            document = lxml_html.fromstring(html)
+            tables = document.xpath(_CUADRO_XPATH) or document.xpath(_TABLE_XPATH)
+        if not tables:
             logger.warning('No se encontró tabla en la respuesta del SII')
             return None
         
-        # Extraer filas
-        rows = table.find_all('tr')
+        table = tables[0]
+        # Scripts y estilos no son texto visible (get_text tampoco los incluye)
+        for element in table.xpath('.//script|.//style'):
+            element.drop_tree()
         
         data = {
             'rut': rut,
@@ -148,24 +257,14 @@ def parse_sii_response(html: str, rut: str) -> Optional[Dict[str, Any]]:
         }
         
         # Parsear filas buscando las etiquetas
-        for row in rows:
-            cells = row.find_all(['td', 'th'])
+        for row in table.iterdescendants('tr'):
+            cells = row.xpath('.//td|.//th')
             if len(cells) >= 2:
-                label = cells[0].get_text(strip=True).lower()
-                value = cells[1].get_text(strip=True)
-                
-                if 'razón social' in label or 'nombre' in label:
-                    data['razonSocial'] = value
-                elif 'giro' in label:
-                    data['giro'] = value
-                elif 'actividad' in label:
-                    data['actividadEconomica'] = value
-                elif 'dirección' in label or 'domicilio' in label:
-                    data['direccion'] = value
-                elif 'comuna' in label:
-                    data['comuna'] = value
-                elif 'región' in label:
-                    data['region'] = value
+                label = _cell_text(cells[0]).lower()
+                for keywords, field in _LABEL_FIELDS:
+                    if any(keyword in label for keyword in keywords):
+                        data[field] = _cell_text(cells[1])
+                        break
         
         # Validar que al menos tengamos razón social
         if not data['razonSocial']:
@@ -178,82 +277,6 @@ def parse_sii_response(html: str, rut: str) -> Optional[Dict[str, Any]]:
         logger.error(f'Error al parsear respuesta del SII: {e}')
         return None
 
-def validate_rut(rut: str) -> bool:
-    """
-    Validar formato y dígito verificador de RUT chileno
-    
-    Args:
-        rut: RUT a validar (con o sin formato)
-    
-    Returns:
-        True si es válido, False si no
-    """
-    try:
-        # Limpiar RUT
-        cleaned = rut.replace('.', '').replace('-', '').upper()
-        
-        if len(cleaned) < 2:
-            return False
-        
-        # Separar número y dígito verificador
-        dv = cleaned[-1]
-        numero = cleaned[:-1]
-        
-        # El número debe ser numérico
-        if not numero.isdigit():
-            return False
-        
-        # Calcular dígito verificador esperado
-        suma = 0
-        multiplicador = 2
-        
-        for digito in reversed(numero):
-            suma += int(digito) * multiplicador
-            multiplicador = 7 if multiplicador == 2 else multiplicador + 1
-        
-        dv_esperado = 11 - (suma % 11)
-        
-        if dv_esperado == 11:
-            dv_esperado_str = '0'
-        elif dv_esperado == 10:
-            dv_esperado_str = 'K'
-        else:
-            dv_esperado_str = str(dv_esperado)
-        
-        return dv == dv_esperado_str
-    
-    except Exception as e:
-        logger.error(f'Error al validar RUT: {e}')
-        return False
-
-def format_rut(rut: str) -> str:
-    """
-    Formatear RUT con puntos y guión
-    
-    Args:
-        rut: RUT sin formato
-    
-    Returns:
-        RUT formateado (XX.XXX.XXX-X)
-    """
-    try:
-        cleaned = rut.replace('.', '').replace('-', '').upper()
-        
-        if len(cleaned) < 2:
-            return rut
-        
-        dv = cleaned[-1]
-        numero = cleaned[:-1]
-        
-        # Agregar puntos de miles
-        formatted_numero = f'{int(numero):,}'.replace(',', '.')
-        
-        return f'{formatted_numero}-{dv}'
-    
-    except Exception as e:
-        logger.error(f'Error al formatear RUT: {e}')
-        return rut
-
 # ============================================
 # NOTAS IMPORTANTES
 # ============================================
@@ -263,7 +286,7 @@ LIMITACIONES Y CONSIDERACIONES:
 
 1. **Rate Limiting del SII:**
    - El SII puede bloquear consultas excesivas desde una misma IP
-   - Implementar delays entre consultas
+   - Las consultas pasan por el rate limiter 'sii' (SII_RATE_LIMIT), que se pausa ante 429/503
    - Usar cache en Firestore para evitar consultas repetidas
 
 2. **Captcha:**
@@ -280,7 +303,8 @@ LIMITACIONES Y CONSIDERACIONES:
 4. **Alternativas:**
    - API Marketplace del SII (requiere convenio)
    - Servicios de terceros (ej: simpliroute, indicadoreschile)
-   - Base de datos local pre-cargada
+   - Base de datos local pre-cargada (implementada en contributors.py: nómina
+     en CSV importada a SQLite, se consulta antes del cache y del SII)
 
 5. **Mejoras futuras:**
    - Implementar Selenium para casos más complejos
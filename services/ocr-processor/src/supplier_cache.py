@@ -0,0 +1,175 @@
+"""
+Cache en memoria de proveedores (datos del SII por RUT del emisor)
+Tier delante de la colección `suppliers` de Firestore: los proveedores
+frecuentes se resuelven sin leer Firestore ni consultar el SII. También
+guarda los RUTs que el SII no conoce ("no encontrado"), con un TTL más corto,
+para no volver a consultarlos en cada factura. Acotado por cantidad de
+entradas, con desalojo LRU. SingleFlight junta las búsquedas simultáneas de
+un mismo RUT en una sola
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import (
+    SUPPLIER_CACHE_ENABLED,
+    SUPPLIER_CACHE_MAX_ENTRIES,
+    SUPPLIER_CACHE_TTL_HOURS,
+    SUPPLIER_CACHE_NEGATIVE_TTL_HOURS
+)
+
+logger = logging.getLogger(__name__)
+
+class SupplierCache:
+    """
+    LRU con TTL por entrada, por RUT normalizado
+
+    Args:
+        max_entries: Máximo de RUTs guardados (se desaloja el usado hace más tiempo)
+        ttl_seconds: Vigencia de los datos de un proveedor
+        negative_ttl_seconds: Vigencia de un "no encontrado en el SII"
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, negative_ttl_seconds: float):
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._negative_ttl = negative_ttl_seconds
+        self._lock = threading.Lock()
+
+        # rut -> (vence en, datos o None si el SII no lo conoce), el usado hace más tiempo primero
+        self._entries: 'OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]' = OrderedDict()
+        self._hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, rut: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Buscar un proveedor
+
+        Returns:
+            (True, datos) si está; (True, None) si se sabe que el SII no lo
+            conoce; (False, None) si no está o venció
+        """
+        with self._lock:
+            entry = self._entries.get(rut)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[rut]
+                entry = None
+
+            if entry is None:
+                self._misses += 1
+                return False, None
+
+            self._entries.move_to_end(rut)
+            if entry[1] is None:
+                self._negative_hits += 1
+            else:
+                self._hits += 1
+            return True, entry[1]
+
+    def put(self, rut: str, data: Dict[str, Any]):
+        """Guardar los datos de un proveedor"""
+        self._store(rut, data, self._ttl)
+
+    def put_not_found(self, rut: str):
+        """Recordar que el SII no tiene datos para este RUT"""
+        self._store(rut, None, self._negative_ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de aciertos (con datos y "no encontrado"), fallos y desalojos"""
+        with self._lock:
+            hits = self._hits + self._negative_hits
+            total = hits + self._misses
+            return {
+                'hits': self._hits,
+                'negativeHits': self._negative_hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'entries': len(self._entries),
+                'hitRate': hits / total if total else 0.0
+            }
+
+    def _store(self, rut: str, data: Optional[Dict[str, Any]], ttl: float):
+        with self._lock:
+            self._entries[rut] = (time.monotonic() + ttl, data)
+            self._entries.move_to_end(rut)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+class SingleFlight:
+    """
+    Una sola ejecución en vuelo por clave
+
+    Las llamadas con una clave que ya se está resolviendo esperan esa ejecución
+    y reciben su mismo resultado (o excepción) en vez de repetirla: una ráfaga
+    de facturas del mismo proveedor hace una sola consulta al SII.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._calls = 0
+        self._coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Ejecutar fn() para la clave, o esperar la ejecución que ya está en vuelo"""
+        with self._lock:
+            self._calls += 1
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Llamadas totales y cuántas esperaron una ejecución ajena"""
+        with self._lock:
+            return {
+                'calls': self._calls,
+                'coalesced': self._coalesced,
+                'inFlight': len(self._in_flight)
+            }
+
+_supplier_cache: Optional[SupplierCache] = None
+_supplier_cache_lock = threading.Lock()
+
+def get_supplier_cache() -> Optional[SupplierCache]:
+    """Obtener el cache de proveedores en memoria (None si SUPPLIER_CACHE_ENABLED=false)"""
+    global _supplier_cache
+
+    if not SUPPLIER_CACHE_ENABLED:
+        return None
+
+    with _supplier_cache_lock:
+        if _supplier_cache is None:
+            _supplier_cache = SupplierCache(
+                SUPPLIER_CACHE_MAX_ENTRIES,
+                SUPPLIER_CACHE_TTL_HOURS * 3600,
+                SUPPLIER_CACHE_NEGATIVE_TTL_HOURS * 3600
+            )
+            logger.info(f'✓ Cache de proveedores en memoria inicializado ({SUPPLIER_CACHE_MAX_ENTRIES} entradas)')
+
+        return _supplier_cache
@@ -0,0 +1,144 @@
+"""
+Pool de workers para procesar facturas en paralelo
+Cada factura pasa la mayor parte del tiempo esperando a Storage, Vision y SII,
+por lo que varios threads procesándolas a la vez multiplican el throughput
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, Any, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Marca de fin para los workers
+_STOP = object()
+
+class InvoiceWorkerPool:
+    """
+    Pool de threads con una cola acotada de facturas en vuelo
+
+    La cola acotada aplica backpressure: `submit` bloquea cuando ya hay
+    `queue_size` facturas esperando, en vez de acumular facturas en memoria.
+    """
+
+    def __init__(
+        self,
+        process_fn: Callable[[Dict[str, Any]], bool],
+        workers: int = 4,
+        queue_size: int = 10
+    ):
+        self._process_fn = process_fn
+        self._workers = max(1, workers)
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._threads = []
+
+        # Facturas encoladas o en proceso, para no encolar dos veces la misma
+        self._in_flight: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+        self._processed = 0
+        self._failed = 0
+        self._started_at: Optional[float] = None
+
+    def start(self):
+        """Iniciar los threads del pool"""
+        self._started_at = time.monotonic()
+
+        for i in range(self._workers):
+            thread = threading.Thread(
+                target=self._worker_loop,
+                name=f'ocr-worker-{i + 1}',
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+        logger.info(f'✓ Worker pool iniciado: {self._workers} workers, cola de {self._queue.maxsize}')
+
+    def submit(self, invoice_data: Dict[str, Any], timeout: Optional[float] = None) -> bool:
+        """
+        Encolar una factura para procesamiento
+
+        Bloquea si la cola está llena (hasta `timeout` segundos si se indica).
+
+        Returns:
+            True si se encoló, False si ya estaba en vuelo o la cola siguió llena
+        """
+        key = self._key(invoice_data)
+
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            self._in_flight.add(key)
+
+        try:
+            self._queue.put(invoice_data, timeout=timeout)
+            return True
+        except queue.Full:
+            with self._lock:
+                self._in_flight.discard(key)
+            return False
+
+    def available_slots(self) -> int:
+        """Cantidad de facturas que se pueden encolar sin bloquear"""
+        with self._lock:
+            in_flight = len(self._in_flight)
+        return max(0, self._workers + self._queue.maxsize - in_flight)
+
+    def in_flight(self) -> int:
+        """Cantidad de facturas encoladas o en proceso"""
+        with self._lock:
+            return len(self._in_flight)
+
+    def shutdown(self, wait: bool = True):
+        """Detener el pool, terminando primero las facturas ya encoladas"""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+        self._threads = []
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de throughput del pool"""
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        total = self._processed + self._failed
+
+        return {
+            'processed': self._processed,
+            'failed': self._failed,
+            'elapsedSeconds': elapsed,
+            'invoicesPerSecond': total / elapsed if elapsed > 0 else 0.0
+        }
+
+    def _worker_loop(self):
+        """Loop de cada worker: tomar facturas de la cola y procesarlas"""
+        while True:
+            invoice_data = self._queue.get()
+
+            if invoice_data is _STOP:
+                self._queue.task_done()
+                return
+
+            success = False
+            try:
+                # process_invoice ya maneja sus propios errores y marca la factura
+                success = self._process_fn(invoice_data)
+            except Exception as e:
+                logger.error(f'Error inesperado en worker: {e}')
+            finally:
+                with self._lock:
+                    self._in_flight.discard(self._key(invoice_data))
+                    if success:
+                        self._processed += 1
+                    else:
+                        self._failed += 1
+                self._queue.task_done()
+
+    @staticmethod
+    def _key(invoice_data: Dict[str, Any]) -> Tuple[str, str]:
+        return (invoice_data.get('companyId'), invoice_data.get('id'))
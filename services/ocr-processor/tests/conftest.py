@@ -0,0 +1,6 @@
+"""Configuración de pytest: los módulos del procesador viven en src/ (layout plano)"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
@@ -0,0 +1,102 @@
+"""Tests del backfill: una línea por item en el JSONL y errores de cierre que no tapan el original"""
+
+import json
+
+import pytest
+
+import backfill
+from backfill import Checkpoint, JsonlSink, load_checkpoint
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+def test_retried_item_keeps_only_its_last_result(tmp_path):
+    output, checkpoint_path = tmp_path / 'resultados.jsonl', tmp_path / 'ckpt'
+
+    # Primera ejecución: b falla
+    checkpoint = Checkpoint(checkpoint_path)
+    sink = JsonlSink(str(output), checkpoint)
+    sink.write({'id': 'a', 'status': 'ocr_done'})
+    sink.write({'id': 'b', 'status': 'error', 'errorMessage': 'timeout'})
+    sink.close()
+    checkpoint.close()
+    assert load_checkpoint(checkpoint_path) == {'a'}
+
+    # Reanudación: se reintenta b y termina bien
+    checkpoint = Checkpoint(checkpoint_path)
+    sink = JsonlSink(str(output), checkpoint)
+    sink.write({'id': 'b', 'status': 'ocr_done'})
+    sink.write({'id': 'c', 'status': 'ocr_done'})
+    sink.close()
+    checkpoint.close()
+
+    assert _lines(output) == [
+        {'id': 'a', 'status': 'ocr_done'},
+        {'id': 'b', 'status': 'ocr_done'},
+        {'id': 'c', 'status': 'ocr_done'},
+    ]
+    assert load_checkpoint(checkpoint_path) == {'a', 'b', 'c'}
+
+def test_truncated_line_from_interrupted_run_is_dropped(tmp_path):
+    output = tmp_path / 'resultados.jsonl'
+    output.write_text('{"id": "a", "status": "ocr_done"}\n{"id": "b", "sta', encoding='utf-8')
+
+    checkpoint = Checkpoint(tmp_path / 'ckpt')
+    sink = JsonlSink(str(output), checkpoint)
+    sink.write({'id': 'b', 'status': 'ocr_done'})
+    sink.close()
+    checkpoint.close()
+
+    assert _lines(output) == [{'id': 'a', 'status': 'ocr_done'}, {'id': 'b', 'status': 'ocr_done'}]
+
+def test_file_without_duplicates_is_not_rewritten(tmp_path):
+    output = tmp_path / 'resultados.jsonl'
+    checkpoint = Checkpoint(tmp_path / 'ckpt')
+    sink = JsonlSink(str(output), checkpoint)
+    sink.write({'id': 'a', 'status': 'ocr_done'})
+    inode = output.stat().st_ino
+    sink.close()
+    checkpoint.close()
+
+    assert output.stat().st_ino == inode
+
+def test_close_error_does_not_hide_the_original_error(tmp_path, monkeypatch):
+    class FailingSink:
+        def __init__(self, *args):
+            pass
+
+        def close(self):
+            raise RuntimeError('Sólo se escribieron 0 de 3 facturas en Firestore')
+
+    def run_backfill(*args, **kwargs):
+        raise ValueError('manifiesto inválido')
+
+    monkeypatch.setattr(backfill, 'validate_config', lambda: None)
+    monkeypatch.setattr(backfill, 'JsonlSink', FailingSink)
+    monkeypatch.setattr(backfill, 'run_backfill', run_backfill)
+
+    with pytest.raises(ValueError, match='manifiesto inválido'):
+        backfill.main([
+            '--input', str(tmp_path / 'facturas'),
+            '--output', str(tmp_path / 'resultados.jsonl'),
+            '--checkpoint', str(tmp_path / 'ckpt'),
+        ])
+
+def test_close_error_is_raised_when_the_run_succeeded(tmp_path, monkeypatch):
+    class FailingSink:
+        def __init__(self, *args):
+            pass
+
+        def close(self):
+            raise RuntimeError('lote final rechazado')
+
+    monkeypatch.setattr(backfill, 'validate_config', lambda: None)
+    monkeypatch.setattr(backfill, 'JsonlSink', FailingSink)
+    monkeypatch.setattr(backfill, 'run_backfill', lambda *args, **kwargs: {})
+
+    with pytest.raises(RuntimeError, match='lote final rechazado'):
+        backfill.main([
+            '--input', str(tmp_path / 'facturas'),
+            '--output', str(tmp_path / 'resultados.jsonl'),
+            '--checkpoint', str(tmp_path / 'ckpt'),
+        ])
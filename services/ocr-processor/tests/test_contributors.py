@@ -0,0 +1,115 @@
+"""Tests del registro local de contribuyentes: importación del CSV y búsqueda por RUT"""
+
+import threading
+
+import pytest
+
+import contributors
+from contributors import import_contributors, lookup_contributor
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = tmp_path / 'contribuyentes.sqlite'
+    monkeypatch.setattr(contributors, 'CONTRIBUTORS_DB_PATH', str(path))
+    # Conexiones por thread nuevas para cada test (apuntan al archivo del test)
+    monkeypatch.setattr(contributors, '_local', threading.local())
+    return path
+
+def _csv(tmp_path, text, name='nomina.csv'):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+def test_import_with_rut_in_one_column(tmp_path, db_path):
+    source = _csv(tmp_path, (
+        'RUT;Razón Social;Giro;Actividad Económica;Dirección;Comuna\n'
+        '12.345.678-5;ACME SPA;Comercio;471000;Av. Principal 1;Santiago\n'
+        '10000013-K;FERRETERÍA K LTDA;Ferretería;475200;Calle 2;Ñuñoa\n'
+    ))
+
+    stats = import_contributors(source, str(db_path))
+
+    assert stats == {'read': 2, 'imported': 2, 'duplicates': 0, 'invalid': 0}
+    assert lookup_contributor('12.345.678-5') == {
+        'rut': '12.345.678-5', 'razonSocial': 'ACME SPA', 'giro': 'Comercio',
+        'actividadEconomica': '471000', 'direccion': 'Av. Principal 1', 'comuna': 'Santiago', 'region': None
+    }
+
+def test_import_with_rut_and_dv_columns(tmp_path, db_path):
+    source = _csv(tmp_path, (
+        'rut,dv,nombre,comuna\n'
+        '12345678,5,ACME SPA,Santiago\n'
+        '10000004,0,CERO LTDA,Temuco\n'
+    ))
+
+    stats = import_contributors(source, str(db_path))
+
+    assert stats['imported'] == 2
+    assert lookup_contributor('10.000.004-0')['razonSocial'] == 'CERO LTDA'
+
+def test_invalid_rows_are_dropped(tmp_path, db_path):
+    source = _csv(tmp_path, (
+        'RUT;Razón Social\n'
+        '12.345.678-5;ACME SPA\n'
+        '12.345.678-9;DV INCORRECTO\n'
+        'sin rut;NADA\n'
+        ';VACÍO\n'
+    ))
+
+    stats = import_contributors(source, str(db_path))
+
+    assert stats == {'read': 4, 'imported': 1, 'duplicates': 0, 'invalid': 3}
+    assert lookup_contributor('12.345.678-9') is None
+
+def test_repeated_rut_keeps_last_row_and_is_counted_once(tmp_path, db_path):
+    source = _csv(tmp_path, (
+        'RUT;Razón Social\n'
+        '12.345.678-5;NOMBRE ANTIGUO\n'
+        '12345678-5;NOMBRE NUEVO\n'
+        '10.000.013-K;OTRA\n'
+    ))
+
+    stats = import_contributors(source, str(db_path), batch_size=1)
+
+    assert stats == {'read': 3, 'imported': 2, 'duplicates': 1, 'invalid': 0}
+    assert lookup_contributor('12.345.678-5')['razonSocial'] == 'NOMBRE NUEVO'
+
+def test_failed_import_keeps_previous_index(tmp_path, db_path):
+    import_contributors(_csv(tmp_path, 'RUT;Razón Social\n12.345.678-5;ACME SPA\n'), str(db_path))
+    before = db_path.read_bytes()
+
+    with pytest.raises(ValueError):
+        import_contributors(_csv(tmp_path, 'Nombre;Comuna\nACME;Santiago\n', 'sin_rut.csv'), str(db_path))
+
+    assert db_path.read_bytes() == before
+    assert not db_path.with_name(db_path.name + '.tmp').exists()
+    assert lookup_contributor('12.345.678-5')['razonSocial'] == 'ACME SPA'
+
+def test_new_import_replaces_the_index(tmp_path, db_path):
+    import_contributors(_csv(tmp_path, 'RUT;Razón Social\n12.345.678-5;ACME SPA\n'), str(db_path))
+    import_contributors(_csv(tmp_path, 'RUT;Razón Social\n10.000.013-K;OTRA\n', 'nueva.csv'), str(db_path))
+    # Conexión nueva: un proceso que ya tenía la anterior abierta sigue leyendo el archivo viejo
+    contributors._local = threading.local()
+
+    assert lookup_contributor('10.000.013-K')['razonSocial'] == 'OTRA'
+    assert lookup_contributor('12.345.678-5') is None
+    assert not db_path.with_name(db_path.name + '.tmp').exists()
+
+@pytest.mark.parametrize('rut', ['10.000.013-K', '10000013-K', '10000013k', '10.000.013-k', ' 10 000 013 k '])
+def test_lookup_accepts_any_rut_format(tmp_path, db_path, rut):
+    import_contributors(_csv(tmp_path, 'RUT;Razón Social\n10.000.013-K;FERRETERÍA K LTDA\n'), str(db_path))
+
+    assert lookup_contributor(rut) == {
+        'rut': '10.000.013-K', 'razonSocial': 'FERRETERÍA K LTDA', 'giro': None,
+        'actividadEconomica': None, 'direccion': None, 'comuna': None, 'region': None
+    }
+
+def test_lookup_without_imported_registry_returns_none(db_path):
+    assert not db_path.exists()
+    assert lookup_contributor('12.345.678-5') is None
+
+def test_lookup_rejects_invalid_rut(tmp_path, db_path):
+    import_contributors(_csv(tmp_path, 'RUT;Razón Social\n12.345.678-5;ACME SPA\n'), str(db_path))
+
+    assert lookup_contributor('12.345.678-0') is None
+    assert lookup_contributor('no es rut') is None
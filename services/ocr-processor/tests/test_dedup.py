@@ -0,0 +1,134 @@
+"""Tests de la confirmación de fotos duplicadas: re-subidas idénticas antes del OCR y casi duplicadas tras el parseo"""
+
+import pytest
+
+import main
+from ocr_cache import image_hash
+
+ORIGINAL = {
+    'status': 'ocr_done', 'number': 1234, 'emisorRut': '76.123.456-7', 'totalAmount': 119000,
+    'emisorRazonSocial': 'ACME SpA', 'emisorGiro': 'Comercio'
+}
+
+def _job(parsed_data):
+    return {'invoice': {'companyId': 'empresa', 'id': 'nueva'}, 'duplicate_candidate': 'original', 'parsed_data': dict(parsed_data)}
+
+def test_same_template_different_invoice_is_not_duplicate(monkeypatch):
+    monkeypatch.setattr(main, 'get_invoice', lambda company_id, invoice_id: ORIGINAL)
+    job = _job({'number': 1235, 'emisorRut': '76.123.456-7', 'totalAmount': 119000})
+
+    main._confirm_near_duplicate(job)
+
+    assert 'duplicate_of' not in job
+    assert 'duplicate_candidate' not in job
+
+def test_matching_fields_confirm_duplicate(monkeypatch):
+    monkeypatch.setattr(main, 'get_invoice', lambda company_id, invoice_id: ORIGINAL)
+    monkeypatch.setattr(main, 'OCR_DEDUP_REUSE', False)
+    # El RUT escrito de otra forma y el total como float siguen siendo la misma factura
+    job = _job({'number': '1234', 'emisorRut': '76123456-7', 'totalAmount': 119000.0})
+
+    main._confirm_near_duplicate(job)
+
+    assert job['duplicate_of'] == 'original'
+    assert not job.get('reused')
+
+def test_missing_field_never_confirms(monkeypatch):
+    monkeypatch.setattr(main, 'get_invoice', lambda company_id, invoice_id: ORIGINAL)
+    job = _job({'number': 1234, 'emisorRut': None, 'totalAmount': 119000})
+
+    main._confirm_near_duplicate(job)
+
+    assert 'duplicate_of' not in job
+
+def test_reuse_copies_supplier_data_of_confirmed_duplicate(monkeypatch):
+    monkeypatch.setattr(main, 'get_invoice', lambda company_id, invoice_id: ORIGINAL)
+    monkeypatch.setattr(main, 'OCR_DEDUP_REUSE', True)
+    job = _job({'number': 1234, 'emisorRut': '76.123.456-7', 'totalAmount': 119000})
+
+    main._confirm_near_duplicate(job)
+
+    assert job['reused']
+    assert job['parsed_data']['emisorRazonSocial'] == 'ACME SpA'
+    assert job['parsed_data']['number'] == 1234
+
+# ============================================
+# RE-SUBIDAS IDÉNTICAS: SIN OCR
+# ============================================
+
+IMAGE = b'foto de la factura'
+
+STORED_ORIGINAL = {
+    **ORIGINAL, 'imageSha256': image_hash(IMAGE), 'ocrRawText': 'FACTURA N° 1234', 'ocrConfidence': 0.97,
+    'type': 'factura', 'items': [{'description': 'Licencia', 'total': 119000}]
+}
+
+class _Index:
+    def __init__(self, match):
+        self.match = match
+
+    def find(self, company_id, phash):
+        return self.match
+
+@pytest.fixture
+def identical_upload(monkeypatch):
+    def install(original, distance=0):
+        monkeypatch.setattr(main, 'OCR_DEDUP_REUSE', True)
+        monkeypatch.setattr(main, 'perceptual_hash', lambda image_bytes: 7)
+        monkeypatch.setattr(main, 'duplicate_index', _Index(('original', distance)))
+        monkeypatch.setattr(main, 'get_invoice', lambda company_id, invoice_id: original)
+        return {'invoice': {'companyId': 'empresa', 'id': 'nueva'}}
+    return install
+
+def _no_ocr(*args, **kwargs):
+    raise AssertionError('no debería llamar a Vision')
+
+def test_identical_upload_skips_ocr_parse_and_sii(identical_upload, monkeypatch):
+    job = identical_upload(STORED_ORIGINAL)
+    monkeypatch.setattr(main, 'extract_text_from_image', _no_ocr)
+    monkeypatch.setattr(main, '_lookup_supplier', _no_ocr)
+
+    main._detect_near_duplicate(job, IMAGE)
+    for step in (main.ocr_step, main.parse_step, main.sii_step):
+        step(job)
+
+    assert job['duplicate_of'] == 'original'
+    assert job['text'] == 'FACTURA N° 1234'
+    assert job['parsed_data']['number'] == 1234
+    assert job['parsed_data']['items'] == STORED_ORIGINAL['items']
+    assert job['parsed_data']['emisorRazonSocial'] == 'ACME SpA'
+
+def test_similar_photo_still_goes_through_ocr(identical_upload):
+    # Misma foto perceptual pero otro archivo (otra toma): sólo candidata
+    job = identical_upload(STORED_ORIGINAL, distance=3)
+
+    main._detect_near_duplicate(job, b'otra toma de la factura')
+
+    assert job['duplicate_candidate'] == 'original'
+    assert not job.get('reused')
+
+def test_original_without_stored_sha_is_confirmed_after_parse(identical_upload):
+    legacy = {key: value for key, value in STORED_ORIGINAL.items() if key != 'imageSha256'}
+    job = identical_upload(legacy)
+
+    main._detect_near_duplicate(job, IMAGE)
+
+    assert job['duplicate_candidate'] == 'original'
+    assert 'text' not in job
+
+def test_batch_ocr_sends_only_jobs_without_reused_result(monkeypatch):
+    sent = []
+
+    def extract(images, **kwargs):
+        sent.extend(images)
+        return [{'text': 'FACTURA', 'confidence': 0.9}, {'error': 'imagen ilegible'}]
+
+    monkeypatch.setattr(main, 'extract_text_from_images', extract)
+    jobs = [{'image_bytes': b'a'}, {'reused': True, 'text': 'COPIA'}, {'image_bytes': b'c'}]
+
+    errors = main.ocr_batch_step(jobs)
+
+    assert sent == [b'a', b'c']
+    assert errors[0] is None and errors[1] is None
+    assert 'imagen ilegible' in str(errors[2])
+    assert jobs[0]['text'] == 'FACTURA' and jobs[1]['text'] == 'COPIA'
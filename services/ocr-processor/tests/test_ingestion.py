@@ -0,0 +1,76 @@
+"""Tests de la ingesta: vuelta a polling cuando se cae el listener y facturas vistas por ambos caminos"""
+
+from ingestion import PendingInvoiceFeed
+
+class _Watch:
+    """Watch falso: `is_active` como el de Firestore"""
+
+    def __init__(self):
+        self.is_active = True
+        self.unsubscribed = False
+
+    def unsubscribe(self):
+        self.unsubscribed = True
+
+def _invoice(invoice_id, company_id='empresa'):
+    return {'companyId': company_id, 'id': invoice_id}
+
+def _feed(fetched):
+    """Feed con listener falso; `fetched` es lo que devuelve cada poll"""
+    state = {'watch': None, 'callback': None, 'polls': 0}
+
+    def subscribe(callback):
+        state['watch'], state['callback'] = _Watch(), callback
+        return state['watch']
+
+    def fetch(limit):
+        state['polls'] += 1
+        return list(fetched)
+
+    feed = PendingInvoiceFeed(
+        fetch_fn=fetch,
+        claim_fn=lambda batch: batch,
+        subscribe_fn=subscribe,
+        min_interval=0.01,
+        max_interval=0.05,
+        resubscribe_interval=3600
+    )
+    feed.start()
+    return feed, state
+
+def test_listener_arrivals_are_dispatched_without_polling():
+    feed, state = _feed([])
+    assert feed.listening()
+
+    state['callback']([_invoice('a'), _invoice('b')])
+
+    assert [invoice['id'] for invoice in feed.next_batch(10)] == ['a', 'b']
+    assert state['polls'] == 0
+
+def test_falls_back_to_polling_when_listener_drops():
+    feed, state = _feed([_invoice('p1')])
+
+    state['watch'].is_active = False
+
+    assert not feed.listening()
+    assert [invoice['id'] for invoice in feed.next_batch(10)] == ['p1']
+    assert state['polls'] == 1
+
+def test_invoice_seen_by_listener_and_poll_is_dispatched_once():
+    feed, state = _feed([_invoice('a'), _invoice('b')])
+
+    state['callback']([_invoice('a')])
+    state['watch'].is_active = False
+
+    batch = feed.next_batch(10)
+
+    assert sorted(invoice['id'] for invoice in batch) == ['a', 'b']
+    assert state['polls'] == 1
+
+def test_stop_unsubscribes_and_returns_nothing():
+    feed, state = _feed([_invoice('a')])
+
+    feed.stop()
+
+    assert state['watch'].unsubscribed
+    assert feed.next_batch(10) == []
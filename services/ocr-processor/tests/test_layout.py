@@ -0,0 +1,119 @@
+"""Tests de la extracción de items por geometría: encabezado, líneas continuadas, pie de totales y fallback"""
+
+import random
+from types import SimpleNamespace
+
+import numpy as np
+
+from layout import WordBoxes, extract_layout_items, word_boxes_from_annotations
+
+# Palabras de 10 px por caracter, separadas por un espacio (10 px) dentro de una celda
+CHAR_WIDTH = 10
+WORD_HEIGHT = 20
+
+def _page(rows):
+    """WordBoxes de una página: rows = [(y, [(x, 'texto de la celda'), ...]), ...]"""
+    texts, boxes = [], []
+    for y, cells in rows:
+        for x, cell in cells:
+            for word in cell.split():
+                width = len(word) * CHAR_WIDTH
+                texts.append(word)
+                boxes.append((x, y, x + width, y + WORD_HEIGHT))
+                x += width + CHAR_WIDTH
+    return WordBoxes(texts, np.asarray(boxes, dtype=np.float32), np.zeros(len(texts), dtype=np.int32))
+
+def _shuffled(words, seed=0):
+    order = list(range(len(words)))
+    random.Random(seed).shuffle(order)
+    return WordBoxes([words.texts[i] for i in order], words.boxes[order], words.pages[order])
+
+HEADER = (100, [(20, 'Descripción'), (300, 'Cant.'), (400, 'Precio Unit.'), (550, 'Total')])
+
+INVOICE_ROWS = [
+    (40, [(20, 'FACTURA ELECTRÓNICA N° 1234')]),
+    HEADER,
+    (130, [(20, 'Servicio de asesoría'), (300, '2'), (400, '$ 50.000'), (550, '$ 100.000')]),
+    (160, [(20, 'mensual marzo')]),
+    (190, [(20, 'Licencia'), (300, '1'), (400, '25.000'), (550, '25.000')]),
+    (220, [(20, 'Flete'), (550, '5.000')]),
+    (270, [(20, 'MONTO NETO'), (550, '130.000')]),
+    (300, [(20, 'Timbre'), (300, '3'), (400, '1.000'), (550, '3.000')]),
+    (330, [(20, 'TOTAL'), (550, '154.700')]),
+]
+
+EXPECTED_ITEMS = [
+    {'description': 'Servicio de asesoría mensual marzo', 'quantity': 2.0, 'unitPrice': 50000.0, 'total': 100000.0},
+    {'description': 'Licencia', 'quantity': 1.0, 'unitPrice': 25000.0, 'total': 25000.0},
+    {'description': 'Flete', 'quantity': 1.0, 'unitPrice': 5000.0, 'total': 5000.0},
+]
+
+def test_table_found_from_header():
+    items = extract_layout_items(_page(INVOICE_ROWS))
+
+    assert items == EXPECTED_ITEMS
+
+def test_wrapped_description_continues_previous_item():
+    items = extract_layout_items(_page(INVOICE_ROWS))
+
+    assert items[0]['description'] == 'Servicio de asesoría mensual marzo'
+    assert len(items) == 3
+
+def test_rows_after_totals_footer_are_ignored():
+    items = extract_layout_items(_page(INVOICE_ROWS))
+
+    assert 'Timbre' not in [item['description'] for item in items]
+    assert sum(item['total'] for item in items) == 130000.0
+
+def test_shuffled_words_give_the_same_items():
+    words = _page(INVOICE_ROWS)
+
+    for seed in range(5):
+        assert extract_layout_items(_shuffled(words, seed)) == EXPECTED_ITEMS
+
+def test_fallback_without_header_uses_consistent_rows():
+    words = _page([
+        (40, [(20, 'BOLETA N° 77')]),
+        (100, [(20, 'Café grano'), (300, '3'), (400, '4.500'), (550, '13.500')]),
+        (130, [(20, 'Despacho'), (300, '1'), (400, '2.000'), (550, '9.999')]),
+        (160, [(20, 'Filtros'), (300, '2'), (400, '1.250,5'), (550, '2.501')]),
+        (200, [(20, 'TOTAL'), (300, '1'), (400, '16.001'), (550, '16.001')]),
+    ])
+
+    assert extract_layout_items(words) == [
+        {'description': 'Café grano', 'quantity': 3.0, 'unitPrice': 4500.0, 'total': 13500.0},
+        {'description': 'Filtros', 'quantity': 2.0, 'unitPrice': 1250.5, 'total': 2501.0},
+    ]
+
+def test_no_words_no_items():
+    empty = WordBoxes([], np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.int32))
+
+    assert extract_layout_items(empty) == []
+
+def _word(text, vertices=(), normalized=()):
+    return SimpleNamespace(
+        symbols=[SimpleNamespace(text=char) for char in text],
+        bounding_box=SimpleNamespace(
+            vertices=[SimpleNamespace(x=x, y=y) for x, y in vertices],
+            normalized_vertices=[SimpleNamespace(x=x, y=y) for x, y in normalized]
+        )
+    )
+
+def _annotation(words, width=0, height=0):
+    paragraph = SimpleNamespace(words=words)
+    page = SimpleNamespace(width=width, height=height, blocks=[SimpleNamespace(paragraphs=[paragraph])])
+    return SimpleNamespace(pages=[page])
+
+def test_word_boxes_from_pixel_and_normalized_vertices():
+    image = _annotation([
+        _word('Total', vertices=[(10, 5), (60, 7), (60, 25), (10, 23)]),
+        _word('sin', vertices=[(1, 1), (2, 2)]),  # caja incompleta: se omite
+    ])
+    pdf_page = _annotation([_word('Neto', normalized=[(0.1, 0.5), (0.2, 0.5), (0.2, 0.6), (0.1, 0.6)])], width=1000, height=2000)
+
+    words = word_boxes_from_annotations([image, pdf_page])
+
+    assert words.texts == ['Total', 'Neto']
+    assert words.pages.tolist() == [0, 1]
+    np.testing.assert_allclose(words.boxes, [[10, 5, 60, 25], [100, 1000, 200, 1200]], rtol=1e-5)
+    assert WordBoxes.from_dict(words.to_dict()).texts == words.texts
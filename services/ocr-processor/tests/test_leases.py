@@ -0,0 +1,86 @@
+"""Tests del heartbeat de leases y de la escritura final condicionada al lease"""
+
+import time
+
+import pytest
+
+import main
+from leases import LeaseKeeper
+
+def _invoice(invoice_id, owner='replica-1'):
+    return {'companyId': 'empresa', 'id': invoice_id, 'leaseOwner': owner}
+
+def test_renew_extends_tracked_leases_until_released():
+    renewed = []
+    keeper = LeaseKeeper(renew_fn=lambda invoices: renewed.append([i['id'] for i in invoices]) or [], interval=60)
+
+    keeper.track([_invoice('a'), _invoice('b'), {'companyId': 'empresa', 'id': 'sin-lease'}])
+    assert keeper.renew() == 2
+
+    keeper.release(_invoice('a'))
+    assert keeper.renew() == 1
+    assert renewed == [['a', 'b'], ['b']]
+
+def test_lost_lease_stops_being_renewed():
+    keeper = LeaseKeeper(renew_fn=lambda invoices: [('empresa', 'b')], interval=60)
+    keeper.track([_invoice('a'), _invoice('b')])
+
+    assert keeper.renew() == 1
+    assert keeper.is_lost(_invoice('b'))
+    assert not keeper.is_lost(_invoice('a'))
+    assert keeper.in_flight() == 1
+
+def test_renew_error_keeps_leases_tracked():
+    def failing(invoices):
+        raise RuntimeError('Firestore no disponible')
+
+    keeper = LeaseKeeper(renew_fn=failing, interval=60)
+    keeper.track([_invoice('a')])
+
+    assert keeper.renew() == 0
+    assert keeper.in_flight() == 1
+
+def test_heartbeat_thread_renews_periodically():
+    calls = []
+    keeper = LeaseKeeper(renew_fn=lambda invoices: calls.append(len(invoices)) or [], interval=0.01)
+    keeper.track([_invoice('a')])
+    keeper.start()
+    try:
+        for _ in range(200):
+            if len(calls) >= 2:
+                break
+            time.sleep(0.01)
+    finally:
+        keeper.stop()
+    assert len(calls) >= 2
+
+def _job(invoice_id):
+    invoice = _invoice(invoice_id, owner=main.OCR_WORKER_ID)
+    return {'invoice': invoice, 'text': 'FACTURA', 'confidence': 0.9, 'parsed_data': {'number': '1'}}
+
+def test_update_step_drops_result_when_lease_lost(monkeypatch):
+    writes = []
+    monkeypatch.setattr(main, 'update_invoice_with_lease', lambda company_id, invoice_id, worker_id, data: writes.append(worker_id) or False)
+
+    job = _job('perdida')
+    main.lease_keeper.track([job['invoice']])
+    main.update_step(job)
+
+    assert writes == [main.OCR_WORKER_ID]
+    assert main.lease_keeper.in_flight() == 0
+
+def test_update_step_raises_on_write_error(monkeypatch):
+    monkeypatch.setattr(main, 'update_invoice_with_lease', lambda *args: None)
+    with pytest.raises(Exception, match='Firestore'):
+        main.update_step(_job('error'))
+
+def test_mark_invoice_failed_checks_lease_and_releases(monkeypatch):
+    writes = []
+    monkeypatch.setattr(main, 'update_invoice_with_lease', lambda company_id, invoice_id, worker_id, data: writes.append(data['status']) or True)
+
+    job = _job('fallida')
+    main.lease_keeper.track([job['invoice']])
+    main.mark_invoice_failed(job, RuntimeError('OCR'))
+
+    assert writes == ['error']
+    assert main.lease_keeper.in_flight() == 0
@@ -0,0 +1,123 @@
+"""Tests del OCR en lote: agrupación de solicitudes a Vision, orden de los resultados y errores por imagen"""
+
+from types import SimpleNamespace
+
+import pytest
+from google.api_core import exceptions as gcp_exceptions
+from google.cloud import vision
+
+import ocr
+import ocr_backends
+from ocr_backends import VisionBackend
+
+PDF = b'%PDF-1.7 factura de 7 paginas'
+
+def _annotation(text):
+    return {'text': text, 'pages': [{'blocks': [{'confidence': 0.9}]}]}
+
+class _VisionClient:
+    """Cliente de Vision falso: el texto de cada imagen es su propio contenido; las que empiezan con b'roto' fallan"""
+
+    def __init__(self, total_pages=7, fail_batch=None):
+        self.image_batches = []
+        self.file_pages = []
+        self._total_pages = total_pages
+        self._fail_batch = fail_batch
+
+    def batch_annotate_images(self, requests):
+        contents = [request.image.content for request in requests]
+        self.image_batches.append(contents)
+        if self._fail_batch == len(self.image_batches):
+            raise gcp_exceptions.ServiceUnavailable('Vision no disponible')
+
+        responses = [
+            vision.AnnotateImageResponse(error={'message': 'imagen ilegible'}) if content.startswith(b'roto')
+            else vision.AnnotateImageResponse(full_text_annotation=_annotation(content.decode()))
+            for content in contents
+        ]
+        return SimpleNamespace(responses=responses)
+
+    def batch_annotate_files(self, requests):
+        pages = list(requests[0].pages)
+        self.file_pages.append(pages)
+        return SimpleNamespace(responses=[vision.AnnotateFileResponse(
+            total_pages=self._total_pages,
+            responses=[{'full_text_annotation': _annotation(f'página {page}')} for page in pages]
+        )])
+
+class _Limiter:
+    def __init__(self):
+        self.acquired = []
+        self.throttles = 0
+
+    def acquire(self, tokens=1):
+        self.acquired.append(tokens)
+
+    def record_success(self):
+        pass
+
+    def record_throttle(self):
+        self.throttles += 1
+
+@pytest.fixture
+def vision_client(monkeypatch):
+    def install(**kwargs):
+        client = _VisionClient(**kwargs)
+        limiter = _Limiter()
+        monkeypatch.setattr(ocr_backends, '_vision_client', client)
+        monkeypatch.setattr(ocr_backends, '_backend', VisionBackend())
+        monkeypatch.setattr(ocr, 'get_ocr_cache', lambda: None)
+        monkeypatch.setattr(ocr, 'get_rate_limiter', lambda service: limiter)
+        return client, limiter
+    return install
+
+def _images(count):
+    return [f'factura {i}'.encode() for i in range(count)]
+
+def test_images_are_grouped_up_to_the_batch_limit(vision_client):
+    client, limiter = vision_client()
+
+    ocr.extract_text_from_images(_images(40))
+
+    assert [len(batch) for batch in client.image_batches] == [16, 16, 8]
+    # La cuota se cobra por imagen, una vez por solicitud
+    assert limiter.acquired == [16, 16, 8]
+
+def test_results_come_back_in_the_order_of_the_invoices(vision_client):
+    vision_client()
+    images = _images(20)
+
+    results = ocr.extract_text_from_images(images)
+
+    assert [result['text'] for result in results] == [image.decode() for image in images]
+    assert all(result['error'] is None for result in results)
+
+def test_error_on_one_image_fails_only_that_invoice(vision_client):
+    vision_client()
+    images = _images(5)
+    images[2] = b'roto 2'
+
+    results = ocr.extract_text_from_images(images)
+
+    assert results[2]['error'] == 'Error en OCR: imagen ilegible'
+    assert results[2]['text'] == ''
+    assert [result['text'] for i, result in enumerate(results) if i != 2] == ['factura 0', 'factura 1', 'factura 3', 'factura 4']
+
+def test_failed_request_fails_only_its_batch(vision_client):
+    client, limiter = vision_client(fail_batch=1)
+
+    results = ocr.extract_text_from_images(_images(20))
+
+    assert all('Vision no disponible' in result['error'] for result in results[:16])
+    assert [result['text'] for result in results[16:]] == ['factura 16', 'factura 17', 'factura 18', 'factura 19']
+    assert limiter.throttles == 1
+
+def test_pdf_in_the_batch_goes_through_file_annotation_by_page_ranges(vision_client):
+    client, limiter = vision_client(total_pages=7)
+
+    results = ocr.extract_text_from_images([b'factura 0', PDF, b'factura 2'])
+
+    assert client.image_batches == [[b'factura 0', b'factura 2']]
+    assert client.file_pages == [[1, 2, 3, 4, 5], [6, 7]]
+    assert results[1]['text'] == '\n'.join(f'página {page}' for page in range(1, 8))
+    assert [results[0]['text'], results[2]['text']] == ['factura 0', 'factura 2']
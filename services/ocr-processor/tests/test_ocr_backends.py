@@ -0,0 +1,111 @@
+"""Tests de los backends de OCR: grabar respuestas de Vision y reproducirlas sin red"""
+
+import pytest
+from google.cloud import vision
+
+import ocr
+from ocr_backends import RecordingBackend, ReplayBackend, create_ocr_backend, set_ocr_backend
+
+PDF = b'%PDF-1.7 factura de 2 paginas'
+
+def _image_response(text):
+    return vision.AnnotateImageResponse(full_text_annotation={
+        'text': text, 'pages': [{'blocks': [{'confidence': 0.8}]}]
+    })
+
+class _Vision:
+    """Backend falso en el lugar de Vision: el texto es el propio contenido; b'roto' falla"""
+
+    name = 'vision'
+
+    def __init__(self):
+        self.calls = 0
+
+    def annotate_image(self, content):
+        self.calls += 1
+        if content == b'roto':
+            return vision.AnnotateImageResponse(error={'message': 'imagen ilegible'})
+        return _image_response(content.decode())
+
+    def annotate_images(self, contents):
+        return [self.annotate_image(content) for content in contents]
+
+    def annotate_file(self, content, mime_type, pages):
+        self.calls += 1
+        return vision.AnnotateFileResponse(
+            total_pages=2,
+            responses=[{'full_text_annotation': {'text': f'página {page}'}} for page in pages]
+        )
+
+@pytest.fixture
+def recorded(tmp_path):
+    """Directorio con las respuestas grabadas de dos imágenes y un PDF"""
+    recorder = RecordingBackend(_Vision(), str(tmp_path))
+    recorder.annotate_image(b'factura 1')
+    recorder.annotate_images([b'factura 2', b'roto'])
+    recorder.annotate_file(PDF, 'application/pdf', [1, 2])
+    return tmp_path
+
+def test_recording_passes_responses_through_and_saves_successes(tmp_path):
+    inner = _Vision()
+    recorder = RecordingBackend(inner, str(tmp_path))
+
+    response = recorder.annotate_image(b'factura 1')
+    failed = recorder.annotate_images([b'roto'])[0]
+
+    assert response.full_text_annotation.text == 'factura 1'
+    assert failed.error.message == 'imagen ilegible'
+    # Las respuestas con error no se graban: al reproducir no se repite una falla puntual
+    assert len(list(tmp_path.glob('*.image.json'))) == 1
+
+def test_replay_returns_the_recorded_responses(recorded):
+    replay = ReplayBackend(str(recorded), cycle=False)
+
+    assert replay.annotate_image(b'factura 1') == _image_response('factura 1')
+    assert [r.full_text_annotation.text for r in replay.annotate_images([b'factura 2', b'factura 1'])] == [
+        'factura 2', 'factura 1'
+    ]
+    document = replay.annotate_file(PDF, 'application/pdf', [1, 2])
+    assert document.total_pages == 2
+    assert [page.full_text_annotation.text for page in document.responses] == ['página 1', 'página 2']
+
+def test_replay_miss_without_cycle_is_an_error_response(recorded):
+    replay = ReplayBackend(str(recorded), cycle=False)
+
+    response = replay.annotate_image(b'factura nunca grabada')
+
+    assert response.error.message.startswith('Sin respuesta grabada para ')
+    assert replay.annotate_image(b'roto').error.message.startswith('Sin respuesta grabada')
+
+def test_replay_miss_with_cycle_rotates_recordings_of_the_same_kind(recorded):
+    replay = ReplayBackend(str(recorded), cycle=True)
+
+    texts = [replay.annotate_image(f'otra {i}'.encode()).full_text_annotation.text for i in range(4)]
+
+    assert sorted(texts[:2]) == ['factura 1', 'factura 2']
+    assert texts[2:] == texts[:2]
+    # Un rango de páginas sin grabaciones no toma prestadas las de imágenes
+    assert replay.annotate_file(PDF, 'application/pdf', [3, 4]).error.message
+
+def test_ocr_over_replay_gives_the_same_result_as_recording(recorded, monkeypatch):
+    # Sin cache OCR: la segunda pasada tiene que salir del replay
+    monkeypatch.setattr(ocr, 'get_ocr_cache', lambda: None)
+    recorder = RecordingBackend(_Vision(), str(recorded))
+    try:
+        set_ocr_backend(recorder)
+        live = ocr.extract_text_from_images([b'factura 3'])[0]
+
+        replay = ReplayBackend(str(recorded), cycle=False)
+        set_ocr_backend(replay)
+        replayed = ocr.extract_text_from_images([b'factura 3'])[0]
+        missing = ocr.extract_text_from_images([b'factura 4'])[0]
+    finally:
+        set_ocr_backend(None)
+
+    assert replayed == live
+    assert replayed['text'] == 'factura 3'
+    assert missing['error'].startswith('Error en OCR: Sin respuesta grabada')
+
+def test_unknown_backend_name_is_rejected():
+    with pytest.raises(ValueError, match='desconocido'):
+        create_ocr_backend('tesseract')
@@ -0,0 +1,34 @@
+"""Tests del cache OCR en disco: el orden LRU sobrevive a un reinicio"""
+
+import os
+import time
+
+from ocr_cache import DiskCacheTier
+
+DAY = 86400
+
+def _age(tier, key, seconds):
+    path = tier._path(key)
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+def test_hit_refreshes_mtime_for_lru_after_restart(tmp_path):
+    tier = DiskCacheTier(str(tmp_path), max_bytes=10_000, max_age_seconds=30 * DAY)
+    tier.put('aa01', {'text': 'usada'})
+    tier.put('bb02', {'text': 'sin usar'})
+    _age(tier, 'aa01', 2 * DAY)
+    _age(tier, 'bb02', DAY)
+
+    assert tier.get('aa01') == {'text': 'usada'}
+    assert time.time() - tier._path('aa01').stat().st_mtime < 60
+
+    restarted = DiskCacheTier(str(tmp_path), max_bytes=10_000, max_age_seconds=30 * DAY)
+    assert list(restarted._entries) == ['bb02', 'aa01']
+
+def test_expired_entry_is_removed(tmp_path):
+    tier = DiskCacheTier(str(tmp_path), max_bytes=10_000, max_age_seconds=DAY)
+    tier.put('aa01', {'text': 'vieja'})
+    _age(tier, 'aa01', 2 * DAY)
+
+    assert tier.get('aa01') is None
+    assert not tier._path('aa01').exists()
@@ -0,0 +1,76 @@
+"""Tests del parser de texto OCR: casos golden y parseo por bloques"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from parser import iter_invoice_fields, parse_invoice_blocks, parse_invoice_text
+
+GOLDEN_PATH = Path(__file__).parent / 'fixtures' / 'parser_golden.jsonl'
+
+with open(GOLDEN_PATH, encoding='utf-8') as f:
+    GOLDEN_CASES = [json.loads(line) for line in f if line.strip()]
+
+INVOICE_BLOCKS = [
+    {'text': 'COMERCIAL EJEMPLO SPA\nR.U.T.: 76.543.210-K'},
+    {'text': 'FACTURA ELECTRÓNICA\nN° 001234'},
+    {'text': 'Fecha Emisión: 15/03/2024\nSeñor(es): CLIENTE LTDA\nRUT: 12.345.678-9'},
+    {'text': 'Servicio de asesoría 1 $ 100.000 $ 100.000'},
+    {'text': 'MONTO NETO $ 100.000\nI.V.A. 19% $ 19.000\nTOTAL $ 119.000'},
+]
+
+@pytest.mark.parametrize('case', GOLDEN_CASES, ids=[case['name'] for case in GOLDEN_CASES])
+def test_parse_invoice_text_matches_golden(case):
+    assert parse_invoice_text(case['text']) == case['expected']
+
+@pytest.mark.parametrize('case', GOLDEN_CASES, ids=[case['name'] for case in GOLDEN_CASES])
+def test_single_block_matches_golden(case):
+    # Con todo el texto en un bloque, el parseo por bloques coincide con parse_invoice_text
+    assert parse_invoice_blocks([{'text': case['text']}]) == case['expected']
+
+def test_header_fields_are_yielded_before_reading_remaining_blocks():
+    read = []
+
+    def blocks():
+        for block in INVOICE_BLOCKS:
+            read.append(block)
+            yield block
+
+    fields = iter_invoice_fields(blocks())
+
+    assert next(fields) == ('emisorRut', '76.543.210-K')
+    assert len(read) == 1
+
+    rest = dict(fields)
+    assert rest == {
+        'type': 'factura',
+        'number': 1234,
+        'date': '2024-03-15',
+        'receptorRut': '12.345.678-9',
+        'totalAmount': 119000.0,
+        'ivaAmount': 19.0,
+        'netoAmount': 100000.0,
+    }
+    assert len(read) == len(INVOICE_BLOCKS)
+
+def test_each_field_is_yielded_once():
+    blocks = INVOICE_BLOCKS + [{'text': 'FACTURA N° 999\nTOTAL $ 5.000'}]
+    fields = [field for field, _ in iter_invoice_fields(blocks)]
+
+    assert len(fields) == len(set(fields))
+
+def test_total_without_label_uses_largest_dollar_amount():
+    blocks = [{'text': 'BOLETA N° 10'}, {'text': 'Café $ 2.500'}, {'text': 'Sandwich $ 4.900'}]
+
+    assert dict(iter_invoice_fields(blocks))['totalAmount'] == 4900.0
+
+def test_parse_invoice_blocks_reports_fields_as_found():
+    seen = []
+
+    data = parse_invoice_blocks(INVOICE_BLOCKS, on_field=lambda field, value: seen.append(field))
+
+    assert seen[0] == 'emisorRut'
+    assert sorted(seen) == sorted(field for field, value in data.items() if value not in (None, [], {}))
+    assert data['items'] == [] and data['emisorRazonSocial'] is None
+    assert data == {**parse_invoice_text('\n'.join(block['text'] for block in INVOICE_BLOCKS)), 'raw_matches': {}}
@@ -0,0 +1,166 @@
+"""Tests de la lectura de pendientes: consulta collection group, fallback por empresa y reparto en el scheduler"""
+
+from collections import Counter
+
+import pytest
+from google.api_core import exceptions as gcp_exceptions
+
+import firebase_client
+from ingestion import PendingInvoiceFeed
+
+class _Doc:
+    def __init__(self, company_id, invoice_id, created_at):
+        self.id = invoice_id
+        self.created_at = created_at
+        self.reference = type('Ref', (), {'parent': type('Col', (), {'parent': type('Company', (), {'id': company_id})})})
+
+    def to_dict(self):
+        return {'status': 'pending_ocr', 'createdAt': self.created_at}
+
+class _Query:
+    def __init__(self, db, docs, after=None, limit=None, collection_group=False):
+        self._db = db
+        self._docs = docs
+        self._after = after
+        self._limit = limit
+        self._collection_group = collection_group
+
+    def _copy(self, **changes):
+        fields = {'docs': self._docs, 'after': self._after, 'limit': self._limit,
+                  'collection_group': self._collection_group}
+        fields.update(changes)
+        return _Query(self._db, **fields)
+
+    def where(self, field, op, value):
+        return self
+
+    def order_by(self, field):
+        return self._copy(docs=sorted(self._docs, key=lambda doc: doc.created_at))
+
+    def start_after(self, doc):
+        return self._copy(after=doc)
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def stream(self):
+        self._db.queries += 1
+        if self._collection_group and self._db.missing_index:
+            raise gcp_exceptions.FailedPrecondition('The query requires an index')
+        docs = self._docs
+        if self._after is not None:
+            docs = docs[docs.index(self._after) + 1:]
+        return iter(docs[:self._limit])
+
+class _CompanyRef:
+    def __init__(self, db, company_id, docs):
+        self.id = company_id
+        self._db = db
+        self._docs = docs
+
+    def collection(self, name):
+        return _Query(self._db, self._docs)
+
+class _Db:
+    """Cliente falso: empresas con facturas pendientes (createdAt intercalado entre empresas)"""
+
+    def __init__(self, pending_by_company, missing_index=False):
+        self.missing_index = missing_index
+        self.queries = 0
+        self.listed_companies = 0
+        self._docs = {
+            company_id: [_Doc(company_id, f'{company_id}-{i}', i * len(pending_by_company) + n) for i in range(pending)]
+            for n, (company_id, pending) in enumerate(pending_by_company.items())
+        }
+
+    def collection(self, name):
+        def list_documents(_):
+            self.listed_companies += 1
+            return iter([_CompanyRef(self, company_id, docs) for company_id, docs in self._docs.items()])
+        return type('Companies', (), {'list_documents': list_documents})()
+
+    def collection_group(self, name):
+        return _Query(self, [doc for docs in self._docs.values() for doc in docs], collection_group=True)
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    def install(pending_by_company, missing_index=False):
+        db = _Db(pending_by_company, missing_index)
+        monkeypatch.setattr(firebase_client, 'get_firestore', lambda: db)
+        monkeypatch.setattr(firebase_client, '_collection_group_disabled', set())
+        monkeypatch.setattr(firebase_client, '_pending_company_cursor', 0)
+        return db
+    return install
+
+def _count_by_company(invoices):
+    return dict(Counter(invoice['companyId'] for invoice in invoices))
+
+# ============================================
+# CONSULTA COLLECTION GROUP
+# ============================================
+
+def test_collection_group_returns_oldest_pending_across_companies(fake_db):
+    fake_db({'a': 3, 'b': 3})
+
+    invoices = firebase_client.get_pending_invoices(limit=4)
+
+    assert [invoice['id'] for invoice in invoices] == ['a-0', 'b-0', 'a-1', 'b-1']
+
+@pytest.mark.parametrize('companies', [1, 10, 200])
+def test_each_poll_costs_exactly_one_query(fake_db, companies):
+    db = fake_db({f'e{i}': 5 for i in range(companies)})
+
+    for expected_queries in (1, 2):
+        invoices = firebase_client.get_pending_invoices(limit=100)
+        assert db.queries == expected_queries
+
+    assert len(invoices) == min(100, 5 * companies)
+    assert db.listed_companies == 0
+
+# ============================================
+# FALLBACK SIN ÍNDICE: REPARTO POR EMPRESA
+# ============================================
+
+def test_missing_index_falls_back_to_per_company_split(fake_db):
+    db = fake_db({'masiva': 5000, 'chica': 3, 'mediana': 40}, missing_index=True)
+
+    invoices = firebase_client.get_pending_invoices(limit=100)
+
+    assert len(invoices) == 100
+    assert _count_by_company(invoices) == {'masiva': 57, 'chica': 3, 'mediana': 40}
+    assert firebase_client._collection_group_disabled == {'pending'}
+
+    # Los polls siguientes van directo al fallback, sin reintentar la consulta sin índice
+    queries = db.queries
+    firebase_client.get_pending_invoices(limit=3)
+    assert db.queries - queries == 3
+
+def test_fallback_cursor_rotates_when_companies_outnumber_the_window(fake_db):
+    fake_db({f'e{i}': 10 for i in range(5)}, missing_index=True)
+
+    first = firebase_client.get_pending_invoices(limit=3)
+    second = firebase_client.get_pending_invoices(limit=3)
+
+    assert _count_by_company(first) == {'e0': 1, 'e1': 1, 'e2': 1}
+    assert _count_by_company(second) == {'e3': 1, 'e4': 1, 'e0': 1}
+
+# ============================================
+# REPARTO EN EL SCHEDULER
+# ============================================
+
+def test_fetch_window_lets_scheduler_interleave_a_bulk_upload():
+    # Una carga masiva ocupa el inicio de la cola por createdAt; la otra empresa llega después
+    pending = [{'companyId': 'masiva', 'id': f'm{i}'} for i in range(300)]
+    pending += [{'companyId': 'chica', 'id': f'c{i}'} for i in range(5)]
+    limits = []
+
+    def fetch(limit):
+        limits.append(limit)
+        return pending[:limit]
+
+    feed = PendingInvoiceFeed(fetch_fn=fetch, claim_fn=lambda batch: batch, window=100, fetch_window=500)
+
+    batch = feed.next_batch(10)
+
+    assert limits == [500]
+    assert _count_by_company(batch) == {'masiva': 5, 'chica': 5}
@@ -0,0 +1,114 @@
+"""Tests del pipeline asyncio: paso entre etapas, backpressure y ruteo de errores"""
+
+import asyncio
+import threading
+
+from pipeline import AsyncPipeline, Stage
+
+def _run(pipeline, jobs, before_stop=None):
+    async def main():
+        await pipeline.start()
+        submits = [asyncio.create_task(pipeline.submit(job)) for job in jobs]
+        if before_stop:
+            await before_stop()
+        results = await asyncio.gather(*submits)
+        await pipeline.stop()
+        return results
+    return asyncio.run(main())
+
+def _mark(name):
+    def fn(job):
+        job.setdefault('stages', []).append(name)
+    return fn
+
+def test_jobs_go_through_every_stage_in_order():
+    done = []
+    pipeline = AsyncPipeline(
+        [Stage('a', _mark('a'), concurrency=2), Stage('b', _mark('b'), blocking=False), Stage('c', _mark('c'))],
+        on_success=done.append,
+        key_fn=lambda job: job['id']
+    )
+
+    _run(pipeline, [{'id': i} for i in range(10)])
+
+    assert sorted(job['id'] for job in done) == list(range(10))
+    assert all(job['stages'] == ['a', 'b', 'c'] for job in done)
+    assert pipeline.stats()['processed'] == 10 and pipeline.in_flight() == 0
+
+def test_failed_job_leaves_the_pipeline_and_reaches_on_error():
+    done, errors = [], []
+
+    def parse(job):
+        if job['id'] % 3 == 0:
+            raise ValueError(f'no se pudo parsear {job["id"]}')
+        _mark('parse')(job)
+
+    pipeline = AsyncPipeline(
+        [Stage('ocr', _mark('ocr')), Stage('parse', parse), Stage('update', _mark('update'))],
+        on_success=done.append,
+        on_error=lambda job, error: errors.append((job, error)),
+        key_fn=lambda job: job['id']
+    )
+
+    _run(pipeline, [{'id': i} for i in range(9)])
+
+    assert sorted(job['id'] for job, _ in errors) == [0, 3, 6]
+    assert all(isinstance(error, ValueError) and job['stages'] == ['ocr'] for job, error in errors)
+    assert sorted(job['id'] for job in done) == [1, 2, 4, 5, 7, 8]
+    assert pipeline.stats()['failed'] == 3
+
+def test_batch_stage_routes_errors_per_job():
+    done, errors = [], []
+
+    def ocr_batch(jobs):
+        return [RuntimeError('imagen ilegible') if job['id'] == 2 else None for job in jobs]
+
+    pipeline = AsyncPipeline(
+        [Stage('ocr', batch_fn=ocr_batch, batch_size=4), Stage('update', _mark('update'))],
+        on_success=done.append,
+        on_error=lambda job, error: errors.append(job['id']),
+        key_fn=lambda job: job['id']
+    )
+
+    _run(pipeline, [{'id': i} for i in range(6)])
+
+    assert errors == [2]
+    assert sorted(job['id'] for job in done) == [0, 1, 3, 4, 5]
+
+def test_slow_stage_applies_backpressure_upstream():
+    release = threading.Event()
+    downloaded = []
+    pipeline = AsyncPipeline(
+        [
+            Stage('download', downloaded.append, blocking=False, queue_size=1),
+            Stage('sii', lambda job: release.wait(5), queue_size=1),
+        ],
+        key_fn=lambda job: job['id']
+    )
+
+    async def while_sii_is_stuck():
+        await asyncio.sleep(0.1)
+        # SII procesa 1 y tiene 1 en cola; descarga tiene 1 esperando para pasar a SII
+        assert len(downloaded) == 3
+        assert pipeline.available_slots() == 0
+        release.set()
+
+    results = _run(pipeline, [{'id': i} for i in range(20)], before_stop=while_sii_is_stuck)
+
+    assert all(results)
+    assert len(downloaded) == 20
+    assert pipeline.stats()['processed'] == 20
+
+def test_job_in_flight_is_not_submitted_twice():
+    release = threading.Event()
+    pipeline = AsyncPipeline([Stage('ocr', lambda job: release.wait(5))], key_fn=lambda job: job['id'])
+
+    async def main():
+        await pipeline.start()
+        first = await pipeline.submit({'id': 1})
+        second = await pipeline.submit({'id': 1})
+        release.set()
+        await pipeline.stop()
+        return first, second
+
+    assert asyncio.run(main()) == (True, False)
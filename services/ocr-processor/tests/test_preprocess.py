@@ -0,0 +1,95 @@
+"""Tests del pre-procesamiento: orientación EXIF, reducción, imágenes que pasan sin cambios y salida legible para el OCR"""
+
+import io
+import random
+
+from PIL import Image, ImageDraw
+
+import ocr
+from preprocess import preprocess_image
+
+def _encode(image, format='JPEG', **params):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **params)
+    return buffer.getvalue()
+
+def _open(data):
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+def _document(size=(1200, 800)):
+    """Página blanca con renglones negros (como texto impreso)"""
+    image = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(image)
+    for y in range(40, size[1] - 40, 60):
+        draw.rectangle([40, y, size[0] - 40, y + 20], fill='black')
+    return image
+
+def _noise(size, seed=0):
+    """Ruido aleatorio: no comprime, obliga a bajar calidad y tamaño"""
+    rng = random.Random(seed)
+    return Image.frombytes('RGB', size, bytes(rng.getrandbits(8) for _ in range(size[0] * size[1] * 3)))
+
+def test_exif_orientation_is_applied():
+    # Mitad izquierda negra; orientación 6 = la cámara la guardó girada, se muestra rotada 90° a la derecha
+    image = Image.new('RGB', (400, 200), 'white')
+    ImageDraw.Draw(image).rectangle([0, 0, 199, 199], fill='black')
+    exif = Image.Exif()
+    exif[0x0112] = 6
+
+    result = _open(preprocess_image(_encode(image, exif=exif.tobytes())))
+
+    assert result.size == (200, 400)
+    assert result.getexif().get(0x0112, 1) == 1
+    # La mitad negra queda arriba
+    assert result.getpixel((100, 50)) < 50
+    assert result.getpixel((100, 350)) > 200
+
+def test_large_image_is_reduced_to_the_long_edge_limit():
+    original = _encode(_document((5000, 2500)))
+
+    result = _open(preprocess_image(original, max_long_edge=2500, max_bytes=10_000_000))
+
+    assert result.size == (2500, 1250)
+
+def test_high_dpi_scan_is_reduced_to_the_target_dpi():
+    original = _encode(_document((2400, 1600)), dpi=(600, 600))
+
+    result = _open(preprocess_image(original, max_long_edge=0, target_dpi=300, max_bytes=10_000_000))
+
+    assert result.size == (1200, 800)
+
+def test_result_fits_the_byte_budget():
+    original = _encode(_noise((1500, 1000)), quality=95)
+
+    result = preprocess_image(original, max_bytes=150_000)
+
+    assert len(result) <= 150_000
+    assert len(result) < len(original)
+
+def test_small_image_passes_through_unchanged():
+    original = _encode(_document((800, 600)), format='PNG')
+
+    assert preprocess_image(original, max_long_edge=2500, max_bytes=1_500_000) is original
+
+def test_pdf_and_unreadable_bytes_pass_through_unchanged():
+    pdf = b'%PDF-1.7 factura'
+    broken = b'\xff\xd8\xff no es un jpeg'
+
+    assert preprocess_image(pdf) is pdf
+    assert preprocess_image(broken) is broken
+
+def test_grayscale_output_keeps_contrast_and_is_a_plain_image_for_ocr():
+    original = _encode(_document((3000, 2000)))
+
+    result = preprocess_image(original, max_long_edge=1500)
+    image = _open(result)
+
+    assert image.format == 'JPEG'
+    assert image.mode == 'L'
+    # Renglones negros sobre blanco siguen separados después de reducir y recomprimir
+    darkest, brightest = image.getextrema()
+    assert darkest < 40 and brightest > 215
+    # Va por la anotación de imágenes de Vision, no por la de archivos
+    assert ocr._document_mime_type(result) is None
@@ -0,0 +1,100 @@
+"""Tests del token bucket: ráfaga, tasa sostenida y reducción ante throttling (con reloj simulado)"""
+
+import pytest
+
+import rate_limit
+from rate_limit import TokenBucket, parse_retry_after
+
+class _Clock:
+    """Reemplazo de `time` en rate_limit: sleep avanza el reloj sin esperar"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    return clock
+
+def test_burst_is_served_without_waiting(clock):
+    bucket = TokenBucket('vision', rate=2, burst=5)
+
+    for _ in range(5):
+        bucket.acquire()
+
+    assert clock.slept == 0
+    bucket.acquire()
+    assert clock.slept == pytest.approx(0.5)
+
+def test_sustained_rate_after_burst(clock):
+    bucket = TokenBucket('vision', rate=10, burst=5)
+
+    for _ in range(105):
+        bucket.acquire()
+
+    # 5 de la ráfaga y 100 a 10/s
+    assert clock.slept == pytest.approx(10.0)
+
+def test_idle_time_refills_up_to_burst_only(clock):
+    bucket = TokenBucket('storage', rate=1, burst=3)
+    for _ in range(3):
+        bucket.acquire()
+
+    clock.now += 60
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.slept == 0
+
+    bucket.acquire()
+    assert clock.slept == pytest.approx(1.0)
+
+def test_timeout_does_not_consume_tokens(clock):
+    bucket = TokenBucket('sii', rate=1, burst=1)
+    bucket.acquire()
+
+    assert not bucket.acquire(timeout=0.5)
+    assert bucket.acquire(timeout=1.0)
+    assert clock.slept == pytest.approx(1.0)
+
+def test_throttle_pauses_halves_rate_and_success_recovers(clock):
+    bucket = TokenBucket('sii', rate=4, burst=4)
+
+    bucket.record_throttle(retry_after=3)
+    assert bucket.rate == 2
+
+    bucket.acquire()
+    # La ráfaga se descarta: espera el Retry-After y luego un token a la tasa reducida
+    assert clock.slept == pytest.approx(3.5)
+    # La pausa no acumula tokens: la siguiente sale a la tasa reducida, no en ráfaga
+    bucket.acquire()
+    assert clock.slept == pytest.approx(4.0)
+
+    for _ in range(20):
+        bucket.record_success()
+    assert bucket.rate == 4
+
+def test_throttle_without_retry_after_backs_off_exponentially(clock):
+    bucket = TokenBucket('vision', rate=16, burst=1, max_cooldown=4)
+
+    for _ in range(5):
+        bucket.record_throttle()
+
+    assert bucket.rate == 1
+    assert bucket.throttled == 5
+    bucket.acquire()
+    # Pausa de la última falla acotada a max_cooldown
+    assert clock.slept == pytest.approx(4.0 + 1.0)
+
+def test_parse_retry_after():
+    assert parse_retry_after('2') == 2.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('Wed, 21 Oct 2026 07:28:00 GMT') is None
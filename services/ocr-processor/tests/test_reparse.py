@@ -0,0 +1,76 @@
+"""Tests del re-parseo masivo: resultados en orden y escritura en Firestore acotada a los campos del parser"""
+
+import json
+
+import firebase_client
+import reparse
+from parser import parse_invoice_text
+from reparse import PARSED_FIELDS, parse_invoices_batch
+
+TEXTS = [
+    'FACTURA ELECTRÓNICA N° 123\nFecha: 15/03/2024\nRUT: 76.123.456-7\nTOTAL $ 119.000',
+    'BOLETA ELECTRÓNICA N° 9\nFecha: 01/02/2024\nTOTAL $ 5.990',
+    'texto sin datos',
+] * 5
+
+def test_batch_matches_serial_parse_in_order():
+    expected = [parse_invoice_text(text) for text in TEXTS]
+    assert list(parse_invoices_batch(TEXTS, workers=1, chunk_size=4)) == expected
+    assert list(parse_invoices_batch(iter(TEXTS), workers=2, chunk_size=4)) == expected
+
+class _Snapshot:
+    def __init__(self, ref, data):
+        self.reference = ref
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+class _Ref:
+    def __init__(self, path):
+        self.path = path
+
+class _Transaction:
+    def __init__(self, documents):
+        self._documents = documents
+        self.updates = []
+
+    def get_all(self, refs):
+        return [_Snapshot(ref, self._documents.get(ref.path)) for ref in refs]
+
+    def update(self, ref, data):
+        self.updates.append((ref.path, data))
+
+def test_firestore_update_skips_verified_and_missing_invoices():
+    transaction = _Transaction({'a': {'status': 'ocr_done'}, 'v': {'status': 'verified'}})
+    refs = [_Ref('a'), _Ref('v'), _Ref('no-existe')]
+    updates = [{'number': '1'}, {'number': '2'}, {'number': '3'}]
+
+    counts = firebase_client._update_reparsed_in_transaction.to_wrap(transaction, refs, updates)
+
+    assert counts == (1, 1, 1)
+    assert transaction.updates == [('a', {'number': '1'})]
+
+def test_firestore_mode_writes_only_parsed_fields(tmp_path, monkeypatch):
+    input_path = tmp_path / 'facturas.jsonl'
+    input_path.write_text(
+        json.dumps({'id': 'f1', 'companyId': 'empresa', 'ocrRawText': TEXTS[0], 'emisorRazonSocial': 'ACME'}) + '\n',
+        encoding='utf-8'
+    )
+    calls = []
+
+    def update_reparsed_invoices(invoices, fields, default_company_id=None):
+        calls.append((list(invoices), fields))
+        return {'updated': len(invoices), 'verified': 0, 'missing': 0, 'failed': 0}
+
+    monkeypatch.setattr(firebase_client, 'initialize_firebase', lambda: None)
+    monkeypatch.setattr(firebase_client, 'update_reparsed_invoices', update_reparsed_invoices)
+    monkeypatch.setattr(firebase_client, 'bulk_write_invoices', None)
+
+    reparse.main(['--input', str(input_path), '--firestore', '--workers', '1'])
+
+    (invoices, fields), = calls
+    assert fields == PARSED_FIELDS
+    assert 'createdAt' not in fields and 'processedAt' not in fields
+    assert invoices[0]['number'] == parse_invoice_text(TEXTS[0])['number']
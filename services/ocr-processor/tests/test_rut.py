@@ -0,0 +1,77 @@
+"""Tests del tipo Rut: dígito verificador (incluidos K y 0) y validación en lote igual a la individual"""
+
+import random
+
+import pytest
+
+from rut import compute_dv, format_rut, parse_rut, validate_rut, validate_ruts
+
+VALID = [
+    '12.345.678-5',
+    '12345678-5',
+    '123456785',
+    '11.111.111-1',
+    '6-K',
+    '10.000.013-K',
+    '10000013-k',
+    '10.000.004-0',
+    '10 000 004 0',
+    '12 . 345 . 678 - 5',  # más largo que la matriz de validate_ruts
+]
+
+INVALID = [
+    '12.345.678-9',
+    '10.000.004-K',
+    '10.000.013-0',
+    '6-0',
+    '12.345.678',
+    '1.234.567.890-1',
+    'abc-5',
+    '12.345.678-X',
+    '١٢٣٤٥٦٧٨-5',  # dígitos arábigos: isdigit() los acepta
+    'K',
+    '-',
+    '',
+]
+
+def _scalar(rut):
+    parsed = parse_rut(rut) if rut is not None else None
+    return parsed is not None and parsed.is_valid
+
+@pytest.mark.parametrize('rut', VALID)
+def test_valid_ruts(rut):
+    assert validate_rut(rut)
+
+@pytest.mark.parametrize('rut', INVALID)
+def test_invalid_ruts(rut):
+    assert not validate_rut(rut)
+
+def test_dv_k_and_zero():
+    assert compute_dv(10000013) == 'K'
+    assert compute_dv(10000004) == '0'
+    assert parse_rut('10.000.013-k').dv == 'K'
+
+def test_parse_normalizes_any_spelling():
+    assert parse_rut('12345678-5') is parse_rut('12.345.678-5')
+    assert str(parse_rut('123456785')) == '12.345.678-5'
+    assert parse_rut('12345678-5').compact == '12345678-5'
+    assert format_rut('no es rut') == 'no es rut'
+
+def test_batch_matches_scalar_for_known_ruts():
+    batch = VALID + INVALID + [None]
+
+    assert validate_ruts(batch).tolist() == [_scalar(rut) for rut in batch]
+
+def test_batch_matches_scalar_for_random_ruts():
+    rng = random.Random(0)
+    batch = []
+    for _ in range(2000):
+        number = rng.randint(1, 99_999_999)
+        dv = compute_dv(number) if rng.random() < 0.5 else rng.choice('0123456789Kk')
+        text = f'{number:,}'.replace(',', '.') if rng.random() < 0.5 else str(number)
+        batch.append(f'{text}{rng.choice(["-", "", " "])}{dv}')
+
+    assert validate_ruts(batch).tolist() == [_scalar(rut) for rut in batch]
+
+def test_empty_batch():
+    assert validate_ruts([]).tolist() == []
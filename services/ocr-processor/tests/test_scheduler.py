@@ -0,0 +1,65 @@
+"""Tests del scheduler por empresa: round-robin ponderado y orden por prioridad"""
+
+from collections import Counter
+
+from scheduler import FairScheduler, parse_company_weights
+
+def _push_all(scheduler, company_id, count, priority=None, start=0):
+    for i in range(start, start + count):
+        invoice = {'companyId': company_id, 'id': f'{company_id}-{i}'}
+        if priority is not None:
+            invoice['priority'] = priority
+        scheduler.push(invoice)
+
+def test_bulk_upload_does_not_starve_other_companies():
+    scheduler = FairScheduler()
+    _push_all(scheduler, 'masiva', 500)
+    _push_all(scheduler, 'chica', 3)
+
+    first = [invoice['companyId'] for invoice in scheduler.pop(6)]
+
+    assert Counter(first) == {'masiva': 3, 'chica': 3}
+
+def test_dispatch_is_proportional_to_weights_and_interleaved():
+    scheduler = FairScheduler(weights={'a': 3, 'b': 1})
+    _push_all(scheduler, 'a', 30)
+    _push_all(scheduler, 'b', 30)
+
+    order = [invoice['companyId'] for invoice in scheduler.pop(8)]
+
+    assert Counter(order) == {'a': 6, 'b': 2}
+    # Smooth weighted round-robin: la empresa liviana no queda al final de cada ronda
+    assert order[:4].count('b') == 1
+
+def test_higher_priority_is_dispatched_first_across_companies():
+    scheduler = FairScheduler(weights={'masiva': 10})
+    _push_all(scheduler, 'masiva', 20, priority=0)
+    _push_all(scheduler, 'app', 2, priority=5)
+
+    batch = scheduler.pop(4)
+
+    assert [invoice['companyId'] for invoice in batch[:2]] == ['app', 'app']
+    assert [invoice['companyId'] for invoice in batch[2:]] == ['masiva', 'masiva']
+
+def test_within_company_priority_then_arrival_order():
+    scheduler = FairScheduler()
+    _push_all(scheduler, 'a', 3)
+    scheduler.push({'companyId': 'a', 'id': 'urgente', 'priority': 1})
+    scheduler.push({'companyId': 'a', 'id': 'invalida', 'priority': 'x'})
+
+    assert [invoice['id'] for invoice in scheduler.pop(10)] == ['urgente', 'a-0', 'a-1', 'a-2', 'invalida']
+
+def test_duplicates_are_ignored_until_popped():
+    scheduler = FairScheduler()
+
+    assert scheduler.push({'companyId': 'a', 'id': '1'})
+    assert not scheduler.push({'companyId': 'a', 'id': '1'})
+    assert len(scheduler) == 1 and scheduler.depths() == {'a': 1}
+
+    scheduler.pop(1)
+    assert scheduler.push({'companyId': 'a', 'id': '1'})
+
+def test_parse_company_weights():
+    assert parse_company_weights('empresaA:3, empresaB:2,empresaC:0,mala:x,') == {
+        'empresaA': 3, 'empresaB': 2, 'empresaC': 1
+    }
@@ -0,0 +1,139 @@
+"""Tests de las consultas al SII: RUTs en lote, resultados por forma original y sesión HTTP compartida"""
+
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import sii
+from config import SII_POOL_SIZE
+from sii import get_sii_session, query_sii_by_rut, query_sii_by_ruts
+
+# Contribuyentes que conoce el SII falso (RUT sin DV -> razón social)
+KNOWN = {'12345678': 'ACME SPA', '10000013': 'FERRETERÍA K LTDA'}
+
+def _html(razon_social):
+    return f'<table class="cuadro"><tr><td>Razón Social</td><td>{razon_social}</td></tr></table>'
+
+class _Session:
+    """Sesión falsa: responde según el RUT del formulario y registra cada POST"""
+
+    def __init__(self, statuses=()):
+        self.posts = []
+        self._statuses = list(statuses)
+        self._lock = threading.Lock()
+
+    def post(self, url, data, timeout):
+        with self._lock:
+            self.posts.append((data['RUT'], data['DV']))
+            status = self._statuses.pop(0) if self._statuses else 200
+        razon_social = KNOWN.get(data['RUT'])
+        return SimpleNamespace(
+            status_code=status,
+            text=_html(razon_social) if razon_social else '<html><body>Sin datos</body></html>',
+            headers={'Retry-After': '2'} if status == 429 else {}
+        )
+
+class _Limiter:
+    def __init__(self):
+        self.throttles = []
+
+    def acquire(self, tokens=1):
+        pass
+
+    def record_success(self):
+        pass
+
+    def record_throttle(self, retry_after=None):
+        self.throttles.append(retry_after)
+
+@pytest.fixture
+def session(monkeypatch):
+    def install(statuses=()):
+        fake, limiter = _Session(statuses), _Limiter()
+        monkeypatch.setattr(sii, '_session', fake)
+        monkeypatch.setattr(sii, 'get_rate_limiter', lambda service: limiter)
+        return fake, limiter
+    return install
+
+# ============================================
+# CONSULTAS EN LOTE
+# ============================================
+
+def test_each_distinct_rut_is_queried_once(session):
+    fake, _ = session()
+
+    query_sii_by_ruts(['12.345.678-5', '12345678-5', '123456785', '10.000.013-K', '10000013k', '12.345.678-5'])
+
+    assert sorted(fake.posts) == [('10000013', 'K'), ('12345678', '5')]
+
+def test_results_are_keyed_by_the_callers_rut_formats(session):
+    session()
+    ruts = ['12.345.678-5', '12345678-5', '10000013k']
+
+    results = query_sii_by_ruts(ruts, concurrency=2)
+
+    assert list(results) == ruts
+    assert results['12.345.678-5'] is results['12345678-5']
+    assert results['12345678-5']['razonSocial'] == 'ACME SPA'
+    # El resultado lleva el RUT normalizado, no la forma en que vino
+    assert results['10000013k']['rut'] == '10.000.013-K'
+
+def test_invalid_and_unknown_ruts_map_to_none(session):
+    fake, _ = session()
+
+    results = query_sii_by_ruts(['12.345.678-9', 'sin rut', '10.000.004-0'])
+
+    assert results == {'12.345.678-9': None, 'sin rut': None, '10.000.004-0': None}
+    # Sólo el RUT válido (que el SII no conoce) llega a consultarse
+    assert fake.posts == [('10000004', '0')]
+
+def test_only_invalid_ruts_make_no_queries(session):
+    fake, _ = session()
+
+    assert query_sii_by_ruts(['12.345.678-9']) == {'12.345.678-9': None}
+    assert fake.posts == []
+
+def test_throttled_query_is_retried_on_the_same_session(session, monkeypatch):
+    monkeypatch.setattr(sii, 'MAX_RETRIES', 3)
+    fake, limiter = session(statuses=[429, 503])
+
+    data = query_sii_by_rut('12.345.678-5')
+
+    assert data['razonSocial'] == 'ACME SPA'
+    assert len(fake.posts) == 3
+    # El 429 trae Retry-After; el 503 sin header deja la pausa por defecto del limiter
+    assert limiter.throttles == [2.0, None]
+
+# ============================================
+# SESIÓN HTTP
+# ============================================
+
+def test_session_is_created_once_and_shared_by_threads(monkeypatch):
+    monkeypatch.setattr(sii, '_session', None)
+    sessions = []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        sessions.append(get_sii_session())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(sessions) == 8
+    assert all(session is sessions[0] for session in sessions)
+    assert get_sii_session() is sessions[0]
+
+def test_session_pool_is_bounded_and_keeps_browser_headers(monkeypatch):
+    monkeypatch.setattr(sii, '_session', None)
+
+    session = get_sii_session()
+    adapter = session.get_adapter(sii.SII_CONSULTA_URL)
+
+    assert adapter._pool_maxsize == SII_POOL_SIZE
+    assert adapter._pool_block is True
+    assert session.headers['Accept-Language'] == sii.HEADERS['Accept-Language']
@@ -0,0 +1,133 @@
+"""Tests del cache de proveedores en memoria (TTL, "no encontrado", desalojo LRU) y de SingleFlight"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import supplier_cache
+from supplier_cache import SingleFlight, SupplierCache
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(supplier_cache, 'time', clock)
+    return clock
+
+ACME = {'rut': '76.543.210-K', 'razonSocial': 'ACME SPA'}
+
+def test_entry_expires_after_ttl(clock):
+    cache = SupplierCache(max_entries=10, ttl_seconds=60, negative_ttl_seconds=10)
+    cache.put('76.543.210-K', ACME)
+
+    clock.now += 59
+    assert cache.get('76.543.210-K') == (True, ACME)
+
+    clock.now += 1
+    assert cache.get('76.543.210-K') == (False, None)
+    assert cache.stats()['entries'] == 0
+
+def test_not_found_is_cached_with_its_own_ttl(clock):
+    cache = SupplierCache(max_entries=10, ttl_seconds=60, negative_ttl_seconds=10)
+    cache.put_not_found('11.111.111-1')
+
+    assert cache.get('11.111.111-1') == (True, None)
+    clock.now += 10
+    assert cache.get('11.111.111-1') == (False, None)
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['negativeHits'], stats['misses']) == (0, 1, 1)
+    assert stats['hitRate'] == 0.5
+
+def test_least_recently_used_is_evicted(clock):
+    cache = SupplierCache(max_entries=2, ttl_seconds=60, negative_ttl_seconds=10)
+    cache.put('a', {'rut': 'a'})
+    cache.put('b', {'rut': 'b'})
+
+    cache.get('a')
+    cache.put('c', {'rut': 'c'})
+
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, {'rut': 'a'})
+    assert cache.get('c') == (True, {'rut': 'c'})
+    assert cache.stats()['evictions'] == 1
+
+def test_put_refreshes_ttl_and_replaces_not_found(clock):
+    cache = SupplierCache(max_entries=10, ttl_seconds=60, negative_ttl_seconds=10)
+    cache.put_not_found('76.543.210-K')
+
+    clock.now += 5
+    cache.put('76.543.210-K', ACME)
+    clock.now += 30
+
+    assert cache.get('76.543.210-K') == (True, ACME)
+
+def _run_concurrently(flight, key, fn, callers):
+    """Llamar a flight.do desde `callers` threads; retorna el resultado o la excepción de cada uno"""
+    def call():
+        try:
+            return flight.do(key, fn)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=callers) as executor:
+        futures = [executor.submit(call) for _ in range(callers)]
+        return [future.result(timeout=5) for future in futures]
+
+def _wait_for_waiters(flight, expected):
+    while flight.stats()['coalesced'] < expected:
+        time.sleep(0.001)
+
+# El que ejecuta fn la libera recién cuando los demás ya están esperando
+
+def test_concurrent_calls_for_same_key_run_once():
+    flight = SingleFlight()
+    release = threading.Event()
+    executions = []
+
+    def lookup():
+        executions.append(1)
+        release.wait(5)
+        return ACME
+
+    threading.Thread(target=lambda: (_wait_for_waiters(flight, 7), release.set()), daemon=True).start()
+    results = _run_concurrently(flight, '76.543.210-K', lookup, callers=8)
+
+    assert executions == [1]
+    assert results == [ACME] * 8
+    assert flight.stats() == {'calls': 8, 'coalesced': 7, 'inFlight': 0}
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def lookup():
+        release.wait(5)
+        raise ConnectionError('SII no responde')
+
+    threading.Thread(target=lambda: (_wait_for_waiters(flight, 4), release.set()), daemon=True).start()
+    results = _run_concurrently(flight, '76.543.210-K', lookup, callers=5)
+
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert len({id(result) for result in results}) == 1
+
+def test_later_call_runs_again_after_the_flight_ends():
+    flight = SingleFlight()
+
+    def failing():
+        raise ConnectionError('falla')
+
+    with pytest.raises(ConnectionError):
+        flight.do('k', failing)
+
+    assert flight.do('k', lambda: 'ok') == 'ok'
+    assert flight.do('otra', lambda: 'otra') == 'otra'
+    assert flight.stats()['coalesced'] == 0
@@ -0,0 +1,97 @@
+"""Tests del pool de workers: concurrencia acotada, deduplicación y drenado al cerrar"""
+
+import threading
+import time
+
+from worker_pool import InvoiceWorkerPool
+
+def _invoice(i):
+    return {'companyId': 'empresa', 'id': f'f{i}'}
+
+def test_concurrency_is_bounded_by_workers():
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def process(invoice):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+        return True
+
+    pool = InvoiceWorkerPool(process, workers=3, queue_size=2)
+    pool.start()
+    for i in range(12):
+        assert pool.submit(_invoice(i))
+    pool.shutdown()
+
+    assert 1 < peak <= 3
+    assert pool.stats()['processed'] == 12
+
+def test_submit_blocks_when_queue_is_full():
+    started = threading.Event()
+    release = threading.Event()
+
+    def process(invoice):
+        started.set()
+        return release.wait(5)
+
+    pool = InvoiceWorkerPool(process, workers=1, queue_size=1)
+    pool.start()
+
+    assert pool.submit(_invoice(0))
+    assert started.wait(2)
+    # El worker está ocupado con la primera: la segunda llena la cola y la tercera espera
+    assert pool.submit(_invoice(1))
+    assert pool.available_slots() == 0
+    assert not pool.submit(_invoice(2), timeout=0.05)
+    assert pool.in_flight() == 2
+
+    release.set()
+    pool.shutdown()
+    assert pool.stats()['processed'] == 2
+
+def test_same_invoice_is_not_queued_twice():
+    release = threading.Event()
+    pool = InvoiceWorkerPool(lambda invoice: release.wait(5), workers=1, queue_size=5)
+    pool.start()
+
+    assert pool.submit(_invoice(1))
+    assert not pool.submit(_invoice(1))
+
+    release.set()
+    pool.shutdown()
+
+def test_shutdown_drains_queued_invoices():
+    processed = []
+
+    def process(invoice):
+        time.sleep(0.01)
+        processed.append(invoice['id'])
+        return invoice['id'] != 'f3'
+
+    pool = InvoiceWorkerPool(process, workers=2, queue_size=10)
+    pool.start()
+    for i in range(8):
+        pool.submit(_invoice(i))
+    pool.shutdown(wait=True)
+
+    assert sorted(processed) == sorted(f'f{i}' for i in range(8))
+    assert pool.in_flight() == 0
+    assert pool.stats()['processed'] == 7 and pool.stats()['failed'] == 1
+
+def test_unexpected_error_counts_as_failed_and_frees_the_slot():
+    def process(invoice):
+        raise RuntimeError('falla')
+
+    pool = InvoiceWorkerPool(process, workers=1, queue_size=1)
+    pool.start()
+    pool.submit(_invoice(1))
+    pool.shutdown()
+
+    assert pool.stats()['failed'] == 1
+    assert pool.in_flight() == 0